@@ -15,14 +15,18 @@
 """BSON (Binary JSON) encoding and decoding.
 """
 
-import calendar
 import datetime
+import mmap
+import os
 import re
 import struct
 import warnings
 
 from bson.binary import Binary
 from bson.code import Code
+from bson.codec import (_binary_decoders,
+                        _encoders as _custom_encoders,
+                        _find_encoder)
 from bson.dbref import DBRef
 from bson.errors import (InvalidBSON,
                          InvalidDocument,
@@ -30,6 +34,8 @@ from bson.errors import (InvalidBSON,
 from bson.max_key import MaxKey
 from bson.min_key import MinKey
 from bson.objectid import ObjectId
+from bson.raw import (RawBSONDocument,
+                      _value_end)
 from bson.son import SON
 from bson.timestamp import Timestamp
 from bson.tz_util import utc
@@ -51,25 +57,59 @@ except ImportError:
 # This sort of sucks, but seems to be as good as it gets...
 RE_TYPE = type(re.compile(""))
 
+_EPOCH_NAIVE = datetime.datetime(1970, 1, 1)
+_EPOCH_AWARE = datetime.datetime(1970, 1, 1, tzinfo=utc)
 
-def _get_int(data, as_class=None, tz_aware=False, unsigned=False):
-    format = unsigned and "I" or "i"
+def _new_raw(as_class, data, tz_aware, dates_as_millis):
+    """Create an `as_class` (a RawBSONDocument class) instance wrapping
+    `data`, decoding dates as the decoding functions below do.
+    """
+    if dates_as_millis:
+        return as_class(data, tz_aware, True)
+    return as_class(data, tz_aware)
+
+
+def _unpacker(format):
+    """Get a function unpacking `format` from a string, at a position.
+    """
+    try:
+        return struct.Struct(format).unpack_from
+    except AttributeError:
+        # Python 2.4 has no struct.Struct
+        size = struct.calcsize(format)
+
+        def unpack_from(data, position=0):
+            return struct.unpack(format, data[position:position + size])
+        return unpack_from
+
+_UNPACK_INT = _unpacker("<i")
+_UNPACK_LONG = _unpacker("<q")
+_UNPACK_DOUBLE = _unpacker("<d")
+_UNPACK_LENGTH_SUBTYPE = _unpacker("<iB")
+_UNPACK_TIMESTAMP = _unpacker("<II")
+
+
+# The decoding functions below all take the whole of the data being
+# decoded and a position in it, and return the value decoded and the
+# position just past it, so that nothing gets copied but the values.
+
+def _get_int(data, position, as_class, tz_aware, dates_as_millis):
     try:
-        value = struct.unpack("<%s" % format, data[:4])[0]
+        value = _UNPACK_INT(data, position)[0]
     except struct.error:
         raise InvalidBSON()
-
-    return (value, data[4:])
+    return (value, position + 4)
 
 
-def _get_c_string(data, length=None):
+def _get_c_string(data, position, length=None):
     if length is None:
         try:
-            length = data.index("\x00")
+            end = data.index("\x00", position)
         except ValueError:
             raise InvalidBSON()
-
-    return (unicode(data[:length], "utf-8"), data[length + 1:])
+    else:
+        end = position + length
+    return (unicode(data[position:end], "utf-8"), end + 1)
 
 
 def _make_c_string(string, check_null=False):
@@ -87,78 +127,121 @@ def _make_c_string(string, check_null=False):
                                     "UTF-8: %r" % string)
 
 
-def _get_number(data, as_class, tz_aware):
-    return (struct.unpack("<d", data[:8])[0], data[8:])
+def _get_number(data, position, as_class, tz_aware, dates_as_millis):
+    return (_UNPACK_DOUBLE(data, position)[0], position + 8)
+
+
+def _get_string(data, position, as_class, tz_aware, dates_as_millis):
+    length = _UNPACK_INT(data, position)[0]
+    return _get_c_string(data, position + 4, length - 1)
+
+
+def _document_end(data, position):
+    """Get the position of the last byte of the document (or array)
+    starting at `position`, after checking that it is the EOO byte.
+    """
+    obj_size = _UNPACK_INT(data, position)[0]
+    if obj_size < 5:
+        raise InvalidBSON("objsize too small")
+    end = position + obj_size - 1
+    if end >= len(data):
+        raise InvalidBSON("objsize too large")
+    if data[end] != "\x00":
+        raise InvalidBSON("bad eoo")
+    return end
 
 
-def _get_string(data, as_class, tz_aware):
-    return _get_c_string(data[4:], struct.unpack("<i", data[:4])[0] - 1)
+def _get_document(data, position, as_class, tz_aware, dates_as_millis):
+    end = _document_end(data, position)
+    return (_elements_to_dict(data, position + 4, end, as_class, tz_aware,
+                              dates_as_millis), end + 1)
 
 
-def _get_object(data, as_class, tz_aware):
-    (object, data) = _bson_to_dict(data, as_class, tz_aware)
+def _get_object(data, position, as_class, tz_aware, dates_as_millis):
+    (object, position) = _get_document(data, position, as_class, tz_aware,
+                                       dates_as_millis)
     if "$ref" in object:
         return (DBRef(object.pop("$ref"), object.pop("$id"),
-                      object.pop("$db", None), object), data)
-    return (object, data)
+                      object.pop("$db", None), object), position)
+    return (object, position)
 
 
-def _get_array(data, as_class, tz_aware):
-    (obj, data) = _get_object(data, as_class, tz_aware)
+def _get_array(data, position, as_class, tz_aware, dates_as_millis):
+    end = _document_end(data, position)
+    position += 4
     result = []
-    i = 0
-    while True:
+    append = result.append
+    getter = _element_getter
+    index = data.index
+    while position < end:
+        element_type = data[position]
+        # the keys are just the indexes of the elements, in order
         try:
-            result.append(obj[str(i)])
-            i += 1
-        except KeyError:
-            break
-    return (result, data)
+            position = index("\x00", position + 1) + 1
+        except ValueError:
+            raise InvalidBSON()
+        (value, position) = getter[element_type](data, position, as_class,
+                                                 tz_aware, dates_as_millis)
+        append(value)
+    if position != end:
+        raise InvalidBSON("bad array length")
+    return (result, end + 1)
 
 
-def _get_binary(data, as_class, tz_aware):
-    (length, data) = _get_int(data)
-    subtype = ord(data[0])
-    data = data[1:]
+def _get_binary(data, position, as_class, tz_aware, dates_as_millis):
+    (length, subtype) = _UNPACK_LENGTH_SUBTYPE(data, position)
+    position += 5
     if subtype == 2:
-        (length2, data) = _get_int(data)
+        length2 = _UNPACK_INT(data, position)[0]
+        position += 4
         if length2 != length - 4:
             raise InvalidBSON("invalid binary (st 2) - lengths don't match!")
         length = length2
+    end = position + length
     if subtype == 3 and _use_uuid:
-        return (uuid.UUID(bytes=data[:length]), data[length:])
-    return (Binary(data[:length], subtype), data[length:])
+        return (uuid.UUID(bytes=data[position:end]), end)
+    if subtype >= 128 and subtype in _binary_decoders:
+        return (_binary_decoders[subtype](data[position:end]), end)
+    return (Binary(data[position:end], subtype), end)
 
 
-def _get_oid(data, as_class, tz_aware):
-    return (ObjectId(data[:12]), data[12:])
+def _get_oid(data, position, as_class, tz_aware, dates_as_millis):
+    end = position + 12
+    return (ObjectId(data[position:end]), end)
 
 
-def _get_boolean(data, as_class, tz_aware):
-    return (data[0] == "\x01", data[1:])
+def _get_boolean(data, position, as_class, tz_aware, dates_as_millis):
+    return (data[position] == "\x01", position + 1)
 
 
-def _get_date(data, as_class, tz_aware):
-    seconds = float(struct.unpack("<q", data[:8])[0]) / 1000.0
-    if tz_aware:
-        return (datetime.datetime.fromtimestamp(seconds, utc), data[8:])
-    return (datetime.datetime.utcfromtimestamp(seconds), data[8:])
+def _get_date(data, position, as_class, tz_aware, dates_as_millis):
+    millis = _UNPACK_LONG(data, position)[0]
+    if dates_as_millis:
+        return (millis, position + 8)
+    try:
+        delta = datetime.timedelta(0, 0, 0, millis)
+        if tz_aware:
+            return (_EPOCH_AWARE + delta, position + 8)
+        return (_EPOCH_NAIVE + delta, position + 8)
+    except OverflowError:
+        raise ValueError("year is out of range")
 
 
-def _get_code_w_scope(data, as_class, tz_aware):
-    (_, data) = _get_int(data)
-    (code, data) = _get_string(data)
-    (scope, data) = _get_object(data, as_class, tz_aware)
-    return (Code(code, scope), data)
+def _get_code_w_scope(data, position, as_class, tz_aware, dates_as_millis):
+    (code, position) = _get_string(data, position + 4, as_class, tz_aware,
+                                   dates_as_millis)
+    (scope, position) = _get_object(data, position, as_class, tz_aware,
+                                    dates_as_millis)
+    return (Code(code, scope), position)
 
 
-def _get_null(data, as_class, tz_aware):
-    return (None, data)
+def _get_null(data, position, as_class, tz_aware, dates_as_millis):
+    return (None, position)
 
 
-def _get_regex(data, as_class, tz_aware):
-    (pattern, data) = _get_c_string(data)
-    (bson_flags, data) = _get_c_string(data)
+def _get_regex(data, position, as_class, tz_aware, dates_as_millis):
+    (pattern, position) = _get_c_string(data, position)
+    (bson_flags, position) = _get_c_string(data, position)
     flags = 0
     if "i" in bson_flags:
         flags |= re.IGNORECASE
@@ -172,23 +255,23 @@ def _get_regex(data, as_class, tz_aware):
         flags |= re.UNICODE
     if "x" in bson_flags:
         flags |= re.VERBOSE
-    return (re.compile(pattern, flags), data)
+    return (re.compile(pattern, flags), position)
 
 
-def _get_ref(data, as_class, tz_aware):
-    (collection, data) = _get_c_string(data[4:])
-    (oid, data) = _get_oid(data)
-    return (DBRef(collection, oid), data)
+def _get_ref(data, position, as_class, tz_aware, dates_as_millis):
+    (collection, position) = _get_c_string(data, position + 4)
+    (oid, position) = _get_oid(data, position, as_class, tz_aware,
+                               dates_as_millis)
+    return (DBRef(collection, oid), position)
 
 
-def _get_timestamp(data, as_class, tz_aware):
-    (inc, data) = _get_int(data, unsigned=True)
-    (timestamp, data) = _get_int(data, unsigned=True)
-    return (Timestamp(timestamp, inc), data)
+def _get_timestamp(data, position, as_class, tz_aware, dates_as_millis):
+    (inc, timestamp) = _UNPACK_TIMESTAMP(data, position)
+    return (Timestamp(timestamp, inc), position + 8)
 
 
-def _get_long(data, as_class, tz_aware):
-    return (struct.unpack("<q", data[:8])[0], data[8:])
+def _get_long(data, position, as_class, tz_aware, dates_as_millis):
+    return (_UNPACK_LONG(data, position)[0], position + 8)
 
 
 _element_getter = {
@@ -210,38 +293,291 @@ _element_getter = {
     "\x10": _get_int,  # number_int
     "\x11": _get_timestamp,
     "\x12": _get_long,
-    "\xFF": lambda x, y, z: (MinKey(), x),
-    "\x7F": lambda x, y, z: (MaxKey(), x)}
-
+    "\xFF": lambda data, position, as_class, tz_aware, dates_as_millis:
+        (MinKey(), position),
+    "\x7F": lambda data, position, as_class, tz_aware, dates_as_millis:
+        (MaxKey(), position)}
 
-def _element_to_dict(data, as_class, tz_aware):
-    element_type = data[0]
-    (element_name, data) = _get_c_string(data[1:])
-    (value, data) = _element_getter[element_type](data, as_class, tz_aware)
-    return (element_name, value, data)
 
-
-def _elements_to_dict(data, as_class, tz_aware):
+def _elements_to_dict(data, position, end, as_class, tz_aware,
+                      dates_as_millis):
+    """Decode the elements between `position` and `end`.
+    """
     result = as_class()
-    while data:
-        (key, value, data) = _element_to_dict(data, as_class, tz_aware)
-        result[key] = value
+    getter = _element_getter
+    index = data.index
+    while position < end:
+        element_type = data[position]
+        try:
+            name_end = index("\x00", position + 1)
+        except ValueError:
+            raise InvalidBSON()
+        name = unicode(data[position + 1:name_end], "utf-8")
+        (value, position) = getter[element_type](data, name_end + 1,
+                                                 as_class, tz_aware,
+                                                 dates_as_millis)
+        result[name] = value
+    if position != end:
+        raise InvalidBSON("bad object or element length")
     return result
 
 
-def _bson_to_dict(data, as_class, tz_aware):
-    obj_size = struct.unpack("<i", data[:4])[0]
-    if len(data) < obj_size:
-        raise InvalidBSON("objsize too large")
-    if data[obj_size - 1] != "\x00":
-        raise InvalidBSON("bad eoo")
-    elements = data[4:obj_size - 1]
-    return (_elements_to_dict(elements, as_class, tz_aware), data[obj_size:])
+def _is_raw(as_class):
+    """Does `as_class` keep documents as raw BSON?
+    """
+    return isinstance(as_class, type) and issubclass(as_class, RawBSONDocument)
+
+
+def _bson_to_dict(data, as_class, tz_aware, dates_as_millis=False):
+    if _is_raw(as_class):
+        position = _document_end(data, 0) + 1
+        return (_new_raw(as_class, data[:position], tz_aware,
+                         dates_as_millis), data[position:])
+    (document, position) = _get_document(data, 0, as_class, tz_aware,
+                                         dates_as_millis)
+    return (document, data[position:])
 if _use_c:
     _bson_to_dict = _cbson._bson_to_dict
 
 
-def _element_to_bson(key, value, check_keys):
+def _packer(format):
+    """Get a function packing values with `format`.
+    """
+    try:
+        return struct.Struct(format).pack
+    except AttributeError:
+        # Python 2.4 has no struct.Struct
+        def pack(*values):
+            return struct.pack(format, *values)
+        return pack
+
+_PACK_INT = _packer("<i")
+_PACK_LONG = _packer("<q")
+_PACK_DOUBLE = _packer("<d")
+_PACK_TIMESTAMP = _packer("<II")
+
+_MAX_INT32 = 2147483647
+_MIN_INT32 = -2147483648
+_MAX_INT64 = 9223372036854775807
+_MIN_INT64 = -9223372036854775808
+
+# Names of the elements of arrays, as C strings: "0\x00", "1\x00", ...
+_array_keys = [str(i) + "\x00" for i in range(1000)]
+
+
+# The encoding functions below append the parts of an element, given
+# the type byte and the name of the element (as a C string), to `parts`.
+
+def _encode_float(parts, name, value, check_keys):
+    parts.extend(("\x01", name, _PACK_DOUBLE(value)))
+
+
+def _encode_string(parts, name, value, check_keys):
+    cstring = _make_c_string(value)
+    parts.extend(("\x02", name, _PACK_INT(len(cstring)), cstring))
+
+
+def _encode_document(parts, name, value, check_keys):
+    parts.append("\x03")
+    parts.append(name)
+    _write_document(parts, value, check_keys, False)
+
+
+def _encode_list(parts, name, value, check_keys):
+    parts.append("\x04")
+    parts.append(name)
+    start = len(parts)
+    parts.append(None)
+    keys = _array_keys
+    for i in xrange(len(value)):
+        item = value[i]
+        try:
+            key = keys[i]
+        except IndexError:
+            key = str(i) + "\x00"
+        _encoder(item)(parts, key, item, check_keys)
+    parts.append("\x00")
+    _fill_length(parts, start)
+
+
+def _encode_binary(parts, name, value, check_keys):
+    subtype = value.subtype
+    if subtype == 2:
+        value = _PACK_INT(len(value)) + value
+    parts.extend(("\x05", name, _PACK_INT(len(value)), chr(subtype), value))
+
+
+def _encode_uuid(parts, name, value, check_keys):
+    parts.extend(("\x05", name, "\x10\x00\x00\x00\x03", value.bytes))
+
+
+def _encode_code(parts, name, value, check_keys):
+    cstring = _make_c_string(value)
+    scope = _dict_to_bson(value.scope, False, False)
+    parts.extend(("\x0F", name,
+                  _PACK_INT(8 + len(cstring) + len(scope)),
+                  _PACK_INT(len(cstring)), cstring, scope))
+
+
+def _encode_objectid(parts, name, value, check_keys):
+    parts.extend(("\x07", name, value.binary))
+
+
+def _encode_bool(parts, name, value, check_keys):
+    parts.extend(("\x08", name, value and "\x01" or "\x00"))
+
+
+def _encode_int(parts, name, value, check_keys):
+    if _MIN_INT32 <= value <= _MAX_INT32:
+        parts.extend(("\x10", name, _PACK_INT(value)))
+    elif _MIN_INT64 <= value <= _MAX_INT64:
+        parts.extend(("\x12", name, _PACK_LONG(value)))
+    else:
+        raise OverflowError("BSON can only handle up to 8-byte ints")
+
+
+def _datetime_to_millis(value):
+    """Get the milliseconds since the epoch of a datetime, in UTC if
+    it's timezone-aware.
+    """
+    if value.tzinfo is not None and value.utcoffset() is not None:
+        delta = value - _EPOCH_AWARE
+    else:
+        delta = value - _EPOCH_NAIVE
+    return ((delta.days * 86400 + delta.seconds) * 1000 +
+            delta.microseconds // 1000)
+
+
+def _encode_datetime(parts, name, value, check_keys):
+    parts.extend(("\x09", name, _PACK_LONG(_datetime_to_millis(value))))
+
+
+def _encode_timestamp(parts, name, value, check_keys):
+    parts.extend(("\x11", name, _PACK_TIMESTAMP(value.inc, value.time)))
+
+
+def _encode_none(parts, name, value, check_keys):
+    parts.extend(("\x0A", name))
+
+
+def _encode_regex(parts, name, value, check_keys):
+    flags = ""
+    if value.flags & re.IGNORECASE:
+        flags += "i"
+    if value.flags & re.LOCALE:
+        flags += "l"
+    if value.flags & re.MULTILINE:
+        flags += "m"
+    if value.flags & re.DOTALL:
+        flags += "s"
+    if value.flags & re.UNICODE:
+        flags += "u"
+    if value.flags & re.VERBOSE:
+        flags += "x"
+    parts.extend(("\x0B", name, _make_c_string(value.pattern, True),
+                  _make_c_string(flags)))
+
+
+def _encode_dbref(parts, name, value, check_keys):
+    _encode_document(parts, name, value.as_doc(), False)
+
+
+def _encode_raw(parts, name, value, check_keys):
+    parts.extend(("\x03", name, value.raw))
+
+
+def _encode_minkey(parts, name, value, check_keys):
+    parts.extend(("\xFF", name))
+
+
+def _encode_maxkey(parts, name, value, check_keys):
+    parts.extend(("\x7F", name))
+
+
+# Encoders to try, in order, for instances of subclasses. Binary and
+# Code must come before str, and bool before int.
+_subclass_encoders = [
+    (float, _encode_float),
+    (Binary, _encode_binary),
+    (Code, _encode_code),
+    (basestring, _encode_string),
+    (dict, _encode_document),
+    ((list, tuple), _encode_list),
+    (ObjectId, _encode_objectid),
+    (bool, _encode_bool),
+    ((int, long), _encode_int),
+    (datetime.datetime, _encode_datetime),
+    (Timestamp, _encode_timestamp),
+    (RE_TYPE, _encode_regex),
+    (DBRef, _encode_dbref),
+    (RawBSONDocument, _encode_raw),
+    (MinKey, _encode_minkey),
+    (MaxKey, _encode_maxkey)]
+if _use_uuid:
+    _subclass_encoders.insert(0, (uuid.UUID, _encode_uuid))
+
+# Encoder for each type, looked up by the exact type of a value. Types
+# found to be subclasses of one in _subclass_encoders are added on first
+# use.
+_encoders = {
+    float: _encode_float,
+    Binary: _encode_binary,
+    Code: _encode_code,
+    str: _encode_string,
+    unicode: _encode_string,
+    dict: _encode_document,
+    SON: _encode_document,
+    list: _encode_list,
+    tuple: _encode_list,
+    ObjectId: _encode_objectid,
+    bool: _encode_bool,
+    int: _encode_int,
+    long: _encode_int,
+    datetime.datetime: _encode_datetime,
+    Timestamp: _encode_timestamp,
+    type(None): _encode_none,
+    RE_TYPE: _encode_regex,
+    DBRef: _encode_dbref,
+    RawBSONDocument: _encode_raw,
+    MinKey: _encode_minkey,
+    MaxKey: _encode_maxkey}
+if _use_uuid:
+    _encoders[uuid.UUID] = _encode_uuid
+
+
+def _encoder(value, custom=True):
+    """Get the encoding function for `value`, also trying the encoders
+    registered in :mod:`bson.codec` if `custom` is ``True``.
+    """
+    try:
+        return _encoders[type(value)]
+    except KeyError:
+        pass
+    if custom and type(value) in _custom_encoders:
+        return _encode_custom
+    for (types, encoder) in _subclass_encoders:
+        if isinstance(value, types):
+            _encoders[type(value)] = encoder
+            return encoder
+    if custom and _find_encoder(value) is not None:
+        return _encode_custom
+    raise InvalidDocument("cannot convert value of type %s to bson" %
+                          type(value))
+
+
+def _encode_custom(parts, name, value, check_keys):
+    """Encode `value` with the encoder registered for its type.
+
+    Never cached in _encoders, so that changes to the registry take
+    effect straight away.
+    """
+    new_value = _find_encoder(value)(value)
+    _encoder(new_value, False)(parts, name, new_value, check_keys)
+
+
+def _make_name(key, check_keys):
+    """Get the C string naming an element with key `key`.
+    """
     if not isinstance(key, basestring):
         raise InvalidDocument("documents must have only string keys, "
                               "key was %r" % key)
@@ -252,113 +588,50 @@ def _element_to_bson(key, value, check_keys):
         if "." in key:
             raise InvalidDocument("key %r must not contain '.'" % key)
 
-    name = _make_c_string(key, True)
-    if isinstance(value, float):
-        return "\x01" + name + struct.pack("<d", value)
-
-    # Use Binary w/ subtype 3 for UUID instances
-    try:
-        import uuid
+    return _make_c_string(key, True)
 
-        if isinstance(value, uuid.UUID):
-            value = Binary(value.bytes, subtype=3)
-    except ImportError:
-        pass
 
-    if isinstance(value, Binary):
-        subtype = value.subtype
-        if subtype == 2:
-            value = struct.pack("<i", len(value)) + value
-        return "\x05%s%s%s%s" % (name, struct.pack("<i", len(value)),
-                                 chr(subtype), value)
-    if isinstance(value, Code):
-        cstring = _make_c_string(value)
-        scope = _dict_to_bson(value.scope, False, False)
-        full_length = struct.pack("<i", 8 + len(cstring) + len(scope))
-        length = struct.pack("<i", len(cstring))
-        return "\x0F" + name + full_length + length + cstring + scope
-    if isinstance(value, str):
-        cstring = _make_c_string(value)
-        length = struct.pack("<i", len(cstring))
-        return "\x02" + name + length + cstring
-    if isinstance(value, unicode):
-        cstring = _make_c_string(value)
-        length = struct.pack("<i", len(cstring))
-        return "\x02" + name + length + cstring
-    if isinstance(value, dict):
-        return "\x03" + name + _dict_to_bson(value, check_keys, False)
-    if isinstance(value, (list, tuple)):
-        as_dict = SON(zip([str(i) for i in range(len(value))], value))
-        return "\x04" + name + _dict_to_bson(as_dict, check_keys, False)
-    if isinstance(value, ObjectId):
-        return "\x07" + name + value.binary
-    if value is True:
-        return "\x08" + name + "\x01"
-    if value is False:
-        return "\x08" + name + "\x00"
-    if isinstance(value, (int, long)):
-        # TODO this is a really ugly way to check for this...
-        if value > 2 ** 64 / 2 - 1 or value < -2 ** 64 / 2:
-            raise OverflowError("BSON can only handle up to 8-byte ints")
-        if value > 2 ** 32 / 2 - 1 or value < -2 ** 32 / 2:
-            return "\x12" + name + struct.pack("<q", value)
-        return "\x10" + name + struct.pack("<i", value)
-    if isinstance(value, datetime.datetime):
-        if value.utcoffset() is not None:
-            value = value - value.utcoffset()
-        millis = int(calendar.timegm(value.timetuple()) * 1000 +
-                     value.microsecond / 1000)
-        return "\x09" + name + struct.pack("<q", millis)
-    if isinstance(value, Timestamp):
-        time = struct.pack("<I", value.time)
-        inc = struct.pack("<I", value.inc)
-        return "\x11" + name + inc + time
-    if value is None:
-        return "\x0A" + name
-    if isinstance(value, RE_TYPE):
-        pattern = value.pattern
-        flags = ""
-        if value.flags & re.IGNORECASE:
-            flags += "i"
-        if value.flags & re.LOCALE:
-            flags += "l"
-        if value.flags & re.MULTILINE:
-            flags += "m"
-        if value.flags & re.DOTALL:
-            flags += "s"
-        if value.flags & re.UNICODE:
-            flags += "u"
-        if value.flags & re.VERBOSE:
-            flags += "x"
-        return "\x0B" + name + _make_c_string(pattern, True) + \
-            _make_c_string(flags)
-    if isinstance(value, DBRef):
-        return _element_to_bson(key, value.as_doc(), False)
-    if isinstance(value, MinKey):
-        return "\xFF" + name
-    if isinstance(value, MaxKey):
-        return "\x7F" + name
-
-    raise InvalidDocument("cannot convert value of type %s to bson" %
-                          type(value))
+def _fill_length(parts, start):
+    """Replace the placeholder at `start` with the length of the
+    document (or array) following it in `parts`.
+    """
+    length = 4
+    for part in parts[start + 1:]:
+        length += len(part)
+    parts[start] = _PACK_INT(length)
+    return length
 
 
-def _dict_to_bson(dict, check_keys, top_level=True):
+def _write_document(parts, document, check_keys, top_level):
+    """Append the parts of `document` to `parts`, returning its length.
+    """
+    if isinstance(document, RawBSONDocument):
+        parts.append(document.raw)
+        return len(document.raw)
+    start = len(parts)
+    parts.append(None)
     try:
-        elements = ""
-        if top_level and "_id" in dict:
-            elements += _element_to_bson("_id", dict["_id"], False)
-        for (key, value) in dict.iteritems():
+        if top_level and "_id" in document:
+            value = document["_id"]
+            _encoder(value)(parts, "_id\x00", value, False)
+        for (key, value) in document.iteritems():
             if not top_level or key != "_id":
-                elements += _element_to_bson(key, value, check_keys)
+                name = _make_name(key, check_keys)
+                _encoder(value)(parts, name, value, check_keys)
     except AttributeError:
-        raise TypeError("encoder expected a mapping type but got: %r" % dict)
+        raise TypeError("encoder expected a mapping type but got: %r" %
+                        document)
+    parts.append("\x00")
+    return _fill_length(parts, start)
+
 
-    length = len(elements) + 5
+def _dict_to_bson(dict, check_keys, top_level=True):
+    parts = []
+    length = _write_document(parts, dict, check_keys, top_level)
     if length > 4 * 1024 * 1024:
         raise InvalidDocument("document too large - BSON documents are"
                               "limited to 4 MB")
-    return struct.pack("<i", length) + elements + "\x00"
+    return "".join(parts)
 if _use_c:
     _dict_to_bson = _cbson._dict_to_bson
 
@@ -376,7 +649,7 @@ def _to_dicts(data, as_class=dict, tz_aware=True):
     return decode_all(data, as_class, tz_aware)
 
 
-def decode_all(data, as_class=dict, tz_aware=True):
+def decode_all(data, as_class=dict, tz_aware=True, dates_as_millis=False):
     """Decode BSON data to multiple documents.
 
     `data` must be a string of concatenated, valid, BSON-encoded
@@ -388,40 +661,455 @@ def decode_all(data, as_class=dict, tz_aware=True):
         documents
       - `tz_aware` (optional): if ``True``, return timezone-aware
         :class:`~datetime.datetime` instances
+      - `dates_as_millis` (optional): if ``True``, decode dates as
+        the number of milliseconds since the epoch (an :class:`int` or
+        :class:`long`) instead of :class:`~datetime.datetime` instances
 
+    .. versionchanged:: 1.10
+       Added the `dates_as_millis` parameter.
     .. versionadded:: 1.9
     """
     docs = []
-    while len(data):
-        (doc, data) = _bson_to_dict(data, as_class, tz_aware)
+    position = 0
+    end = len(data)
+    raw = _is_raw(as_class)
+    while position < end:
+        if raw:
+            start = position
+            position = _document_end(data, position) + 1
+            doc = _new_raw(as_class, data[start:position], tz_aware,
+                           dates_as_millis)
+        else:
+            (doc, position) = _get_document(data, position, as_class,
+                                            tz_aware, dates_as_millis)
         docs.append(doc)
     return docs
 if _use_c:
     decode_all = _cbson.decode_all
 
 
-def is_valid(bson):
+def _decode_at(data, position, as_class, tz_aware, dates_as_millis=False):
+    """Decode the document starting at `position` in `data`.
+
+    Returns the document and the position just past it.
+    """
+    try:
+        obj_size = _UNPACK_INT(data, position)[0]
+    except struct.error:
+        raise InvalidBSON("not enough data for a BSON document")
+    end = position + obj_size
+    document = str(data[position:end])
+    if obj_size < 5 or len(document) != obj_size:
+        raise InvalidBSON("objsize too large")
+    return (_bson_to_dict(document, as_class, tz_aware,
+                          dates_as_millis)[0], end)
+if _use_c:
+    _decode_at = _cbson._decode_at
+
+
+def decode_iter(data, as_class=dict, tz_aware=True, dates_as_millis=False):
+    """Decode BSON data to documents, one at a time.
+
+    Works like :meth:`decode_all`, but returns an iterator, so that the
+    decoded documents needn't all be in memory at once. `data` can be
+    any object supporting the buffer interface, like a
+    :class:`mmap.mmap` or a :class:`bytearray`.
+
+    Passing :class:`~bson.raw.RawBSONDocument` as `as_class` gives the
+    BSON data of each document (as its
+    :attr:`~bson.raw.RawBSONDocument.raw` attribute) without decoding
+    it.
+
+    :Parameters:
+      - `data`: BSON data
+      - `as_class` (optional): the class to use for the resulting
+        documents
+      - `tz_aware` (optional): if ``True``, return timezone-aware
+        :class:`~datetime.datetime` instances
+      - `dates_as_millis` (optional): if ``True``, decode dates as
+        the number of milliseconds since the epoch (an :class:`int` or
+        :class:`long`) instead of :class:`~datetime.datetime` instances
+
+    .. versionadded:: 1.10
+    """
+    position = 0
+    end = len(data)
+    while position < end:
+        (doc, position) = _decode_at(data, position, as_class, tz_aware,
+                                     dates_as_millis)
+        yield doc
+
+
+def _decode_file_chunks(file, as_class, tz_aware, dates_as_millis):
+    """Decode the documents read from `file` one at a time.
+    """
+    while True:
+        size_data = file.read(4)
+        if not size_data:
+            return
+        if len(size_data) != 4:
+            raise InvalidBSON("not enough data for a BSON document")
+        obj_size = _UNPACK_INT(size_data)[0]
+        if obj_size < 5:
+            raise InvalidBSON("objsize too small")
+        elements = file.read(obj_size - 4)
+        if len(elements) != obj_size - 4:
+            raise InvalidBSON("objsize too large")
+        yield _bson_to_dict(size_data + elements, as_class, tz_aware,
+                            dates_as_millis)[0]
+
+
+def decode_file_iter(path_or_file, as_class=dict, tz_aware=True,
+                     dates_as_millis=False):
+    """Decode the documents in a file of concatenated BSON documents,
+    like those written by ``mongodump``, one at a time.
+
+    A file given by its path is memory mapped. Documents are read from
+    a file object one by one, so it needn't be a regular file::
+
+      >>> for doc in decode_file_iter(sys.stdin):
+      ...     print doc["_id"]
+
+    Takes the same options as :meth:`decode_iter`.
+
+    :Parameters:
+      - `path_or_file`: the path of the file, or a file object open
+        for reading in binary mode
+      - `as_class` (optional): the class to use for the resulting
+        documents
+      - `tz_aware` (optional): if ``True``, return timezone-aware
+        :class:`~datetime.datetime` instances
+      - `dates_as_millis` (optional): if ``True``, decode dates as
+        the number of milliseconds since the epoch (an :class:`int` or
+        :class:`long`) instead of :class:`~datetime.datetime` instances
+
+    .. versionadded:: 1.10
+    """
+    if not isinstance(path_or_file, basestring):
+        for doc in _decode_file_chunks(path_or_file, as_class, tz_aware,
+                                       dates_as_millis):
+            yield doc
+        return
+
+    # Python 2.4 doesn't allow yield in try / finally, so the file and
+    # map are only closed here if all of the documents are read
+    file = open(path_or_file, "rb")
+    if os.fstat(file.fileno()).st_size == 0:
+        # can't map an empty file
+        file.close()
+        return
+    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    for doc in decode_iter(data, as_class, tz_aware, dates_as_millis):
+        yield doc
+    data.close()
+    file.close()
+
+
+def encode_into(buffer, document, offset=None, check_keys=False):
+    """Encode a document into a :class:`bytearray`.
+
+    The BSON for `document` is written to `buffer` starting at
+    `offset`, overwriting what was there, or appended if `offset` is
+    ``None``. `buffer` is grown as needed. Returns the offset just
+    past the end of the encoded document, so that a long-lived buffer
+    can be filled with documents without creating a string for each
+    one::
+
+      >>> buf = bytearray()
+      >>> end = encode_into(buf, {"a": 1})
+      >>> end = encode_into(buf, {"b": 2})
+      >>> decode_all(str(buf))
+      [{u'a': 1}, {u'b': 2}]
+
+    Requires Python 2.6 or later.
+
+    :Parameters:
+      - `buffer`: the :class:`bytearray` to encode into
+      - `document`: mapping type representing a document
+      - `offset` (optional): where to write the document
+      - `check_keys` (optional): check if keys start with '$' or
+        contain '.', raising :class:`~bson.errors.InvalidDocument` in
+        either case
+
+    .. versionadded:: 1.10
+    """
+    try:
+        if not isinstance(buffer, bytearray):
+            raise TypeError("buffer must be an instance of bytearray")
+    except NameError:
+        raise NotImplementedError("encode_into requires Python 2.6 "
+                                  "or later")
+    if offset is None:
+        offset = len(buffer)
+    elif offset < 0 or offset > len(buffer):
+        raise ValueError("offset must be between 0 and len(buffer)")
+    data = _dict_to_bson(document, check_keys)
+    end = offset + len(data)
+    buffer[offset:end] = data
+    return end
+if _use_c:
+    encode_into = _cbson.encode_into
+
+
+def encode_many(docs, check_keys=False):
+    """Encode a sequence of documents to concatenated BSON.
+
+    Returns a tuple of the BSON data for all of the documents, and a
+    list of the offset in that data where each document starts::
+
+      >>> (data, offsets) = encode_many([{"a": 1}, {"b": 2}])
+      >>> offsets
+      [0, 12]
+
+    :Parameters:
+      - `docs`: an iterable of mapping types representing documents
+      - `check_keys` (optional): check if keys start with '$' or
+        contain '.', raising :class:`~bson.errors.InvalidDocument` in
+        either case
+
+    .. versionadded:: 1.10
+    """
+    encoded = []
+    offsets = []
+    position = 0
+    for doc in docs:
+        data = _dict_to_bson(doc, check_keys)
+        encoded.append(data)
+        offsets.append(position)
+        position += len(data)
+    return ("".join(encoded), offsets)
+if _use_c:
+    encode_many = _cbson.encode_many
+
+
+_COLUMN_FORMATS = {"d": "<d", "q": "<q", "M": "<q", "i": "<i", "?": "<B",
+                   "O": "12s"}
+
+
+def _pack_column_value(code, value):
+    """Pack a decoded `value` for storage in a column of type `code`.
+
+    Returns ``None`` if `value` can't be stored in that kind of column.
+    """
+    if code == "O":
+        if not isinstance(value, ObjectId):
+            return None
+        value = value.binary
+    elif isinstance(value, datetime.datetime):
+        if code not in "qM":
+            return None
+        value = _datetime_to_millis(value)
+    elif code == "M" or not isinstance(value, (int, long, float)):
+        return None
+    elif code == "?" and not isinstance(value, bool):
+        return None
+    elif code in "qi" and isinstance(value, float):
+        return None
+    elif code == "i" and (value > 2 ** 31 - 1 or value < -2 ** 31):
+        return None
+    return struct.pack(_COLUMN_FORMATS[code], value)
+
+
+def _decode_columns(data, fields, codes):
+    """Extract typed columns from concatenated BSON documents.
+
+    `fields` is a tuple of UTF-8 encoded top-level field names and
+    `codes` a string holding the type code of each field's column. Returns
+    a list of (values, mask) string pairs, one per field: `values` holds
+    the packed little-endian values and `mask` one byte per document,
+    ``"\\x01"`` if the value was present and ``"\\x00"`` otherwise.
+    """
+    if len(fields) != len(codes):
+        raise ValueError("need exactly one type code per field")
+    for code in codes:
+        if code not in _COLUMN_FORMATS:
+            raise ValueError("unknown column type code %r" % code)
+    names = [name.decode("utf-8") for name in fields]
+    columns = [([], []) for _ in names]
+    for doc in decode_all(data, dict, False):
+        for (name, code, (values, mask)) in zip(names, codes, columns):
+            packed = None
+            if name in doc:
+                packed = _pack_column_value(code, doc[name])
+            if packed is None:
+                values.append("\x00" * struct.calcsize(_COLUMN_FORMATS[code]))
+                mask.append("\x00")
+            else:
+                values.append(packed)
+                mask.append("\x01")
+    return [("".join(values), "".join(mask)) for (values, mask) in columns]
+if _use_c:
+    _decode_columns = _cbson._decode_columns
+
+
+# Maximum depth of embedded documents accepted by the validator.
+_MAX_NESTING = 100
+
+
+def _is_utf8(string):
+    try:
+        unicode(string, "utf-8")
+        return True
+    except UnicodeError:
+        return False
+
+
+def _validate_string(data, position, size):
+    """Is the string value of `size` bytes (including its length) at
+    `position` properly terminated UTF-8?
+    """
+    return (size >= 5 and data[position + size - 1] == "\x00" and
+            _is_utf8(data[position + 4:position + size - 1]))
+
+
+def _validate_value(data, position, size, element_type, depth):
+    """Check the value of type `element_type` and size `size` starting at
+    `position`. Embedded documents and arrays are checked by
+    :func:`_validate_document`.
+    """
+    if element_type in ("\x02", "\x0D", "\x0E"):
+        return _validate_string(data, position, size)
+    if element_type == "\x05":
+        (length, subtype) = _UNPACK_LENGTH_SUBTYPE(data, position)
+        if subtype == 2:
+            return (length >= 4 and
+                    _UNPACK_INT(data, position + 5)[0] == length - 4)
+        if subtype == 3 and _use_uuid:
+            return length == 16
+        return length >= 0
+    if element_type == "\x0B":
+        pattern_end = data.index("\x00", position)
+        return (_is_utf8(data[position:pattern_end]) and
+                _is_utf8(data[pattern_end + 1:position + size - 1]))
+    if element_type == "\x0C":
+        return _validate_string(data, position, size - 12)
+    if element_type == "\x0F":
+        if size < 14:
+            return False
+        length = _UNPACK_INT(data, position + 4)[0]
+        if length < 1 or length > size - 13:
+            return False
+        scope = position + 8 + length
+        return (_validate_string(data, position + 4, length + 4) and
+                _validate_document(data, scope, position + size,
+                                   depth + 1) is None and
+                scope + _UNPACK_INT(data, scope)[0] == position + size)
+    return True
+
+
+def _validate_document(data, position, max, depth):
+    """Check the structure of the document starting at `position` that
+    must end by `max`.
+
+    Returns ``None`` if the document is valid, or the position of the
+    first error: the start of the document if its length is bad, its
+    last byte if that isn't a null, or else the start of the first bad
+    element (or of the first error in an embedded document).
+    """
+    if depth > _MAX_NESTING or max - position < 5:
+        return position
+    obj_size = _UNPACK_INT(data, position)[0]
+    if obj_size < 5 or obj_size > max - position:
+        return position
+    end = position + obj_size - 1
+    if data[end] != "\x00":
+        return end
+
+    position += 4
+    while position < end:
+        element = position
+        element_type = data[position]
+        name_end = data.find("\x00", position + 1, end)
+        if name_end == -1 or not _is_utf8(data[position + 1:name_end]):
+            return element
+        position = name_end + 1
+
+        if element_type in ("\x03", "\x04"):
+            error = _validate_document(data, position, end, depth + 1)
+            if error is not None:
+                return error
+            position += _UNPACK_INT(data, position)[0]
+            continue
+        try:
+            size = _value_end(data, position, element_type) - position
+        except (InvalidBSON, ValueError, struct.error):
+            return element
+        if (size < 0 or size > end - position or
+            not _validate_value(data, position, size, element_type, depth)):
+            return element
+        position += size
+    return None
+
+
+def _validate(data, multiple):
+    if multiple and not data:
+        return None
+    position = 0
+    end = len(data)
+    while True:
+        error = _validate_document(data, position, end, 1)
+        if error is not None:
+            return error
+        position += _UNPACK_INT(data, position)[0]
+        if not multiple or position >= end:
+            break
+    if position != end:
+        return position
+    return None
+if _use_c:
+    _validate = _cbson._validate
+
+
+def validate(bson, multiple=False):
+    """Find the first error in BSON data.
+
+    Checks the lengths, element types and UTF-8 strings of the
+    documents in `bson`, and that they aren't nested more than 100
+    deep, without decoding them. Returns ``None`` if `bson` is valid
+    :class:`BSON`, or the offset of the first error found: the start of
+    a document with a bad length, the end of a document that isn't
+    null, or the start of the first bad element.
+
+    Raises :class:`TypeError` if `bson` is not an instance of
+    :class:`str`.
+
+    :Parameters:
+      - `bson`: the data to be validated
+      - `multiple` (optional): if ``True``, `bson` can be any number of
+        concatenated documents, rather than exactly one
+
+    .. versionadded:: 1.10
+    """
+    if not isinstance(bson, str):
+        raise TypeError("BSON data must be an instance of a subclass of str")
+    return _validate(bson, multiple)
+
+
+def is_valid(bson, multiple=False):
     """Check that the given string represents valid :class:`BSON` data.
 
     Raises :class:`TypeError` if `bson` is not an instance of
     :class:`str`.  Returns ``True`` if `bson` is valid :class:`BSON`,
-    ``False`` otherwise.
+    ``False`` otherwise. See :meth:`validate` to find out where the
+    data is invalid.
 
     :Parameters:
       - `bson`: the data to be validated
+      - `multiple` (optional): if ``True``, `bson` can be any number of
+        concatenated documents, rather than exactly one
+
+    .. versionchanged:: 1.10
+       Added the `multiple` parameter. The data is checked without
+       being decoded.
     """
     if not isinstance(bson, str):
         raise TypeError("BSON data must be an instance of a subclass of str")
 
     # 4 MB limit
-    if len(bson) > 4 * 1024 * 1024:
+    if not multiple and len(bson) > 4 * 1024 * 1024:
         raise InvalidBSON("BSON documents are limited to 4MB")
 
-    try:
-        (_, remainder) = _bson_to_dict(bson, dict, True)
-        return remainder == ""
-    except:
-        return False
+    return _validate(bson, multiple) is None
 
 
 class BSON(str):
@@ -475,7 +1163,7 @@ class BSON(str):
                       DeprecationWarning)
         return self.decode(as_class, tz_aware)
 
-    def decode(self, as_class=dict, tz_aware=False):
+    def decode(self, as_class=dict, tz_aware=False, dates_as_millis=False):
         """Decode this BSON data.
 
         The default type to use for the resultant document is
@@ -495,10 +1183,17 @@ class BSON(str):
             document
           - `tz_aware` (optional): if ``True``, return timezone-aware
             :class:`~datetime.datetime` instances
+          - `dates_as_millis` (optional): if ``True``, decode dates as
+            the number of milliseconds since the epoch (an :class:`int`
+            or :class:`long`) instead of :class:`~datetime.datetime`
+            instances
 
+        .. versionchanged:: 1.10
+           Added the `dates_as_millis` parameter.
         .. versionadded:: 1.9
         """
-        (document, _) = _bson_to_dict(self, as_class, tz_aware)
+        (document, _) = _bson_to_dict(self, as_class, tz_aware,
+                                      dates_as_millis)
         return document
 
 
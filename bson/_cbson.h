@@ -27,6 +27,8 @@ typedef unsigned int Py_ssize_t;
 #define PY_SSIZE_T_MIN 0
 #endif
 
+int init_cbson_state(void);
+
 int buffer_write_bytes(buffer_t buffer, const char* data, int size);
 
 int write_dict(buffer_t buffer, PyObject* dict,
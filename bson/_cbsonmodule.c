@@ -26,19 +26,23 @@
 #include <datetime.h>
 
 #include "_cbson.h"
+#include "_cobjectid.h"
 #include "buffer.h"
-#include "time64.h"
 #include "encoding_helpers.h"
 
 static PyObject* Binary = NULL;
 static PyObject* Code = NULL;
 static PyObject* ObjectId = NULL;
+static PyObject* ObjectIdBase = NULL;
 static PyObject* DBRef = NULL;
 static PyObject* RECompile = NULL;
 static PyObject* UUID = NULL;
 static PyObject* Timestamp = NULL;
 static PyObject* MinKey = NULL;
 static PyObject* MaxKey = NULL;
+static PyObject* RawBSONDocument = NULL;
+static PyObject* CustomEncoders = NULL;
+static PyObject* BinaryDecoders = NULL;
 static PyObject* UTC = NULL;
 static PyTypeObject* REType = NULL;
 
@@ -89,38 +93,92 @@ static PyTypeObject* REType = NULL;
 
 
 static PyObject* elements_to_dict(const char* string, int max,
-                                  PyObject* as_class, unsigned char tz_aware);
+                                  PyObject* as_class, unsigned char tz_aware,
+                                  unsigned char dates_as_millis);
 
 /* Date stuff */
-static PyObject* datetime_from_millis(long long millis) {
-    int microseconds = (millis % 1000) * 1000;
-    Time64_T seconds = millis / 1000;
-    struct TM timeinfo;
-    gmtime64_r(&seconds, &timeinfo);
-
-    return PyDateTime_FromDateAndTime(timeinfo.tm_year + 1900,
-                                      timeinfo.tm_mon + 1,
-                                      timeinfo.tm_mday,
-                                      timeinfo.tm_hour,
-                                      timeinfo.tm_min,
-                                      timeinfo.tm_sec,
-                                      microseconds);
+
+#define MILLIS_PER_DAY 86400000LL
+
+/* Days since the epoch of 0001-01-01 and 9999-12-31, the range of
+ * datetime.datetime. */
+#define MIN_DATETIME_DAYS -719162
+#define MAX_DATETIME_DAYS 2932896
+
+#ifndef _PyDateTime_HAS_TZINFO
+#define _PyDateTime_HAS_TZINFO(o) (((_PyDateTime_BaseTZInfo*)(o))->hastzinfo)
+#endif
+
+/* Convert between dates of the proleptic Gregorian calendar and days
+ * since 1970-01-01, without going through struct tm. Years are counted
+ * in 400 year eras starting on March 1st, so that leap days end them. */
+static long long days_from_civil(int year, int month, int day) {
+    long long era;
+    int year_of_era, day_of_year, day_of_era;
+
+    year -= month <= 2;
+    era = (year >= 0 ? year : year - 399) / 400;
+    year_of_era = (int)(year - era * 400);
+    day_of_year = (153 * (month + (month > 2 ? -3 : 9)) + 2) / 5 + day - 1;
+    day_of_era = (year_of_era * 365 + year_of_era / 4 - year_of_era / 100 +
+                  day_of_year);
+    return era * 146097 + day_of_era - 719468;
+}
+
+static void civil_from_days(long long days, int* year, int* month, int* day) {
+    long long era;
+    int day_of_era, year_of_era, day_of_year, month_index;
+
+    days += 719468;
+    era = (days >= 0 ? days : days - 146096) / 146097;
+    day_of_era = (int)(days - era * 146097);
+    year_of_era = (day_of_era - day_of_era / 1460 + day_of_era / 36524 -
+                   day_of_era / 146096) / 365;
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era / 4 -
+                                year_of_era / 100);
+    month_index = (5 * day_of_year + 2) / 153;
+    *day = day_of_year - (153 * month_index + 2) / 5 + 1;
+    *month = month_index < 10 ? month_index + 3 : month_index - 9;
+    *year = (int)(year_of_era + era * 400) + (*month <= 2);
+}
+
+/* Returns a new reference to a datetime, set to UTC if `tz_aware` is
+ * true, or NULL with a ValueError set if it's out of range. */
+static PyObject* datetime_from_millis(long long millis,
+                                      unsigned char tz_aware) {
+    long long days = millis / MILLIS_PER_DAY;
+    int millis_of_day = (int)(millis % MILLIS_PER_DAY);
+    int year, month, day;
+
+    if (millis_of_day < 0) {
+        millis_of_day += MILLIS_PER_DAY;
+        days--;
+    }
+    if (days < MIN_DATETIME_DAYS || days > MAX_DATETIME_DAYS) {
+        PyErr_SetString(PyExc_ValueError, "year is out of range");
+        return NULL;
+    }
+    civil_from_days(days, &year, &month, &day);
+
+    return PyDateTimeAPI->DateTime_FromDateAndTime(
+        year, month, day,
+        millis_of_day / 3600000,
+        millis_of_day / 60000 % 60,
+        millis_of_day / 1000 % 60,
+        millis_of_day % 1000 * 1000,
+        tz_aware ? UTC : Py_None,
+        PyDateTimeAPI->DateTimeType);
 }
 
 static long long millis_from_datetime(PyObject* datetime) {
-    struct TM timeinfo;
-    long long millis;
-
-    timeinfo.tm_year = PyDateTime_GET_YEAR(datetime) - 1900;
-    timeinfo.tm_mon = PyDateTime_GET_MONTH(datetime) - 1;
-    timeinfo.tm_mday = PyDateTime_GET_DAY(datetime);
-    timeinfo.tm_hour = PyDateTime_DATE_GET_HOUR(datetime);
-    timeinfo.tm_min = PyDateTime_DATE_GET_MINUTE(datetime);
-    timeinfo.tm_sec = PyDateTime_DATE_GET_SECOND(datetime);
-
-    millis = timegm64(&timeinfo) * 1000;
-    millis += PyDateTime_DATE_GET_MICROSECOND(datetime) / 1000;
-    return millis;
+    long long days = days_from_civil(PyDateTime_GET_YEAR(datetime),
+                                     PyDateTime_GET_MONTH(datetime),
+                                     PyDateTime_GET_DAY(datetime));
+    return (days * MILLIS_PER_DAY +
+            PyDateTime_DATE_GET_HOUR(datetime) * 3600000 +
+            PyDateTime_DATE_GET_MINUTE(datetime) * 60000 +
+            PyDateTime_DATE_GET_SECOND(datetime) * 1000 +
+            PyDateTime_DATE_GET_MICROSECOND(datetime) / 1000);
 }
 
 /* Just make this compatible w/ the old API. */
@@ -192,6 +250,9 @@ static int _reload_python_objects(void) {
         _reload_object(&Timestamp, "bson.timestamp", "Timestamp") ||
         _reload_object(&MinKey, "bson.min_key", "MinKey") ||
         _reload_object(&MaxKey, "bson.max_key", "MaxKey") ||
+        _reload_object(&RawBSONDocument, "bson.raw", "RawBSONDocument") ||
+        _reload_object(&CustomEncoders, "bson.codec", "_encoders") ||
+        _reload_object(&BinaryDecoders, "bson.codec", "_binary_decoders") ||
         _reload_object(&UTC, "bson.tz_util", "utc") ||
         _reload_object(&RECompile, "re", "compile")) {
         return 1;
@@ -201,18 +262,102 @@ static int _reload_python_objects(void) {
         UUID = NULL;
         PyErr_Clear();
     }
+    /* ObjectIds can be read and created directly when ObjectId is
+     * implemented in C. */
+    if (_reload_object(&ObjectIdBase, "bson._cobjectid", "_ObjectId")) {
+        ObjectIdBase = NULL;
+        PyErr_Clear();
+    } else if (!PyType_Check(ObjectId) ||
+               !PyType_IsSubtype((PyTypeObject*)ObjectId,
+                                 (PyTypeObject*)ObjectIdBase)) {
+        Py_DECREF(ObjectIdBase);
+        ObjectIdBase = NULL;
+    }
     /* Reload our REType hack too. */
     REType = PyObject_CallFunction(RECompile, "O",
                                    PyString_FromString(""))->ob_type;
     return 0;
 }
 
+/* Get the encoder registered in bson.codec for a base class of the
+ * type of `value`. (Encoders for the type itself are found before
+ * trying the slower checks in write_element_to_buffer.)
+ *
+ * Returns a new reference, or NULL (with an exception set on failure,
+ * or without one if there's no encoder). */
+static PyObject* find_custom_encoder(PyObject* value) {
+    PyObject* encoder;
+    PyObject* items;
+    Py_ssize_t i;
+
+    if (!PyDict_Size(CustomEncoders)) {
+        return NULL;
+    }
+    /* isinstance can run Python code, so loop over a copy */
+    items = PyDict_Items(CustomEncoders);
+    if (!items) {
+        return NULL;
+    }
+    for (i = 0; i < PyList_GET_SIZE(items); i++) {
+        PyObject* item = PyList_GET_ITEM(items, i);
+        int is_instance = PyObject_IsInstance(value,
+                                              PyTuple_GET_ITEM(item, 0));
+        if (is_instance == -1) {
+            Py_DECREF(items);
+            return NULL;
+        }
+        if (is_instance) {
+            encoder = PyTuple_GET_ITEM(item, 1);
+            Py_INCREF(encoder);
+            Py_DECREF(items);
+            return encoder;
+        }
+    }
+    Py_DECREF(items);
+    return NULL;
+}
+
+static int write_element_to_buffer(buffer_t buffer, int type_byte,
+                                   PyObject* value, unsigned char check_keys,
+                                   unsigned char first_attempt,
+                                   unsigned char allow_custom);
+
+/* Write `value` converted by `encoder`, a custom encoder from
+ * bson.codec. The converted value must not need a custom encoder.
+ *
+ * Returns 0 on failure. */
+static int write_custom_element(buffer_t buffer, int type_byte,
+                                PyObject* value, unsigned char check_keys,
+                                PyObject* encoder) {
+    PyObject* new_value;
+    int result;
+
+    Py_INCREF(encoder);
+    new_value = PyObject_CallFunctionObjArgs(encoder, value, NULL);
+    Py_DECREF(encoder);
+    if (!new_value) {
+        return 0;
+    }
+    result = write_element_to_buffer(buffer, type_byte, new_value,
+                                     check_keys, 1, 0);
+    Py_DECREF(new_value);
+    return result;
+}
+
 /* TODO our platform better be little-endian w/ 4-byte ints! */
 /* Write a single value to the buffer (also write it's type_byte, for which
  * space has already been reserved.
  *
+ * Values of types BSON can't represent are converted by the encoders
+ * registered in bson.codec if `allow_custom` is true.
+ *
  * returns 0 on failure */
-static int write_element_to_buffer(buffer_t buffer, int type_byte, PyObject* value, unsigned char check_keys, unsigned char first_attempt) {
+static int write_element_to_buffer(buffer_t buffer, int type_byte,
+                                   PyObject* value, unsigned char check_keys,
+                                   unsigned char first_attempt,
+                                   unsigned char allow_custom) {
+    PyObject* encoder;
+
     if (PyBool_Check(value)) {
         const long bool = PyInt_AsLong(value);
         const char c = bool ? 0x01 : 0x00;
@@ -285,7 +430,7 @@ static int write_element_to_buffer(buffer_t buffer, int type_byte, PyObject* val
             free(name);
 
             item_value = PySequence_GetItem(value, i);
-            if (!write_element_to_buffer(buffer, list_type_byte, item_value, check_keys, 1)) {
+            if (!write_element_to_buffer(buffer, list_type_byte, item_value, check_keys, 1, 1)) {
                 Py_DECREF(item_value);
                 return 0;
             }
@@ -299,6 +444,17 @@ static int write_element_to_buffer(buffer_t buffer, int type_byte, PyObject* val
         length = buffer_get_position(buffer) - start_position;
         memcpy(buffer_get_buffer(buffer) + length_location, &length, 4);
         return 1;
+    } else if (ObjectIdBase &&
+               PyObject_TypeCheck(value, (PyTypeObject*)ObjectIdBase)) {
+        /* checked before the slower isinstance checks below */
+        *(buffer_get_buffer(buffer) + type_byte) = 0x07;
+        return buffer_write_bytes(buffer, ((ObjectIdObject*)value)->oid, 12);
+    } else if (allow_custom && PyDict_Size(CustomEncoders) &&
+               (encoder = PyDict_GetItem(CustomEncoders,
+                                         (PyObject*)value->ob_type))) {
+        /* bson.codec doesn't allow registering the types handled below */
+        return write_custom_element(buffer, type_byte, value, check_keys,
+                                    encoder);
     } else if (PyObject_IsInstance(value, Binary)) {
         PyObject* subtype_object;
 
@@ -431,7 +587,16 @@ static int write_element_to_buffer(buffer_t buffer, int type_byte, PyObject* val
         return result;
     } else if (PyDateTime_Check(value)) {
         long long millis;
-        PyObject* utcoffset = PyObject_CallMethod(value, "utcoffset", NULL);
+        PyObject* utcoffset;
+        if (!_PyDateTime_HAS_TZINFO(value)) {
+            millis = millis_from_datetime(value);
+            *(buffer_get_buffer(buffer) + type_byte) = 0x09;
+            return buffer_write_bytes(buffer, (const char*)&millis, 8);
+        }
+        utcoffset = PyObject_CallMethod(value, "utcoffset", NULL);
+        if (!utcoffset) {
+            return 0;
+        }
         if (utcoffset != Py_None) {
             PyObject* result = PyNumber_Subtract(value, utcoffset);
             Py_DECREF(utcoffset);
@@ -588,13 +753,29 @@ static int write_element_to_buffer(buffer_t buffer, int type_byte, PyObject* val
         }
         *(buffer_get_buffer(buffer) + type_byte) = 0x0B;
         return 1;
+    } else if (PyObject_IsInstance(value, RawBSONDocument)) {
+        *(buffer_get_buffer(buffer) + type_byte) = 0x03;
+        return write_dict(buffer, value, check_keys, 0);
     } else if (PyObject_IsInstance(value, MinKey)) {
         *(buffer_get_buffer(buffer) + type_byte) = 0xFF;
         return 1;
     } else if (PyObject_IsInstance(value, MaxKey)) {
         *(buffer_get_buffer(buffer) + type_byte) = 0x7F;
         return 1;
-    } else if (first_attempt) {
+    }
+    if (allow_custom) {
+        encoder = find_custom_encoder(value);
+        if (encoder) {
+            int result = write_custom_element(buffer, type_byte, value,
+                                              check_keys, encoder);
+            Py_DECREF(encoder);
+            return result;
+        }
+        if (PyErr_Occurred()) {
+            return 0;
+        }
+    }
+    if (first_attempt) {
         /* Try reloading the modules and having one more go at it. */
         if (WARN(PyExc_RuntimeWarning, "couldn't encode - reloading python "
                  "modules and trying again. if you see this without getting "
@@ -606,7 +787,7 @@ static int write_element_to_buffer(buffer_t buffer, int type_byte, PyObject* val
         if (_reload_python_objects()) {
             return 0;
         }
-        return write_element_to_buffer(buffer, type_byte, value, check_keys, 0);
+        return write_element_to_buffer(buffer, type_byte, value, check_keys, 0, allow_custom);
     }
     {
         PyObject* errmsg = PyString_FromString("Cannot encode object: ");
@@ -668,7 +849,7 @@ int write_pair(buffer_t buffer, const char* name, Py_ssize_t name_length, PyObje
     if (!buffer_write_bytes(buffer, name, name_length + 1)) {
         return 0;
     }
-    if (!write_element_to_buffer(buffer, type_byte, value, check_keys, 1)) {
+    if (!write_element_to_buffer(buffer, type_byte, value, check_keys, 1, 1)) {
         return 0;
     }
     return 1;
@@ -737,7 +918,27 @@ int decode_and_write_pair(buffer_t buffer,
     return 1;
 }
 
-/* returns 0 on failure */
+/* Write the BSON data of a RawBSONDocument, as it is.
+ *
+ * Returns 0 on failure. */
+static int write_raw_document(buffer_t buffer, PyObject* document) {
+    int result;
+    PyObject* raw = PyObject_GetAttrString(document, "raw");
+    if (!raw) {
+        return 0;
+    }
+    if (!PyString_Check(raw)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "RawBSONDocument.raw must be an instance of str");
+        Py_DECREF(raw);
+        return 0;
+    }
+    result = buffer_write_bytes(buffer, PyString_AS_STRING(raw),
+                                (int)PyString_GET_SIZE(raw));
+    Py_DECREF(raw);
+    return result;
+}
+
 int write_dict(buffer_t buffer, PyObject* dict, unsigned char check_keys, unsigned char top_level) {
     PyObject* key;
     PyObject* iter;
@@ -746,8 +947,13 @@ int write_dict(buffer_t buffer, PyObject* dict, unsigned char check_keys, unsign
     int length_location;
 
     if (!PyDict_Check(dict)) {
-        PyObject* errmsg = PyString_FromString("encoder expected a mapping type but got: ");
-        PyObject* repr = PyObject_Repr(dict);
+        PyObject* errmsg;
+        PyObject* repr;
+        if (PyObject_IsInstance(dict, RawBSONDocument) == 1) {
+            return write_raw_document(buffer, dict);
+        }
+        errmsg = PyString_FromString("encoder expected a mapping type but got: ");
+        repr = PyObject_Repr(dict);
         PyString_ConcatAndDel(&errmsg, repr);
         PyErr_SetString(PyExc_TypeError, PyString_AsString(errmsg));
         Py_DECREF(errmsg);
@@ -837,8 +1043,153 @@ static PyObject* _cbson_dict_to_bson(PyObject* self, PyObject* args) {
     return result;
 }
 
+static PyObject* _cbson_encode_into(PyObject* self, PyObject* args,
+                                    PyObject* kwargs) {
+#if PY_VERSION_HEX >= 0x02060000
+    static char* kwlist[] = {"buffer", "document", "offset", "check_keys",
+                             NULL};
+    PyObject* target;
+    PyObject* dict;
+    PyObject* offset_obj = Py_None;
+    unsigned char check_keys = 0;
+    Py_ssize_t offset;
+    Py_ssize_t length;
+    Py_ssize_t end;
+    int size;
+    buffer_t buffer;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|Ob", kwlist,
+                                     &target, &dict, &offset_obj,
+                                     &check_keys)) {
+        return NULL;
+    }
+    if (!PyByteArray_Check(target)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "buffer must be an instance of bytearray");
+        return NULL;
+    }
+
+    length = PyByteArray_GET_SIZE(target);
+    if (offset_obj == Py_None) {
+        offset = length;
+    } else {
+        offset = PyInt_AsSsize_t(offset_obj);
+        if (offset == -1 && PyErr_Occurred()) {
+            return NULL;
+        }
+        if (offset < 0 || offset > length) {
+            PyErr_SetString(PyExc_ValueError,
+                            "offset must be between 0 and len(buffer)");
+            return NULL;
+        }
+    }
+
+    buffer = buffer_new();
+    if (!buffer) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    if (!write_dict(buffer, dict, check_keys, 1)) {
+        buffer_free(buffer);
+        return NULL;
+    }
+
+    size = buffer_get_position(buffer);
+    end = offset + size;
+    if (end > length && PyByteArray_Resize(target, end) < 0) {
+        buffer_free(buffer);
+        return NULL;
+    }
+    memcpy(PyByteArray_AS_STRING(target) + offset,
+           buffer_get_buffer(buffer), size);
+    buffer_free(buffer);
+    return PyInt_FromSsize_t(end);
+#else
+    PyErr_SetString(PyExc_NotImplementedError,
+                    "encode_into requires Python 2.6 or later");
+    return NULL;
+#endif
+}
+
+static PyObject* _cbson_encode_many(PyObject* self, PyObject* args,
+                                    PyObject* kwargs) {
+    static char* kwlist[] = {"docs", "check_keys", NULL};
+    PyObject* docs;
+    unsigned char check_keys = 0;
+    PyObject* iterator;
+    PyObject* doc;
+    PyObject* offsets;
+    PyObject* offset;
+    PyObject* result;
+    buffer_t buffer;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|b", kwlist,
+                                     &docs, &check_keys)) {
+        return NULL;
+    }
+
+    iterator = PyObject_GetIter(docs);
+    if (!iterator) {
+        return NULL;
+    }
+    offsets = PyList_New(0);
+    if (!offsets) {
+        Py_DECREF(iterator);
+        return NULL;
+    }
+    buffer = buffer_new();
+    if (!buffer) {
+        Py_DECREF(offsets);
+        Py_DECREF(iterator);
+        PyErr_NoMemory();
+        return NULL;
+    }
+
+    while ((doc = PyIter_Next(iterator)) != NULL) {
+        offset = PyInt_FromLong(buffer_get_position(buffer));
+        if (!offset || PyList_Append(offsets, offset) < 0 ||
+            !write_dict(buffer, doc, check_keys, 1)) {
+            Py_XDECREF(offset);
+            Py_DECREF(doc);
+            Py_DECREF(offsets);
+            Py_DECREF(iterator);
+            buffer_free(buffer);
+            return NULL;
+        }
+        Py_DECREF(offset);
+        Py_DECREF(doc);
+    }
+    Py_DECREF(iterator);
+    if (PyErr_Occurred()) {
+        Py_DECREF(offsets);
+        buffer_free(buffer);
+        return NULL;
+    }
+
+    result = Py_BuildValue("s#N", buffer_get_buffer(buffer),
+                           buffer_get_position(buffer), offsets);
+    buffer_free(buffer);
+    return result;
+}
+
+/* Create an ObjectId from its 12 bytes, without calling ObjectId's
+ * __init__ when it's implemented in C. */
+static PyObject* make_objectid(const char* bytes) {
+    PyObject* oid;
+    if (!ObjectIdBase) {
+        return PyObject_CallFunction(ObjectId, "s#", bytes, 12);
+    }
+    oid = ((PyTypeObject*)ObjectId)->tp_alloc((PyTypeObject*)ObjectId, 0);
+    if (!oid) {
+        return NULL;
+    }
+    memcpy(((ObjectIdObject*)oid)->oid, bytes, 12);
+    return oid;
+}
+
 static PyObject* get_value(const char* buffer, int* position, int type,
-                           PyObject* as_class, unsigned char tz_aware) {
+                           PyObject* as_class, unsigned char tz_aware,
+                           unsigned char dates_as_millis) {
     PyObject* value;
     switch (type) {
     case 1:
@@ -869,7 +1220,8 @@ static PyObject* get_value(const char* buffer, int* position, int type,
         {
             int size;
             memcpy(&size, buffer + *position, 4);
-            value = elements_to_dict(buffer + *position + 4, size - 5, as_class, tz_aware);
+            value = elements_to_dict(buffer + *position + 4, size - 5,
+                                     as_class, tz_aware, dates_as_millis);
             if (!value) {
                 return NULL;
             }
@@ -928,7 +1280,8 @@ static PyObject* get_value(const char* buffer, int* position, int type,
                 int type = (int)buffer[(*position)++];
                 int key_size = strlen(buffer + *position);
                 *position += key_size + 1; /* just skip the key, they're in order. */
-                to_append = get_value(buffer, position, type, as_class, tz_aware);
+                to_append = get_value(buffer, position, type, as_class,
+                                      tz_aware, dates_as_millis);
                 if (!to_append) {
                     return NULL;
                 }
@@ -990,6 +1343,21 @@ static PyObject* get_value(const char* buffer, int* position, int type,
                 Py_DECREF(data);
                 return NULL;
             }
+            if (subtype >= 128 && PyDict_Size(BinaryDecoders)) {
+                PyObject* decoder = PyDict_GetItem(BinaryDecoders, st);
+                if (decoder) {
+                    Py_INCREF(decoder);
+                    value = PyObject_CallFunctionObjArgs(decoder, data, NULL);
+                    Py_DECREF(decoder);
+                    Py_DECREF(st);
+                    Py_DECREF(data);
+                    if (!value) {
+                        return NULL;
+                    }
+                    *position += length + 5;
+                    break;
+                }
+            }
             value = PyObject_CallFunctionObjArgs(Binary, data, st, NULL);
             Py_DECREF(st);
             Py_DECREF(data);
@@ -1008,7 +1376,7 @@ static PyObject* get_value(const char* buffer, int* position, int type,
         }
     case 7:
         {
-            value = PyObject_CallFunction(ObjectId, "s#", buffer + *position, 12);
+            value = make_objectid(buffer + *position);
             if (!value) {
                 return NULL;
             }
@@ -1023,45 +1391,17 @@ static PyObject* get_value(const char* buffer, int* position, int type,
         }
     case 9:
         {
-            PyObject* replace;
-            PyObject* args;
-            PyObject* kwargs;
-            PyObject* naive = datetime_from_millis(*(long long*)(buffer + *position));
+            long long millis;
+            memcpy(&millis, buffer + *position, 8);
             *position += 8;
-            if (!tz_aware) { /* In the naive case, we're done here. */
-                value = naive;
-                break;
-            }
-
-            if (!naive) {
-                return NULL;
-            }
-            replace = PyObject_GetAttrString(naive, "replace");
-            Py_DECREF(naive);
-            if (!replace) {
-                return NULL;
-            }
-            args = PyTuple_New(0);
-            if (!args) {
-                Py_DECREF(replace);
-                return NULL;
-            }
-            kwargs = PyDict_New();
-            if (!kwargs) {
-                Py_DECREF(replace);
-                Py_DECREF(args);
-                return NULL;
+            if (dates_as_millis) {
+                value = PyLong_FromLongLong(millis);
+            } else {
+                value = datetime_from_millis(millis, tz_aware);
             }
-            if (PyDict_SetItemString(kwargs, "tzinfo", UTC) == -1) {
-                Py_DECREF(replace);
-                Py_DECREF(args);
-                Py_DECREF(kwargs);
+            if (!value) {
                 return NULL;
             }
-            value = PyObject_Call(replace, args, kwargs);
-            Py_DECREF(replace);
-            Py_DECREF(args);
-            Py_DECREF(kwargs);
             break;
         }
     case 11:
@@ -1111,7 +1451,7 @@ static PyObject* get_value(const char* buffer, int* position, int type,
                 return NULL;
             }
             *position += collection_length + 1;
-            id = PyObject_CallFunction(ObjectId, "s#", buffer + *position, 12);
+            id = make_objectid(buffer + *position);
             if (!id) {
                 Py_DECREF(collection);
                 return NULL;
@@ -1139,7 +1479,8 @@ static PyObject* get_value(const char* buffer, int* position, int type,
 
             memcpy(&scope_size, buffer + *position, 4);
             scope = elements_to_dict(buffer + *position + 4, scope_size - 5,
-                                     (PyObject*)&PyDict_Type, tz_aware);
+                                     (PyObject*)&PyDict_Type, tz_aware,
+                                     dates_as_millis);
             if (!scope) {
                 Py_DECREF(code);
                 return NULL;
@@ -1206,8 +1547,65 @@ static PyObject* get_value(const char* buffer, int* position, int type,
     return value;
 }
 
+/* Key names are decoded through a small cache, so that the documents in
+ * a result set share one unicode object per field name instead of each
+ * getting their own copy.
+ *
+ * The cache is a fixed size table indexed by a hash of the UTF-8 bytes
+ * of the key; a colliding key just replaces the old entry. Only short
+ * keys are cached. The table is only touched while holding the GIL. */
+#define KEY_CACHE_SIZE 1024
+#define KEY_CACHE_MAX_LENGTH 32
+
+typedef struct {
+    int length;
+    char bytes[KEY_CACHE_MAX_LENGTH];
+    PyObject* key;
+} key_cache_entry;
+
+static key_cache_entry key_cache[KEY_CACHE_SIZE];
+
+/* Get the key named by the `length` bytes of UTF-8 at `name`.
+ *
+ * Returns a new reference, or NULL with an exception set. */
+static PyObject* decode_key(const char* name, int length) {
+    unsigned int hash = 2166136261U;
+    key_cache_entry* entry;
+    PyObject* key;
+    PyObject* old;
+    int i;
+
+    if (length > KEY_CACHE_MAX_LENGTH) {
+        return PyUnicode_DecodeUTF8(name, length, "strict");
+    }
+    for (i = 0; i < length; i++) {
+        hash = (hash ^ (unsigned char)name[i]) * 16777619U;
+    }
+    entry = &key_cache[hash & (KEY_CACHE_SIZE - 1)];
+    if (entry->key && entry->length == length &&
+        memcmp(entry->bytes, name, length) == 0) {
+        Py_INCREF(entry->key);
+        return entry->key;
+    }
+
+    key = PyUnicode_DecodeUTF8(name, length, "strict");
+    if (!key) {
+        return NULL;
+    }
+    /* decoding can run arbitrary code (through the garbage collector),
+     * so only read the entry again now */
+    old = entry->key;
+    Py_INCREF(key);
+    entry->key = key;
+    entry->length = length;
+    memcpy(entry->bytes, name, length);
+    Py_XDECREF(old);
+    return key;
+}
+
 static PyObject* elements_to_dict(const char* string, int max,
-                                  PyObject* as_class, unsigned char tz_aware) {
+                                  PyObject* as_class, unsigned char tz_aware,
+                                  unsigned char dates_as_millis) {
     int position = 0;
     PyObject* dict = PyObject_CallObject(as_class, NULL);
     if (!dict) {
@@ -1216,13 +1614,14 @@ static PyObject* elements_to_dict(const char* string, int max,
     while (position < max) {
         int type = (int)string[position++];
         int name_length = strlen(string + position);
-        PyObject* name = PyUnicode_DecodeUTF8(string + position, name_length, "strict");
+        PyObject* name = decode_key(string + position, name_length);
         PyObject* value;
         if (!name) {
             return NULL;
         }
         position += name_length + 1;
-        value = get_value(string, &position, type, as_class, tz_aware);
+        value = get_value(string, &position, type, as_class, tz_aware,
+                          dates_as_millis);
         if (!value) {
             return NULL;
         }
@@ -1234,6 +1633,26 @@ static PyObject* elements_to_dict(const char* string, int max,
     return dict;
 }
 
+/* Decode the document of `size` bytes at `string`, or just wrap its
+ * data if `as_class` is RawBSONDocument (or a subclass of it). */
+static PyObject* decode_document(const char* string, int size,
+                                 PyObject* as_class, unsigned char tz_aware,
+                                 unsigned char dates_as_millis) {
+    if (PyType_Check(as_class) &&
+        PyType_IsSubtype((PyTypeObject*)as_class,
+                         (PyTypeObject*)RawBSONDocument)) {
+        if (dates_as_millis) {
+            return PyObject_CallFunction(as_class, "s#OO", string, size,
+                                         tz_aware ? Py_True : Py_False,
+                                         Py_True);
+        }
+        return PyObject_CallFunction(as_class, "s#O", string, size,
+                                     tz_aware ? Py_True : Py_False);
+    }
+    return elements_to_dict(string + 4, size - 5, as_class, tz_aware,
+                            dates_as_millis);
+}
+
 static PyObject* _cbson_bson_to_dict(PyObject* self, PyObject* args) {
     unsigned int size;
     Py_ssize_t total_size;
@@ -1241,11 +1660,13 @@ static PyObject* _cbson_bson_to_dict(PyObject* self, PyObject* args) {
     PyObject* bson;
     PyObject* as_class;
     unsigned char tz_aware;
+    unsigned char dates_as_millis = 0;
     PyObject* dict;
     PyObject* remainder;
     PyObject* result;
 
-    if (!PyArg_ParseTuple(args, "OOb", &bson, &as_class, &tz_aware)) {
+    if (!PyArg_ParseTuple(args, "OOb|b", &bson, &as_class, &tz_aware,
+                          &dates_as_millis)) {
         return NULL;
     }
 
@@ -1284,7 +1705,8 @@ static PyObject* _cbson_bson_to_dict(PyObject* self, PyObject* args) {
         return NULL;
     }
 
-    dict = elements_to_dict(string + 4, size - 5, as_class, tz_aware);
+    dict = decode_document(string, size, as_class, tz_aware,
+                           dates_as_millis);
     if (!dict) {
         return NULL;
     }
@@ -1299,7 +1721,8 @@ static PyObject* _cbson_bson_to_dict(PyObject* self, PyObject* args) {
     return result;
 }
 
-static PyObject* _cbson_decode_all(PyObject* self, PyObject* args) {
+static PyObject* _cbson_decode_all(PyObject* self, PyObject* args,
+                                   PyObject* kwargs) {
     unsigned int size;
     Py_ssize_t total_size;
     const char* string;
@@ -1308,11 +1731,15 @@ static PyObject* _cbson_decode_all(PyObject* self, PyObject* args) {
     PyObject* result;
     PyObject* as_class = (PyObject*)&PyDict_Type;
     unsigned char tz_aware = 1;
+    unsigned char dates_as_millis = 0;
+    static char* kwlist[] = {"data", "as_class", "tz_aware",
+                             "dates_as_millis", NULL};
 
-    if (!PyArg_ParseTuple(args, "O|Ob", &bson, &as_class, &tz_aware)) {
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|Obb", kwlist, &bson,
+                                     &as_class, &tz_aware,
+                                     &dates_as_millis)) {
         return NULL;
     }
-
     if (!PyString_Check(bson)) {
         PyErr_SetString(PyExc_TypeError, "argument to decode_all must be a string");
         return NULL;
@@ -1352,7 +1779,8 @@ static PyObject* _cbson_decode_all(PyObject* self, PyObject* args) {
             return NULL;
         }
 
-        dict = elements_to_dict(string + 4, size - 5, as_class, tz_aware);
+        dict = decode_document(string, size, as_class, tz_aware,
+                               dates_as_millis);
         if (!dict) {
             return NULL;
         }
@@ -1365,25 +1793,669 @@ static PyObject* _cbson_decode_all(PyObject* self, PyObject* args) {
     return result;
 }
 
+/* Decode the document starting at `position` in any object supporting
+ * the buffer interface (like an mmap), without copying its data.
+ *
+ * Returns a tuple of the document and the position just past it. */
+static PyObject* _cbson_decode_at(PyObject* self, PyObject* args) {
+    PyObject* data;
+    PY_LONG_LONG position;
+    PyObject* as_class;
+    unsigned char tz_aware;
+    unsigned char dates_as_millis = 0;
+    const char* string;
+    Py_ssize_t total_size;
+    int size;
+    PyObject* dict;
+
+    if (!PyArg_ParseTuple(args, "OLOb|b", &data, &position,
+                          &as_class, &tz_aware, &dates_as_millis)) {
+        return NULL;
+    }
+    if (PyObject_AsReadBuffer(data, (const void**)&string, &total_size)) {
+        return NULL;
+    }
+
+    if (position < 0 || total_size - position < 5) {
+        PyObject* InvalidBSON = _error("InvalidBSON");
+        PyErr_SetString(InvalidBSON,
+                        "not enough data for a BSON document");
+        Py_DECREF(InvalidBSON);
+        return NULL;
+    }
+    string += position;
+    memcpy(&size, string, 4);
+
+    if (size < 5 || total_size - position < size) {
+        PyObject* InvalidBSON = _error("InvalidBSON");
+        PyErr_SetString(InvalidBSON,
+                        "objsize too large");
+        Py_DECREF(InvalidBSON);
+        return NULL;
+    }
+
+    if (string[size - 1]) {
+        PyObject* InvalidBSON = _error("InvalidBSON");
+        PyErr_SetString(InvalidBSON,
+                        "bad eoo");
+        Py_DECREF(InvalidBSON);
+        return NULL;
+    }
+
+    dict = decode_document(string, size, as_class, tz_aware,
+                           dates_as_millis);
+    if (!dict) {
+        return NULL;
+    }
+    return Py_BuildValue("NL", dict, position + size);
+}
+
+/* Get the size of a value of BSON type `type` starting at `position`,
+ * where `max` is the position just past the end of the enclosing data.
+ * Lengths read from the data are compared with the space left (rather
+ * than added to `position`) so that huge lengths can't overflow.
+ *
+ * Returns -1 if the value is malformed or doesn't fit. */
+static int value_size(const char* buffer, int position, int max, int type) {
+    int size;
+    int length;
+
+    switch (type) {
+    case 1:
+    case 9:
+    case 17:
+    case 18:
+        size = 8;
+        break;
+    case 2:
+    case 13:
+    case 14:
+        if (position + 4 > max) {
+            return -1;
+        }
+        memcpy(&length, buffer + position, 4);
+        if (length < 1 || length > max - position - 4) {
+            return -1;
+        }
+        size = 4 + length;
+        break;
+    case 3:
+    case 4:
+    case 15:
+        if (position + 4 > max) {
+            return -1;
+        }
+        memcpy(&size, buffer + position, 4);
+        if (size < 5) {
+            return -1;
+        }
+        break;
+    case 5:
+        if (position + 5 > max) {
+            return -1;
+        }
+        memcpy(&length, buffer + position, 4);
+        if (length < 0 || length > max - position - 5) {
+            return -1;
+        }
+        size = 5 + length;
+        break;
+    case 6:
+    case 10:
+    case -1:
+    case 127:
+        size = 0;
+        break;
+    case 7:
+        size = 12;
+        break;
+    case 8:
+        size = 1;
+        break;
+    case 11:
+        {
+            const char* end = memchr(buffer + position, 0, max - position);
+            if (!end) {
+                return -1;
+            }
+            size = end - (buffer + position) + 1;
+            end = memchr(buffer + position + size, 0, max - position - size);
+            if (!end) {
+                return -1;
+            }
+            size = end - (buffer + position) + 1;
+            break;
+        }
+    case 12:
+        if (position + 4 > max) {
+            return -1;
+        }
+        memcpy(&length, buffer + position, 4);
+        if (length < 1 || length > max - position - 16) {
+            return -1;
+        }
+        size = 4 + length + 12;
+        break;
+    case 16:
+        size = 4;
+        break;
+    default:
+        return -1;
+    }
+    if (size < 0 || size > max - position) {
+        return -1;
+    }
+    return size;
+}
+
+/* Maximum depth of embedded documents accepted by the validator. */
+#define MAX_NESTING 100
+
+static int validate_document(const char* buffer, int position, int max,
+                             int depth);
+
+/* Is the string value of `size` bytes (including its length) at
+ * `position` properly terminated UTF-8? */
+static int validate_string(const char* buffer, int position, int size) {
+    if (size < 5 || buffer[position + size - 1]) {
+        return 0;
+    }
+    return check_string((const unsigned char*)buffer + position + 4,
+                        size - 5, 1, 0) == VALID;
+}
+
+/* Check the value of BSON type `type` and size `size` starting at
+ * `position`. Embedded documents and arrays are checked by
+ * validate_document.
+ *
+ * Returns 0 if the value is invalid. */
+static int validate_value(const char* buffer, int position, int size,
+                          int type, int depth) {
+    int length;
+
+    switch (type) {
+    case 2:
+    case 13:
+    case 14:
+        return validate_string(buffer, position, size);
+    case 5:
+        {
+            char subtype = buffer[position + 4];
+            memcpy(&length, buffer + position, 4);
+            if (subtype == 2) {
+                int length2;
+                if (length < 4) {
+                    return 0;
+                }
+                memcpy(&length2, buffer + position + 5, 4);
+                return length2 == length - 4;
+            }
+            if (subtype == 3 && UUID) {
+                return length == 16;
+            }
+            return 1;
+        }
+    case 11:
+        {
+            int pattern_length = strlen(buffer + position);
+            int flags_length = size - pattern_length - 2;
+            return (check_string((const unsigned char*)buffer + position,
+                                 pattern_length, 1, 0) == VALID &&
+                    check_string((const unsigned char*)buffer + position +
+                                 pattern_length + 1, flags_length,
+                                 1, 0) == VALID);
+        }
+    case 12:
+        return validate_string(buffer, position, size - 12);
+    case 15:
+        {
+            int scope_position;
+            int scope_size;
+            if (size < 14) {
+                return 0;
+            }
+            memcpy(&length, buffer + position + 4, 4);
+            if (length < 1 || length > size - 13) {
+                return 0;
+            }
+            scope_position = position + 8 + length;
+            if (!validate_string(buffer, position + 4, length + 4) ||
+                validate_document(buffer, scope_position, position + size,
+                                  depth + 1) != -1) {
+                return 0;
+            }
+            memcpy(&scope_size, buffer + scope_position, 4);
+            return scope_position + scope_size == position + size;
+        }
+    default:
+        return 1;
+    }
+}
+
+/* Check the structure of the document starting at `position` that must
+ * end by `max`: lengths, element types, UTF-8 and nesting, without
+ * creating any Python objects.
+ *
+ * Returns -1 if the document is valid, or the position of the first
+ * error: the start of the document if its length is bad, its last byte
+ * if that isn't a null, or else the start of the first bad element
+ * (or of the first error in an embedded document). */
+static int validate_document(const char* buffer, int position, int max,
+                             int depth) {
+    int size;
+    int end;
+
+    if (depth > MAX_NESTING || max - position < 5) {
+        return position;
+    }
+    memcpy(&size, buffer + position, 4);
+    if (size < 5 || size > max - position) {
+        return position;
+    }
+    end = position + size - 1;
+    if (buffer[end]) {
+        return end;
+    }
+
+    position += 4;
+    while (position < end) {
+        int element = position;
+        int type = (int)buffer[position++];
+        const char* name_end = memchr(buffer + position, 0, end - position);
+        int name_length;
+        int value_length;
+
+        if (!name_end) {
+            return element;
+        }
+        name_length = name_end - (buffer + position);
+        if (check_string((const unsigned char*)buffer + position,
+                         name_length, 1, 0) != VALID) {
+            return element;
+        }
+        position += name_length + 1;
+
+        if (type == 3 || type == 4) {
+            int error = validate_document(buffer, position, end, depth + 1);
+            if (error != -1) {
+                return error;
+            }
+            memcpy(&value_length, buffer + position, 4);
+        } else {
+            value_length = value_size(buffer, position, end, type);
+            if (value_length == -1 ||
+                !validate_value(buffer, position, value_length,
+                                type, depth)) {
+                return element;
+            }
+        }
+        position += value_length;
+    }
+    return -1;
+}
+
+static PyObject* _cbson_validate(PyObject* self, PyObject* args) {
+    PyObject* data;
+    unsigned char multiple;
+    const char* string;
+    Py_ssize_t total_size;
+    Py_ssize_t position = 0;
+
+    if (!PyArg_ParseTuple(args, "Ob", &data, &multiple)) {
+        return NULL;
+    }
+    if (PyObject_AsReadBuffer(data, (const void**)&string, &total_size)) {
+        return NULL;
+    }
+    if (multiple && !total_size) {
+        Py_RETURN_NONE;
+    }
+
+    do {
+        Py_ssize_t remaining = total_size - position;
+        int error;
+        int size;
+        if (remaining > INT_MAX) {
+            remaining = INT_MAX;
+        }
+        error = validate_document(string + position, 0, (int)remaining, 1);
+        if (error != -1) {
+            return PyLong_FromLongLong((PY_LONG_LONG)(position + error));
+        }
+        memcpy(&size, string + position, 4);
+        position += size;
+    } while (multiple && position < total_size);
+
+    if (position != total_size) {
+        return PyLong_FromLongLong((PY_LONG_LONG)position);
+    }
+    Py_RETURN_NONE;
+}
+
+/* Item sizes for the column type codes understood by _decode_columns. */
+static int column_item_size(char code) {
+    switch (code) {
+    case 'd':
+    case 'q':
+    case 'M':
+        return 8;
+    case 'i':
+        return 4;
+    case '?':
+        return 1;
+    case 'O':
+        return 12;
+    default:
+        return -1;
+    }
+}
+
+/* Write the value of type `type` at `value` into `buffer` as column type
+ * `code`.
+ *
+ * Returns 1 if the value was written, 0 if it isn't convertible to `code`
+ * (in which case nothing is written) and -1 on allocation failure. */
+static int write_column_value(buffer_t buffer, char code,
+                              int type, const char* value) {
+    switch (code) {
+    case 'd':
+        {
+            double d;
+            if (type == 1) {
+                memcpy(&d, value, 8);
+            } else if (type == 16) {
+                int i;
+                memcpy(&i, value, 4);
+                d = (double)i;
+            } else if (type == 18) {
+                long long ll;
+                memcpy(&ll, value, 8);
+                d = (double)ll;
+            } else if (type == 8) {
+                d = value[0] ? 1.0 : 0.0;
+            } else {
+                return 0;
+            }
+            return buffer_write(buffer, (const char*)&d, 8) ? -1 : 1;
+        }
+    case 'q':
+    case 'M':
+        {
+            long long ll;
+            if (type == 18 || type == 9) {
+                if (code == 'M' && type != 9) {
+                    return 0;
+                }
+                memcpy(&ll, value, 8);
+            } else if (type == 16 && code == 'q') {
+                int i;
+                memcpy(&i, value, 4);
+                ll = i;
+            } else if (type == 8 && code == 'q') {
+                ll = value[0] ? 1 : 0;
+            } else {
+                return 0;
+            }
+            return buffer_write(buffer, (const char*)&ll, 8) ? -1 : 1;
+        }
+    case 'i':
+        {
+            int i;
+            if (type == 16) {
+                memcpy(&i, value, 4);
+            } else if (type == 18) {
+                long long ll;
+                memcpy(&ll, value, 8);
+                i = (int)ll;
+                if (i != ll) {
+                    return 0;
+                }
+            } else if (type == 8) {
+                i = value[0] ? 1 : 0;
+            } else {
+                return 0;
+            }
+            return buffer_write(buffer, (const char*)&i, 4) ? -1 : 1;
+        }
+    case '?':
+        {
+            char c;
+            if (type != 8) {
+                return 0;
+            }
+            c = value[0] ? 1 : 0;
+            return buffer_write(buffer, &c, 1) ? -1 : 1;
+        }
+    case 'O':
+        if (type != 7) {
+            return 0;
+        }
+        return buffer_write(buffer, value, 12) ? -1 : 1;
+    }
+    return 0;
+}
+
+static PyObject* _cbson_decode_columns(PyObject* self, PyObject* args) {
+    const char* string;
+    int total_size;
+    PyObject* fields;
+    const char* codes;
+    int codes_length;
+    int field_count;
+    int i;
+    int position = 0;
+    const char** names = NULL;
+    int* name_lengths = NULL;
+    int* found = NULL;
+    buffer_t* values = NULL;
+    buffer_t* masks = NULL;
+    PyObject* result = NULL;
+    const char zeros[12] = {0};
+    const char one = 1;
+
+    if (!PyArg_ParseTuple(args, "s#O!s#", &string, &total_size,
+                          &PyTuple_Type, &fields, &codes, &codes_length)) {
+        return NULL;
+    }
+    field_count = PyTuple_Size(fields);
+    if (field_count != codes_length) {
+        PyErr_SetString(PyExc_ValueError,
+                        "need exactly one type code per field");
+        return NULL;
+    }
+    for (i = 0; i < field_count; i++) {
+        if (!PyString_Check(PyTuple_GET_ITEM(fields, i))) {
+            PyErr_SetString(PyExc_TypeError, "field names must be "
+                            "UTF-8 encoded instances of str");
+            return NULL;
+        }
+        if (column_item_size(codes[i]) == -1) {
+            PyErr_Format(PyExc_ValueError, "unknown column type code '%c'",
+                         codes[i]);
+            return NULL;
+        }
+    }
+
+    names = (const char**)PyMem_Malloc(sizeof(char*) * (field_count + 1));
+    name_lengths = (int*)PyMem_Malloc(sizeof(int) * (field_count + 1));
+    found = (int*)PyMem_Malloc(sizeof(int) * (field_count + 1));
+    values = (buffer_t*)PyMem_Malloc(sizeof(buffer_t) * (field_count + 1));
+    masks = (buffer_t*)PyMem_Malloc(sizeof(buffer_t) * (field_count + 1));
+    if (!names || !name_lengths || !found || !values || !masks) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    for (i = 0; i < field_count; i++) {
+        PyObject* name = PyTuple_GET_ITEM(fields, i);
+        names[i] = PyString_AS_STRING(name);
+        name_lengths[i] = PyString_GET_SIZE(name);
+        values[i] = NULL;
+        masks[i] = NULL;
+    }
+    for (i = 0; i < field_count; i++) {
+        values[i] = buffer_new();
+        masks[i] = buffer_new();
+        if (!values[i] || !masks[i]) {
+            PyErr_NoMemory();
+            goto done;
+        }
+    }
+
+    while (position < total_size) {
+        int size;
+        int end;
+
+        if (total_size - position < 5) {
+            PyObject* InvalidBSON = _error("InvalidBSON");
+            PyErr_SetString(InvalidBSON,
+                            "not enough data for a BSON document");
+            Py_DECREF(InvalidBSON);
+            goto done;
+        }
+        memcpy(&size, string + position, 4);
+        if (size < 5 || total_size - position < size ||
+            string[position + size - 1]) {
+            PyObject* InvalidBSON = _error("InvalidBSON");
+            PyErr_SetString(InvalidBSON, "invalid document length");
+            Py_DECREF(InvalidBSON);
+            goto done;
+        }
+        end = position + size - 1;
+        position += 4;
+
+        for (i = 0; i < field_count; i++) {
+            found[i] = 0;
+        }
+        while (position < end) {
+            int type = (int)string[position++];
+            const char* name = string + position;
+            const char* name_end = memchr(name, 0, end - position);
+            int name_length = 0;
+            int value_length = -1;
+
+            if (name_end) {
+                name_length = name_end - name;
+                position += name_length + 1;
+                value_length = value_size(string, position, end, type);
+            }
+            if (value_length == -1) {
+                PyObject* InvalidBSON = _error("InvalidBSON");
+                PyErr_SetString(InvalidBSON, "invalid element");
+                Py_DECREF(InvalidBSON);
+                goto done;
+            }
+            for (i = 0; i < field_count; i++) {
+                if (!found[i] && name_lengths[i] == name_length &&
+                    memcmp(names[i], name, name_length) == 0) {
+                    int status = write_column_value(values[i], codes[i],
+                                                    type, string + position);
+                    if (status == -1) {
+                        PyErr_NoMemory();
+                        goto done;
+                    }
+                    found[i] = status ? 1 : -1;
+                }
+            }
+            position += value_length;
+        }
+        position = end + 1;
+
+        /* Fill the gaps for missing (or unconvertible) values. */
+        for (i = 0; i < field_count; i++) {
+            if (found[i] != 1 &&
+                buffer_write(values[i], zeros, column_item_size(codes[i]))) {
+                PyErr_NoMemory();
+                goto done;
+            }
+            if (buffer_write(masks[i], found[i] == 1 ? &one : zeros, 1)) {
+                PyErr_NoMemory();
+                goto done;
+            }
+        }
+    }
+
+    result = PyList_New(field_count);
+    if (!result) {
+        goto done;
+    }
+    for (i = 0; i < field_count; i++) {
+        PyObject* column = Py_BuildValue("s#s#",
+                                         buffer_get_buffer(values[i]),
+                                         buffer_get_position(values[i]),
+                                         buffer_get_buffer(masks[i]),
+                                         buffer_get_position(masks[i]));
+        if (!column) {
+            Py_DECREF(result);
+            result = NULL;
+            goto done;
+        }
+        PyList_SET_ITEM(result, i, column);
+    }
+
+ done:
+    if (values && masks) {
+        for (i = 0; i < field_count; i++) {
+            if (values[i]) {
+                buffer_free(values[i]);
+            }
+            if (masks[i]) {
+                buffer_free(masks[i]);
+            }
+        }
+    }
+    PyMem_Free(names);
+    PyMem_Free(name_lengths);
+    PyMem_Free(found);
+    PyMem_Free(values);
+    PyMem_Free(masks);
+    return result;
+}
+
 static PyMethodDef _CBSONMethods[] = {
     {"_dict_to_bson", _cbson_dict_to_bson, METH_VARARGS,
      "convert a dictionary to a string containing it's BSON representation."},
+    {"encode_into", (PyCFunction)_cbson_encode_into,
+     METH_VARARGS | METH_KEYWORDS,
+     "encode a document into a bytearray."},
+    {"encode_many", (PyCFunction)_cbson_encode_many,
+     METH_VARARGS | METH_KEYWORDS,
+     "encode a sequence of documents to a string of concatenated BSON."},
     {"_bson_to_dict", _cbson_bson_to_dict, METH_VARARGS,
      "convert a BSON string to a SON object."},
-    {"decode_all", _cbson_decode_all, METH_VARARGS,
+    {"decode_all", (PyCFunction)_cbson_decode_all,
+     METH_VARARGS | METH_KEYWORDS,
      "convert binary data to a sequence of documents."},
+    {"_decode_at", _cbson_decode_at, METH_VARARGS,
+     "decode the document at a position in a buffer."},
+    {"_validate", _cbson_validate, METH_VARARGS,
+     "find the first error in BSON data."},
+    {"_decode_columns", _cbson_decode_columns, METH_VARARGS,
+     "extract typed columns from a sequence of BSON documents."},
     {NULL, NULL, 0, NULL}
 };
 
+/* Set up the datetime C API and cached Python objects used by this file.
+ *
+ * Every extension module that is linked against this file has its own
+ * copy of that state, so each one must call this from its init function.
+ *
+ * Returns non-zero on failure. */
+int init_cbson_state(void) {
+    PyDateTime_IMPORT;
+    if (!PyDateTimeAPI) {
+        return 1;
+    }
+    return _reload_python_objects();
+}
+
 PyMODINIT_FUNC init_cbson(void) {
     PyObject *m;
 
-    PyDateTime_IMPORT;
     m = Py_InitModule("_cbson", _CBSONMethods);
     if (m == NULL) {
         return;
     }
 
     // TODO we don't do any error checking here, should we be?
-    _reload_python_objects();
+    init_cbson_state();
 }
@@ -0,0 +1,33 @@
+/*
+ * Copyright 2009-2010 10gen, Inc.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+#ifndef _COBJECTID_H
+#define _COBJECTID_H
+
+#include <Python.h>
+
+/* The layout of instances of bson._cobjectid._ObjectId (the base class
+ * of bson.objectid.ObjectId), so that the C extensions can read and
+ * write their bytes directly. */
+typedef struct {
+    PyObject_HEAD
+    char oid[12];
+    /* the hex string of oid, created the first time it's needed */
+    PyObject* hex;
+    PyObject* weakreflist;
+} ObjectIdObject;
+
+#endif
@@ -0,0 +1,351 @@
+/*
+ * Copyright 2009-2010 10gen, Inc.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+/*
+ * This file contains a C implementation of the base class of
+ * bson.objectid.ObjectId. Instances hold their 12 bytes inline instead
+ * of in an instance dict, and new ids are generated without a lock:
+ * the counter is only touched while holding the GIL.
+ */
+
+#include <Python.h>
+#include <stddef.h>
+#include <time.h>
+
+#if defined(WIN32) || defined(_MSC_VER)
+#include <process.h>
+#define getpid _getpid
+#else
+#include <unistd.h>
+#endif
+
+#include "_cobjectid.h"
+
+#if PY_VERSION_HEX < 0x02050000 && !defined(PY_SSIZE_T_MIN)
+typedef int Py_ssize_t;
+#endif
+
+static const char hex_digits[] = "0123456789abcdef";
+
+/* Set by bson.objectid with _set_machine_bytes. */
+static char machine_bytes[3];
+static unsigned long inc = 0;
+
+static PyTypeObject ObjectIdType;
+
+/* Raise bson.errors.InvalidId for `oid`. */
+static void invalid_id(PyObject* oid) {
+    PyObject* errors = PyImport_ImportModule("bson.errors");
+    PyObject* InvalidId;
+    PyObject* repr;
+    if (!errors) {
+        return;
+    }
+    InvalidId = PyObject_GetAttrString(errors, "InvalidId");
+    Py_DECREF(errors);
+    if (!InvalidId) {
+        return;
+    }
+    repr = PyObject_Str(oid);
+    if (repr) {
+        PyErr_Format(InvalidId, "%s is not a valid ObjectId",
+                     PyString_AsString(repr));
+        Py_DECREF(repr);
+    }
+    Py_DECREF(InvalidId);
+}
+
+static int hex_value(char digit) {
+    if (digit >= '0' && digit <= '9') {
+        return digit - '0';
+    }
+    if (digit >= 'a' && digit <= 'f') {
+        return digit - 'a' + 10;
+    }
+    if (digit >= 'A' && digit <= 'F') {
+        return digit - 'A' + 10;
+    }
+    return -1;
+}
+
+static void generate(char* oid) {
+    unsigned long now = (unsigned long)time(NULL);
+    unsigned long pid = (unsigned long)getpid() % 0xFFFF;
+
+    oid[0] = (char)(now >> 24);
+    oid[1] = (char)(now >> 16);
+    oid[2] = (char)(now >> 8);
+    oid[3] = (char)now;
+    memcpy(oid + 4, machine_bytes, 3);
+    oid[7] = (char)(pid >> 8);
+    oid[8] = (char)pid;
+    oid[9] = (char)(inc >> 16);
+    oid[10] = (char)(inc >> 8);
+    oid[11] = (char)inc;
+    inc = (inc + 1) % 0xFFFFFF;
+}
+
+/* Set the bytes of `self` from `oid`, as ObjectId.__init__ does.
+ *
+ * Returns 0 on success. */
+static int set_oid(ObjectIdObject* self, PyObject* oid) {
+    const char* data;
+    Py_ssize_t length;
+    int i;
+
+    if (PyObject_TypeCheck(oid, &ObjectIdType)) {
+        memcpy(self->oid, ((ObjectIdObject*)oid)->oid, 12);
+        return 0;
+    }
+    if (PyUnicode_Check(oid)) {
+        int result;
+        PyObject* encoded = PyUnicode_AsASCIIString(oid);
+        if (!encoded) {
+            PyErr_Clear();
+            invalid_id(oid);
+            return -1;
+        }
+        result = set_oid(self, encoded);
+        Py_DECREF(encoded);
+        return result;
+    }
+    if (!PyString_Check(oid)) {
+        PyObject* type_repr = PyObject_Repr((PyObject*)oid->ob_type);
+        if (type_repr) {
+            PyErr_Format(PyExc_TypeError, "id must be an instance of (str, "
+                         "ObjectId), not %s", PyString_AsString(type_repr));
+            Py_DECREF(type_repr);
+        }
+        return -1;
+    }
+
+    data = PyString_AS_STRING(oid);
+    length = PyString_GET_SIZE(oid);
+    if (length == 12) {
+        memcpy(self->oid, data, 12);
+        return 0;
+    }
+    if (length != 24) {
+        invalid_id(oid);
+        return -1;
+    }
+    for (i = 0; i < 12; i++) {
+        int high = hex_value(data[2 * i]);
+        int low = hex_value(data[2 * i + 1]);
+        if (high == -1 || low == -1) {
+            invalid_id(oid);
+            return -1;
+        }
+        self->oid[i] = (char)(high << 4 | low);
+    }
+    return 0;
+}
+
+static int ObjectId_init(ObjectIdObject* self, PyObject* args,
+                         PyObject* kwargs) {
+    static char* kwlist[] = {"oid", NULL};
+    PyObject* oid = Py_None;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|O:ObjectId", kwlist,
+                                     &oid)) {
+        return -1;
+    }
+    Py_CLEAR(self->hex);
+    if (oid == Py_None) {
+        generate(self->oid);
+        return 0;
+    }
+    return set_oid(self, oid);
+}
+
+static void ObjectId_dealloc(ObjectIdObject* self) {
+    if (self->weakreflist) {
+        PyObject_ClearWeakRefs((PyObject*)self);
+    }
+    Py_XDECREF(self->hex);
+    self->ob_type->tp_free((PyObject*)self);
+}
+
+static PyObject* ObjectId_str(ObjectIdObject* self) {
+    if (!self->hex) {
+        char hex[24];
+        int i;
+        for (i = 0; i < 12; i++) {
+            unsigned char byte = (unsigned char)self->oid[i];
+            hex[2 * i] = hex_digits[byte >> 4];
+            hex[2 * i + 1] = hex_digits[byte & 0x0F];
+        }
+        self->hex = PyString_FromStringAndSize(hex, 24);
+        if (!self->hex) {
+            return NULL;
+        }
+    }
+    Py_INCREF(self->hex);
+    return self->hex;
+}
+
+static PyObject* ObjectId_repr(ObjectIdObject* self) {
+    PyObject* hex = ObjectId_str(self);
+    PyObject* repr;
+    if (!hex) {
+        return NULL;
+    }
+    repr = PyString_FromFormat("ObjectId('%s')", PyString_AS_STRING(hex));
+    Py_DECREF(hex);
+    return repr;
+}
+
+/* The same hash as the (non randomized) hash of the bytes as a str. */
+static long ObjectId_hash(ObjectIdObject* self) {
+    const unsigned char* p = (const unsigned char*)self->oid;
+    unsigned long x = *p << 7;
+    long result;
+    int i;
+    for (i = 0; i < 12; i++) {
+        x = (1000003 * x) ^ p[i];
+    }
+    x ^= 12;
+    result = (long)x;
+    return result == -1 ? -2 : result;
+}
+
+static PyObject* ObjectId_richcompare(PyObject* self, PyObject* other,
+                                      int op) {
+    int cmp;
+    int result;
+
+    if (!PyObject_TypeCheck(self, &ObjectIdType) ||
+        !PyObject_TypeCheck(other, &ObjectIdType)) {
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
+    }
+    cmp = memcmp(((ObjectIdObject*)self)->oid,
+                 ((ObjectIdObject*)other)->oid, 12);
+    switch (op) {
+    case Py_LT:
+        result = cmp < 0;
+        break;
+    case Py_LE:
+        result = cmp <= 0;
+        break;
+    case Py_EQ:
+        result = cmp == 0;
+        break;
+    case Py_NE:
+        result = cmp != 0;
+        break;
+    case Py_GT:
+        result = cmp > 0;
+        break;
+    default:
+        result = cmp >= 0;
+    }
+    return PyBool_FromLong(result);
+}
+
+static PyObject* ObjectId_get_binary(ObjectIdObject* self, void* closure) {
+    return PyString_FromStringAndSize(self->oid, 12);
+}
+
+static PyGetSetDef ObjectId_getset[] = {
+    {"binary", (getter)ObjectId_get_binary, NULL,
+     "12-byte binary representation of this ObjectId.", NULL},
+    /* the attribute holding the bytes in the pure Python version */
+    {"_ObjectId__id", (getter)ObjectId_get_binary, NULL, NULL, NULL},
+    {NULL}
+};
+
+static PyTypeObject ObjectIdType = {
+    PyObject_HEAD_INIT(NULL)
+    0,                                    /* ob_size */
+    "bson._cobjectid._ObjectId",          /* tp_name */
+    sizeof(ObjectIdObject),               /* tp_basicsize */
+    0,                                    /* tp_itemsize */
+    (destructor)ObjectId_dealloc,         /* tp_dealloc */
+    0,                                    /* tp_print */
+    0,                                    /* tp_getattr */
+    0,                                    /* tp_setattr */
+    0,                                    /* tp_compare */
+    (reprfunc)ObjectId_repr,              /* tp_repr */
+    0,                                    /* tp_as_number */
+    0,                                    /* tp_as_sequence */
+    0,                                    /* tp_as_mapping */
+    (hashfunc)ObjectId_hash,              /* tp_hash */
+    0,                                    /* tp_call */
+    (reprfunc)ObjectId_str,               /* tp_str */
+    0,                                    /* tp_getattro */
+    0,                                    /* tp_setattro */
+    0,                                    /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
+    "Base class of bson.objectid.ObjectId.", /* tp_doc */
+    0,                                    /* tp_traverse */
+    0,                                    /* tp_clear */
+    ObjectId_richcompare,                 /* tp_richcompare */
+    offsetof(ObjectIdObject, weakreflist), /* tp_weaklistoffset */
+    0,                                    /* tp_iter */
+    0,                                    /* tp_iternext */
+    0,                                    /* tp_methods */
+    0,                                    /* tp_members */
+    ObjectId_getset,                      /* tp_getset */
+    0,                                    /* tp_base */
+    0,                                    /* tp_dict */
+    0,                                    /* tp_descr_get */
+    0,                                    /* tp_descr_set */
+    0,                                    /* tp_dictoffset */
+    (initproc)ObjectId_init,              /* tp_init */
+};
+
+static PyObject* _cobjectid_set_machine_bytes(PyObject* self,
+                                              PyObject* args) {
+    const char* bytes;
+    int length;
+
+    if (!PyArg_ParseTuple(args, "s#", &bytes, &length)) {
+        return NULL;
+    }
+    if (length != 3) {
+        PyErr_SetString(PyExc_ValueError, "machine bytes must be 3 bytes");
+        return NULL;
+    }
+    memcpy(machine_bytes, bytes, 3);
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef _CObjectIdMethods[] = {
+    {"_set_machine_bytes", _cobjectid_set_machine_bytes, METH_VARARGS,
+     "set the machine portion of generated ObjectIds."},
+    {NULL, NULL, 0, NULL}
+};
+
+PyMODINIT_FUNC init_cobjectid(void) {
+    PyObject* m;
+
+    /* Use object's tp_new (rather than PyType_GenericNew), so that
+     * object.__new__ can create instances, as copy_reg does when
+     * unpickling ObjectIds pickled by older versions. */
+    ObjectIdType.tp_new = PyBaseObject_Type.tp_new;
+    if (PyType_Ready(&ObjectIdType) < 0) {
+        return;
+    }
+
+    m = Py_InitModule("_cobjectid", _CObjectIdMethods);
+    if (m == NULL) {
+        return;
+    }
+
+    Py_INCREF(&ObjectIdType);
+    PyModule_AddObject(m, "_ObjectId", (PyObject*)&ObjectIdType);
+}
@@ -21,16 +21,31 @@
 
 #define INITIAL_BUFFER_SIZE 256
 
+/* Freed buffers up to MAX_POOLED_BUFFER_SIZE bytes are kept for reuse,
+ * so that encoding a document doesn't usually need to allocate or grow
+ * a buffer. The pool isn't locked: all callers hold the GIL. */
+#define POOL_SIZE 8
+#define MAX_POOLED_BUFFER_SIZE (64 * 1024)
+
 struct buffer {
     char* buffer;
     int size;
     int position;
 };
 
+static buffer_t pool[POOL_SIZE];
+static int pool_count = 0;
+
 /* Allocate and return a new buffer.
  * Return NULL on allocation failure. */
 buffer_t buffer_new(void) {
     buffer_t buffer;
+    if (pool_count > 0) {
+        buffer = pool[--pool_count];
+        buffer->position = 0;
+        return buffer;
+    }
+
     buffer = (buffer_t)malloc(sizeof(struct buffer));
     if (buffer == NULL) {
         return NULL;
@@ -53,6 +68,10 @@ int buffer_free(buffer_t buffer) {
     if (buffer == NULL) {
         return 1;
     }
+    if (pool_count < POOL_SIZE && buffer->size <= MAX_POOLED_BUFFER_SIZE) {
+        pool[pool_count++] = buffer;
+        return 0;
+    }
     free(buffer->buffer);
     free(buffer);
     return 0;
@@ -71,8 +90,9 @@ static int buffer_grow(buffer_t buffer, int min_length) {
     }
     buffer->buffer = (char*)realloc(buffer->buffer, sizeof(char) * size);
     if (buffer->buffer == NULL) {
-        free(old_buffer);
-        free(buffer);
+        /* leave the buffer intact: the caller still owns it and will
+         * free it (possibly into the pool) */
+        buffer->buffer = old_buffer;
         return 1;
     }
     buffer->size = size;
@@ -117,7 +137,6 @@ int buffer_write(buffer_t buffer, const char* data, int size) {
 int buffer_write_at_position(buffer_t buffer, buffer_position position,
                              const char* data, int size) {
     if (position + size > buffer->size) {
-        buffer_free(buffer);
         return 1;
     }
 
@@ -17,19 +17,20 @@
 #ifndef BUFFER_H
 #define BUFFER_H
 
-/* Note: if any of these functions return a failure condition then the buffer
- * has already been freed. */
+/* Note: if any of these functions return a failure condition the buffer is
+ * left intact, and must still be freed by the caller. */
 
 /* A buffer */
 typedef struct buffer* buffer_t;
 /* A position in the buffer */
 typedef int buffer_position;
 
-/* Allocate and return a new buffer.
+/* Allocate and return a new buffer, reusing a freed one if possible.
  * Return NULL on allocation failure. */
 buffer_t buffer_new(void);
 
-/* Free the memory allocated for `buffer`.
+/* Free the memory allocated for `buffer`, or keep it for reuse by a later
+ * call to buffer_new.
  * Return non-zero on failure. */
 int buffer_free(buffer_t buffer);
 
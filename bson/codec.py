@@ -0,0 +1,136 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Encoding and decoding custom types.
+
+Register an encoder for a type BSON can't represent, and instances of
+that type (or of its subclasses) can be used in documents. The encoder
+turns each instance into a value BSON can represent::
+
+  >>> register_encoder(decimal.Decimal, str)
+  >>> db.prices.insert({"price": decimal.Decimal("9.99")})
+
+Registering a decoder for a user defined binary subtype turns binary
+data of that subtype back into a custom value when it's read::
+
+  >>> def encode_set(value):
+  ...     return Binary(cPickle.dumps(value), 128)
+  ...
+  >>> register_encoder(set, encode_set)
+  >>> register_binary_decoder(128, cPickle.loads)
+  >>> db.tags.insert({"tags": set(["a", "b"])})
+  >>> db.tags.find_one()["tags"]
+  set(['a', 'b'])
+
+The registry is only consulted for values that aren't of a type BSON
+already handles (encoders can't be registered for those types), so
+documents without custom values are encoded and decoded as quickly as
+before.
+
+.. versionadded:: 1.10
+"""
+
+import types
+
+from bson.binary import USER_DEFINED_SUBTYPE
+
+# Encoder for each registered type. These dicts are used directly by
+# the C extension, so they are changed in place and never replaced.
+_encoders = {}
+
+# Decoder for each registered binary subtype.
+_binary_decoders = {}
+
+
+def register_encoder(python_type, encoder):
+    """Encode instances of `python_type` with `encoder`.
+
+    `encoder` is called with each instance, and must return a value BSON
+    can represent without a custom encoder (a string, a
+    :class:`~bson.binary.Binary`, a :class:`dict`...). Replaces any
+    encoder already registered for `python_type`.
+
+    Raises :class:`ValueError` if BSON can already represent instances
+    of `python_type`.
+
+    :Parameters:
+      - `python_type`: the class to encode
+      - `encoder`: a callable taking an instance of `python_type`
+    """
+    if not isinstance(python_type, (type, types.ClassType)):
+        raise TypeError("python_type must be a class")
+    if not callable(encoder):
+        raise TypeError("encoder must be callable")
+    import bson
+    for (handled, _) in [(type(None), None)] + bson._subclass_encoders:
+        if issubclass(python_type, handled):
+            raise ValueError("%s can already be encoded" % python_type)
+    _encoders[python_type] = encoder
+
+
+def unregister_encoder(python_type):
+    """Stop encoding instances of `python_type` with a custom encoder.
+
+    Raises :class:`KeyError` if there's no encoder for `python_type`.
+
+    :Parameters:
+      - `python_type`: a class passed to :meth:`register_encoder`
+    """
+    del _encoders[python_type]
+
+
+def register_binary_decoder(subtype, decoder):
+    """Decode binary data of `subtype` with `decoder`.
+
+    `decoder` is called with the data (a :class:`str`) of each binary
+    value of `subtype` that is decoded, and returns the value to use in
+    its place. Only user defined subtypes (128 to 255) can have a
+    decoder. Replaces any decoder already registered for `subtype`.
+
+    :Parameters:
+      - `subtype`: a user defined binary subtype
+      - `decoder`: a callable taking a :class:`str`
+    """
+    if not isinstance(subtype, int):
+        raise TypeError("subtype must be an instance of int")
+    if subtype < USER_DEFINED_SUBTYPE or subtype > 255:
+        raise ValueError("subtype must be a user defined subtype "
+                         "(in [128, 256))")
+    if not callable(decoder):
+        raise TypeError("decoder must be callable")
+    _binary_decoders[subtype] = decoder
+
+
+def unregister_binary_decoder(subtype):
+    """Stop decoding binary data of `subtype` with a custom decoder.
+
+    Raises :class:`KeyError` if there's no decoder for `subtype`.
+
+    :Parameters:
+      - `subtype`: a subtype passed to :meth:`register_binary_decoder`
+    """
+    del _binary_decoders[subtype]
+
+
+def _find_encoder(value):
+    """Get the custom encoder for `value`, or ``None``.
+    """
+    try:
+        return _encoders[type(value)]
+    except KeyError:
+        pass
+    for (registered, encoder) in _encoders.items():
+        if isinstance(value, registered):
+            return encoder
+    return None
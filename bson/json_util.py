@@ -34,6 +34,10 @@ Example usage (deserialization)::
 Currently this does not handle special encoding and decoding for
 :class:`~bson.binary.Binary` and :class:`~bson.code.Code` instances.
 
+.. versionchanged:: 1.10
+   `default` encodes instances of custom types with the encoders
+   registered in :mod:`bson.codec`.
+
 .. versionchanged:: 1.9
    Handle :class:`uuid.UUID` instances, whenever possible.
 
@@ -59,6 +63,7 @@ try:
 except ImportError:
     _use_uuid = False
 
+from bson.codec import _find_encoder
 from bson.dbref import DBRef
 from bson.max_key import MaxKey
 from bson.min_key import MinKey
@@ -129,4 +134,7 @@ def default(obj):
         return {"t": obj.time, "i": obj.inc}
     if _use_uuid and isinstance(obj, uuid.UUID):
         return {"$uuid": obj.hex}
+    encoder = _find_encoder(obj)
+    if encoder is not None:
+        return encoder(obj)
     raise TypeError("%r is not JSON serializable" % obj)
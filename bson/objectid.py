@@ -17,6 +17,7 @@
 """
 
 import calendar
+import copy_reg
 import datetime
 try:
     import hashlib
@@ -24,15 +25,21 @@ try:
 except ImportError:  # for Python < 2.5
     import md5
     _md5func = md5.new
+import itertools
 import os
 import socket
 import struct
-import threading
 import time
 
 from bson.errors import InvalidId
 from bson.tz_util import utc
 
+try:
+    import _cobjectid
+    _use_c = True
+except ImportError:
+    _use_c = False
+
 
 def _machine_bytes():
     """Get the machine portion of an ObjectId.
@@ -41,39 +48,116 @@ def _machine_bytes():
     machine_hash.update(socket.gethostname())
     return machine_hash.digest()[0:3]
 
+_MACHINE_BYTES = _machine_bytes()
 
-class ObjectId(object):
-    """A MongoDB ObjectId.
-    """
+# Counter for the last 3 bytes of generated ObjectIds. Getting the next
+# value of an itertools.count is atomic, so no lock is needed.
+_inc = itertools.count()
 
-    _inc = 0
-    _inc_lock = threading.Lock()
 
-    _machine_bytes = _machine_bytes()
+class _ObjectIdBase(object):
+    """Pure Python implementation of the base class of
+    :class:`ObjectId`, replaced by the C extension when it's available.
+    """
+
+    __slots__ = ("_ObjectId__id", "__weakref__")
 
     def __init__(self, oid=None):
-        """Initialize a new ObjectId.
+        if oid is None:
+            self.__generate()
+        else:
+            self.__validate(oid)
 
-        If `oid` is ``None``, create a new (unique) ObjectId. If `oid`
-        is an instance of (``basestring``, :class:`ObjectId`) validate
-        it and use that.  Otherwise, a :class:`TypeError` is
-        raised. If `oid` is invalid,
-        :class:`~bson.errors.InvalidId` is raised.
+    def __generate(self):
+        """Generate a new value for this ObjectId.
+        """
+        self._ObjectId__id = "".join((
+            # 4 bytes current time
+            struct.pack(">i", int(time.time())),
+            # 3 bytes machine
+            _MACHINE_BYTES,
+            # 2 bytes pid
+            struct.pack(">H", os.getpid() % 0xFFFF),
+            # 3 bytes inc
+            struct.pack(">i", _inc.next() % 0xFFFFFF)[1:4]))
 
-        :Parameters:
-          - `oid` (optional): a valid ObjectId (12 byte binary or 24 character
-            hex string)
+    def __validate(self, oid):
+        """Validate and use the given id for this ObjectId.
 
-        .. versionadded:: 1.2.1
-           The `oid` parameter can be a ``unicode`` instance (that contains
-           only hexadecimal digits).
+        Raises TypeError if id is not an instance of (str, ObjectId) and
+        InvalidId if it is not a valid ObjectId.
 
-        .. mongodoc:: objectids
+        :Parameters:
+          - `oid`: a valid ObjectId
         """
-        if oid is None:
-            self.__generate()
+        if isinstance(oid, _ObjectIdBase):
+            self._ObjectId__id = oid._ObjectId__id
+        elif isinstance(oid, basestring):
+            if len(oid) == 12:
+                self._ObjectId__id = str(oid)
+            elif len(oid) == 24:
+                try:
+                    self._ObjectId__id = oid.decode("hex")
+                except (TypeError, UnicodeError):
+                    raise InvalidId("%s is not a valid ObjectId" % oid)
+            else:
+                raise InvalidId("%s is not a valid ObjectId" % oid)
         else:
-            self.__validate(oid)
+            raise TypeError("id must be an instance of (str, ObjectId), "
+                            "not %s" % type(oid))
+
+    @property
+    def binary(self):
+        """12-byte binary representation of this ObjectId.
+        """
+        return self._ObjectId__id
+
+    def __str__(self):
+        return self._ObjectId__id.encode("hex")
+
+    def __repr__(self):
+        return "ObjectId('%s')" % self._ObjectId__id.encode("hex")
+
+    def __cmp__(self, other):
+        if isinstance(other, _ObjectIdBase):
+            return cmp(self._ObjectId__id, other._ObjectId__id)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._ObjectId__id)
+
+if _use_c:
+    _cobjectid._set_machine_bytes(_MACHINE_BYTES)
+    _ObjectIdBase = _cobjectid._ObjectId
+
+
+class ObjectId(_ObjectIdBase):
+    """A MongoDB ObjectId.
+
+    If `oid` is ``None``, create a new (unique) ObjectId. If `oid`
+    is an instance of (``basestring``, :class:`ObjectId`) validate
+    it and use that.  Otherwise, a :class:`TypeError` is
+    raised. If `oid` is invalid,
+    :class:`~bson.errors.InvalidId` is raised.
+
+    :Parameters:
+      - `oid` (optional): a valid ObjectId (12 byte binary or 24 character
+        hex string)
+
+    .. versionchanged:: 1.10
+       Instances have no ``__dict__``, and are implemented in C when
+       the C extension is available.
+    .. versionadded:: 1.2.1
+       The `oid` parameter can be a ``unicode`` instance (that contains
+       only hexadecimal digits).
+
+    .. mongodoc:: objectids
+    """
+
+    __slots__ = ()
+
+    # documented here, but implemented by the base class
+    binary = _ObjectIdBase.binary
 
     @classmethod
     def from_datetime(cls, generation_time):
@@ -115,59 +199,6 @@ class ObjectId(object):
         oid = struct.pack(">i", int(ts)) + "\x00" * 8
         return cls(oid)
 
-    def __generate(self):
-        """Generate a new value for this ObjectId.
-        """
-        oid = ""
-
-        # 4 bytes current time
-        oid += struct.pack(">i", int(time.time()))
-
-        # 3 bytes machine
-        oid += ObjectId._machine_bytes
-
-        # 2 bytes pid
-        oid += struct.pack(">H", os.getpid() % 0xFFFF)
-
-        # 3 bytes inc
-        ObjectId._inc_lock.acquire()
-        oid += struct.pack(">i", ObjectId._inc)[1:4]
-        ObjectId._inc = (ObjectId._inc + 1) % 0xFFFFFF
-        ObjectId._inc_lock.release()
-
-        self.__id = oid
-
-    def __validate(self, oid):
-        """Validate and use the given id for this ObjectId.
-
-        Raises TypeError if id is not an instance of (str, ObjectId) and
-        InvalidId if it is not a valid ObjectId.
-
-        :Parameters:
-          - `oid`: a valid ObjectId
-        """
-        if isinstance(oid, ObjectId):
-            self.__id = oid.__id
-        elif isinstance(oid, basestring):
-            if len(oid) == 12:
-                self.__id = oid
-            elif len(oid) == 24:
-                try:
-                    self.__id = oid.decode("hex")
-                except TypeError:
-                    raise InvalidId("%s is not a valid ObjectId" % oid)
-            else:
-                raise InvalidId("%s is not a valid ObjectId" % oid)
-        else:
-            raise TypeError("id must be an instance of (str, ObjectId), "
-                            "not %s" % type(oid))
-
-    @property
-    def binary(self):
-        """12-byte binary representation of this ObjectId.
-        """
-        return self.__id
-
     @property
     def generation_time(self):
         """A :class:`datetime.datetime` instance representing the time of
@@ -182,23 +213,14 @@ class ObjectId(object):
 
         .. versionadded:: 1.2
         """
-        t = struct.unpack(">i", self.__id[0:4])[0]
+        t = struct.unpack(">i", self.binary[0:4])[0]
         return datetime.datetime.fromtimestamp(t, utc)
 
-    def __str__(self):
-        return self.__id.encode("hex")
-
-    def __repr__(self):
-        return "ObjectId('%s')" % self.__id.encode("hex")
-
-    def __cmp__(self, other):
-        if isinstance(other, ObjectId):
-            return cmp(self.__id, other.__id)
-        return NotImplemented
-
-    def __hash__(self):
-        """Get a hash value for this :class:`ObjectId`.
+    def __reduce__(self):
+        # pickle the way instances with a __dict__ were pickled, so
+        # that older versions can unpickle them
+        return (copy_reg._reconstructor, (self.__class__, object, None),
+                {"_ObjectId__id": self.binary})
 
-        .. versionadded:: 1.1
-        """
-        return hash(self.__id)
+    def __setstate__(self, state):
+        _ObjectIdBase.__init__(self, state["_ObjectId__id"])
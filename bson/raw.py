@@ -0,0 +1,188 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Documents kept as BSON and decoded a field at a time.
+
+Using :class:`RawBSONDocument` as the `document_class` of a connection
+(or the `as_class` of a query) skips decoding documents as they are
+read. A field is decoded the first time it is accessed, and a document
+that is inserted or used in an update is sent as it was read, without
+being encoded again::
+
+  >>> connection.document_class = RawBSONDocument
+  >>> page = db.pages.find_one()
+  >>> page["url"]  # only "url" is decoded
+  u'http://www.example.com/'
+  >>> db.archive.insert(page)  # sends page.raw
+
+Embedded documents are :class:`RawBSONDocument` instances too (even
+those representing a :class:`~bson.dbref.DBRef`).
+
+.. versionadded:: 1.10
+"""
+
+import struct
+from UserDict import DictMixin
+
+import bson
+from bson.errors import InvalidBSON
+
+# Size of the values of each fixed size type.
+_FIXED_SIZES = {"\x01": 8, "\x06": 0, "\x07": 12, "\x08": 1, "\x09": 8,
+                "\x0A": 0, "\x10": 4, "\x11": 8, "\x12": 8, "\xFF": 0,
+                "\x7F": 0}
+
+
+def _value_end(data, position, element_type):
+    """Get the position just past the value of type `element_type`
+    starting at `position`, without decoding it.
+    """
+    size = _FIXED_SIZES.get(element_type)
+    if size is not None:
+        return position + size
+    if element_type in ("\x02", "\x0D", "\x0E"):  # string, code, symbol
+        return position + 4 + bson._UNPACK_INT(data, position)[0]
+    if element_type in ("\x03", "\x04", "\x0F"):  # document, array, code
+        return position + bson._UNPACK_INT(data, position)[0]
+    if element_type == "\x05":  # binary
+        return position + 5 + bson._UNPACK_INT(data, position)[0]
+    if element_type == "\x0B":  # regex
+        return data.index("\x00", data.index("\x00", position) + 1) + 1
+    if element_type == "\x0C":  # dbpointer
+        return position + 16 + bson._UNPACK_INT(data, position)[0]
+    raise InvalidBSON("unknown element type %r" % element_type)
+
+
+class RawBSONDocument(DictMixin, object):
+    """A read-only mapping wrapping the BSON data of a document.
+
+    Where each field is in the data is found on first access, and the
+    value of a field is decoded the first time it's accessed.
+
+    :Parameters:
+      - `bson_bytes`: the BSON data of a single document
+      - `tz_aware` (optional): if ``True``, decode dates as
+        timezone-aware :class:`~datetime.datetime` instances
+      - `dates_as_millis` (optional): if ``True``, decode dates as
+        :class:`long` milliseconds since the epoch (`tz_aware` is
+        ignored)
+    """
+
+    def __init__(self, bson_bytes, tz_aware=False, dates_as_millis=False):
+        if not isinstance(bson_bytes, str):
+            raise TypeError("bson_bytes must be an instance of str")
+        if (len(bson_bytes) < 5 or
+            bson._UNPACK_INT(bson_bytes)[0] != len(bson_bytes) or
+            bson_bytes[-1] != "\x00"):
+            raise InvalidBSON("bad document length or eoo")
+        self.__raw = bson_bytes
+        self.__tz_aware = tz_aware
+        self.__dates_as_millis = dates_as_millis
+        # key -> (element type, element start, value start, value end)
+        self.__elements = None
+        self.__keys = None
+        self.__values = {}
+
+    @property
+    def raw(self):
+        """The BSON data of this document.
+        """
+        return self.__raw
+
+    def __index(self):
+        """Find where each element is, the first time it's needed.
+        """
+        if self.__elements is not None:
+            return self.__elements
+        data = self.__raw
+        end = len(data) - 1
+        elements = {}
+        keys = []
+        position = 4
+        try:
+            while position < end:
+                element_type = data[position]
+                name_end = data.index("\x00", position + 1)
+                key = unicode(data[position + 1:name_end], "utf-8")
+                value_end = _value_end(data, name_end + 1, element_type)
+                if key not in elements:
+                    keys.append(key)
+                elements[key] = (element_type, position, name_end + 1,
+                                 value_end)
+                position = value_end
+        except (ValueError, struct.error):
+            raise InvalidBSON()
+        if position != end:
+            raise InvalidBSON("bad object or element length")
+        self.__keys = keys
+        self.__elements = elements
+        return elements
+
+    def __decode(self, key):
+        (element_type, start, value_start, end) = self.__index()[key]
+        data = self.__raw
+        if element_type == "\x03":
+            return bson._new_raw(self.__class__, data[value_start:end],
+                                 self.__tz_aware, self.__dates_as_millis)
+        if element_type == "\x04":
+            array = bson._new_raw(self.__class__, data[value_start:end],
+                                  self.__tz_aware, self.__dates_as_millis)
+            return [array[index] for index in array]
+        # decode the element on its own
+        element = data[start:end]
+        document = bson._PACK_INT(len(element) + 5) + element + "\x00"
+        return bson._bson_to_dict(document, dict, self.__tz_aware,
+                                  self.__dates_as_millis)[0][key]
+
+    def __getitem__(self, key):
+        try:
+            return self.__values[key]
+        except KeyError:
+            value = self.__decode(key)
+            self.__values[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        raise TypeError("RawBSONDocument is read-only")
+
+    def __delitem__(self, key):
+        raise TypeError("RawBSONDocument is read-only")
+
+    def keys(self):
+        self.__index()
+        return list(self.__keys)
+
+    def __iter__(self):
+        self.__index()
+        return iter(self.__keys)
+
+    def __contains__(self, key):
+        return key in self.__index()
+
+    def has_key(self, key):
+        return key in self.__index()
+
+    def __len__(self):
+        return len(self.__index())
+
+    def __eq__(self, other):
+        if isinstance(other, RawBSONDocument):
+            return self.__raw == other.raw
+        return dict(self.iteritems()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "RawBSONDocument(%r)" % (self.__raw,)
@@ -122,6 +122,7 @@ static PyObject* _cbson_insert_message(PyObject* self, PyObject* args) {
     PyObject* last_error_args;
     buffer_t buffer;
     int length_location;
+    int message_length;
     PyObject* result;
 
     if (!PyArg_ParseTuple(args, "et#ObbO",
@@ -142,6 +143,7 @@ static PyObject* _cbson_insert_message(PyObject* self, PyObject* args) {
     // save space for message length
     length_location = buffer_save_space(buffer, 4);
     if (length_location == -1) {
+        buffer_free(buffer);
         PyMem_Free(collection_name);
         PyErr_NoMemory();
         return NULL;
@@ -178,8 +180,8 @@ static PyObject* _cbson_insert_message(PyObject* self, PyObject* args) {
         }
     }
 
-    memcpy(buffer_get_buffer(buffer) + length_location,
-           buffer_get_buffer(buffer) + buffer_get_position(buffer), 4);
+    message_length = buffer_get_position(buffer) - length_location;
+    memcpy(buffer_get_buffer(buffer) + length_location, &message_length, 4);
 
     if (safe) {
         if (!add_last_error(buffer, request_id, last_error_args)) {
@@ -210,6 +212,7 @@ static PyObject* _cbson_update_message(PyObject* self, PyObject* args) {
     int options;
     buffer_t buffer;
     int length_location;
+    int message_length;
     PyObject* result;
 
     if (!PyArg_ParseTuple(args, "et#bbOObO",
@@ -238,6 +241,7 @@ static PyObject* _cbson_update_message(PyObject* self, PyObject* args) {
     // save space for message length
     length_location = buffer_save_space(buffer, 4);
     if (length_location == -1) {
+        buffer_free(buffer);
         PyMem_Free(collection_name);
         PyErr_NoMemory();
         return NULL;
@@ -261,8 +265,80 @@ static PyObject* _cbson_update_message(PyObject* self, PyObject* args) {
 
     PyMem_Free(collection_name);
 
-    memcpy(buffer_get_buffer(buffer) + length_location,
-           buffer_get_buffer(buffer) + buffer_get_position(buffer), 4);
+    message_length = buffer_get_position(buffer) - length_location;
+    memcpy(buffer_get_buffer(buffer) + length_location, &message_length, 4);
+
+    if (safe) {
+        if (!add_last_error(buffer, request_id, last_error_args)) {
+            buffer_free(buffer);
+            return NULL;
+        }
+    }
+
+    /* objectify buffer */
+    result = Py_BuildValue("is#", request_id,
+                           buffer_get_buffer(buffer),
+                           buffer_get_position(buffer));
+    buffer_free(buffer);
+    return result;
+}
+
+static PyObject* _cbson_delete_message(PyObject* self, PyObject* args) {
+    /* NOTE just using a random number as the request_id */
+    int request_id = rand();
+    char* collection_name = NULL;
+    int collection_name_length;
+    PyObject* spec;
+    unsigned char safe;
+    PyObject* last_error_args;
+    buffer_t buffer;
+    int length_location;
+    int message_length;
+    PyObject* result;
+
+    if (!PyArg_ParseTuple(args, "et#ObO",
+                          "utf-8",
+                          &collection_name,
+                          &collection_name_length,
+                          &spec, &safe, &last_error_args)) {
+        return NULL;
+    }
+
+    buffer = buffer_new();
+    if (!buffer) {
+        PyErr_NoMemory();
+        PyMem_Free(collection_name);
+        return NULL;
+    }
+
+    // save space for message length
+    length_location = buffer_save_space(buffer, 4);
+    if (length_location == -1) {
+        buffer_free(buffer);
+        PyMem_Free(collection_name);
+        PyErr_NoMemory();
+        return NULL;
+    }
+    if (!buffer_write_bytes(buffer, (const char*)&request_id, 4) ||
+        !buffer_write_bytes(buffer,
+                            "\x00\x00\x00\x00"
+                            "\xd6\x07\x00\x00"
+                            "\x00\x00\x00\x00",
+                            12) ||
+        !buffer_write_bytes(buffer,
+                            collection_name,
+                            collection_name_length + 1) ||
+        !buffer_write_bytes(buffer, "\x00\x00\x00\x00", 4) ||
+        !write_dict(buffer, spec, 0, 1)) {
+        buffer_free(buffer);
+        PyMem_Free(collection_name);
+        return NULL;
+    }
+
+    PyMem_Free(collection_name);
+
+    message_length = buffer_get_position(buffer) - length_location;
+    memcpy(buffer_get_buffer(buffer) + length_location, &message_length, 4);
 
     if (safe) {
         if (!add_last_error(buffer, request_id, last_error_args)) {
@@ -291,6 +367,7 @@ static PyObject* _cbson_query_message(PyObject* self, PyObject* args) {
     PyObject* field_selector = Py_None;
     buffer_t buffer;
     int length_location;
+    int message_length;
     PyObject* result;
 
     if (!PyArg_ParseTuple(args, "Iet#iiO|O",
@@ -312,6 +389,7 @@ static PyObject* _cbson_query_message(PyObject* self, PyObject* args) {
     // save space for message length
     length_location = buffer_save_space(buffer, 4);
     if (length_location == -1) {
+        buffer_free(buffer);
         PyMem_Free(collection_name);
         PyErr_NoMemory();
         return NULL;
@@ -333,8 +411,8 @@ static PyObject* _cbson_query_message(PyObject* self, PyObject* args) {
 
     PyMem_Free(collection_name);
 
-    memcpy(buffer_get_buffer(buffer) + length_location,
-           buffer_get_buffer(buffer) + buffer_get_position(buffer), 4);
+    message_length = buffer_get_position(buffer) - length_location;
+    memcpy(buffer_get_buffer(buffer) + length_location, &message_length, 4);
 
     /* objectify buffer */
     result = Py_BuildValue("is#", request_id,
@@ -353,6 +431,7 @@ static PyObject* _cbson_get_more_message(PyObject* self, PyObject* args) {
     long long cursor_id;
     buffer_t buffer;
     int length_location;
+    int message_length;
     PyObject* result;
 
     if (!PyArg_ParseTuple(args, "et#iL",
@@ -373,6 +452,7 @@ static PyObject* _cbson_get_more_message(PyObject* self, PyObject* args) {
     // save space for message length
     length_location = buffer_save_space(buffer, 4);
     if (length_location == -1) {
+        buffer_free(buffer);
         PyMem_Free(collection_name);
         PyErr_NoMemory();
         return NULL;
@@ -394,8 +474,8 @@ static PyObject* _cbson_get_more_message(PyObject* self, PyObject* args) {
 
     PyMem_Free(collection_name);
 
-    memcpy(buffer_get_buffer(buffer) + length_location,
-           buffer_get_buffer(buffer) + buffer_get_position(buffer), 4);
+    message_length = buffer_get_position(buffer) - length_location;
+    memcpy(buffer_get_buffer(buffer) + length_location, &message_length, 4);
 
     /* objectify buffer */
     result = Py_BuildValue("is#", request_id,
@@ -410,6 +490,8 @@ static PyMethodDef _CMessageMethods[] = {
      "create an insert message to be sent to MongoDB"},
     {"_update_message", _cbson_update_message, METH_VARARGS,
      "create an update message to be sent to MongoDB"},
+    {"_delete_message", _cbson_delete_message, METH_VARARGS,
+     "create a delete message to be sent to MongoDB"},
     {"_query_message", _cbson_query_message, METH_VARARGS,
      "create a query message to be sent to MongoDB"},
     {"_get_more_message", _cbson_get_more_message, METH_VARARGS,
@@ -420,16 +502,16 @@ static PyMethodDef _CMessageMethods[] = {
 PyMODINIT_FUNC init_cmessage(void) {
     PyObject *m;
 
-    /* TODO is this necessary?
-     *
-     * We import _cbson here to make sure that it's init function has
-     * been run.
-     */
-    m = PyImport_ImportModule("bson._cbson");
-    Py_DECREF(m);
-
     m = Py_InitModule("_cmessage", _CMessageMethods);
     if (m == NULL) {
         return;
     }
+
+    /* This module is linked against its own copy of _cbsonmodule.c, so
+     * the statics used by the encoder need to be set up here too.
+     * Without this, encoding an ObjectId, datetime, etc. would crash.
+     */
+    if (init_cbson_state()) {
+        return;
+    }
 }
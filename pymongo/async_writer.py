@@ -0,0 +1,367 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Write-behind queue for fire-and-forget writes.
+
+An :class:`AsyncWriter` accepts unsafe inserts, updates and removes for
+a collection and returns as soon as the write is encoded and queued. A
+background thread sends queued writes to the server in batches, so a
+slow or stalled server doesn't stall the threads doing the writes::
+
+  >>> writer = db.events.async_writer(on_full="drop_oldest")
+  >>> writer.insert({"type": "click", "page": "/"})
+  ObjectId('...')
+  >>> writer.flush()
+  True
+
+Queued writes are sent when the interpreter exits, waiting at most a
+few seconds for a slow or unreachable server. Like any unsafe
+write, errors reported by the server are not seen by the client; only
+network errors are counted, in :attr:`AsyncWriter.failed`.
+
+.. versionadded:: 1.10
+"""
+
+import atexit
+import collections
+import sys
+import threading
+import time
+
+import bson
+from pymongo import message
+from pymongo.errors import (InvalidOperation,
+                            WriteQueueFull)
+
+# Maximum size of a batch of inserts sent as a single message.
+_MAX_INSERT_SIZE = 4 * 1024 * 1024
+
+_INSERT, _OTHER = range(2)
+
+_ON_FULL = ("block", "drop_oldest", "raise")
+
+# All writers that haven't been closed, closed when the interpreter exits.
+# Open writers are kept alive by their threads anyway, so these needn't
+# be weak references.
+_writers = {}
+
+# Seconds to wait at interpreter exit for all writers to send their
+# queued writes. Anything still queued after that is dropped.
+_EXIT_TIMEOUT = 5.0
+
+
+def _flush_all():
+    deadline = time.time() + _EXIT_TIMEOUT
+    for writer in _writers.values():
+        writer.close(max(deadline - time.time(), 0))
+atexit.register(_flush_all)
+
+
+class AsyncWriter(object):
+    """A queue of unsafe writes for a collection, sent by a background
+    thread.
+
+    Should not be created directly by application developers - see
+    :meth:`~pymongo.collection.Collection.async_writer` instead.
+    """
+
+    def __init__(self, collection, max_queue=10000, on_full="block",
+                 batch_size=1000):
+        if on_full not in _ON_FULL:
+            raise ValueError("on_full must be one of %r" % (_ON_FULL,))
+        if not isinstance(max_queue, int) or max_queue < 1:
+            raise ValueError("max_queue must be a positive int")
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError("batch_size must be a positive int")
+
+        self.__collection = collection
+        self.__max_queue = max_queue
+        self.__on_full = on_full
+        self.__batch_size = batch_size
+
+        self.__queue = collections.deque()
+        self.__condition = threading.Condition()
+        self.__in_flight = 0
+        self.__closed = False
+
+        self.__queued = 0
+        self.__sent = 0
+        self.__dropped = 0
+        self.__failed = 0
+        self.__last_error = None
+
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.setDaemon(True)
+        self.__thread.start()
+        _writers[id(self)] = self
+
+    @property
+    def collection(self):
+        """The :class:`~pymongo.collection.Collection` written to.
+        """
+        return self.__collection
+
+    @property
+    def pending(self):
+        """The number of writes waiting to be sent.
+        """
+        return len(self.__queue) + self.__in_flight
+
+    @property
+    def queued(self):
+        """The number of writes accepted by this writer.
+        """
+        return self.__queued
+
+    @property
+    def sent(self):
+        """The number of writes sent to the server.
+        """
+        return self.__sent
+
+    @property
+    def dropped(self):
+        """The number of writes dropped because the queue was full, or
+        because they were still queued when :meth:`close` timed out.
+        """
+        return self.__dropped
+
+    @property
+    def failed(self):
+        """The number of writes lost because of a network error.
+        """
+        return self.__failed
+
+    @property
+    def last_error(self):
+        """The last error raised while sending writes, or ``None``.
+        """
+        return self.__last_error
+
+    def __put(self, kind, data):
+        """Add an encoded write to the queue.
+        """
+        self.__condition.acquire()
+        try:
+            if self.__closed:
+                raise InvalidOperation("cannot write to a closed AsyncWriter")
+            if len(self.__queue) >= self.__max_queue:
+                if self.__on_full == "raise":
+                    raise WriteQueueFull("write queue is full")
+                elif self.__on_full == "drop_oldest":
+                    self.__queue.popleft()
+                    self.__dropped += 1
+                else:
+                    while (len(self.__queue) >= self.__max_queue and
+                           not self.__closed):
+                        self.__condition.wait()
+                    if self.__closed:
+                        raise InvalidOperation("cannot write to a closed "
+                                               "AsyncWriter")
+            self.__queue.append((kind, data))
+            self.__queued += 1
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+
+    def insert(self, doc_or_docs, manipulate=True, check_keys=True):
+        """Queue an insert of a document or documents.
+
+        Takes the same arguments as
+        :meth:`~pymongo.collection.Collection.insert`, except that the
+        insert is never safe. Returns the ``"_id"`` value(s) of the
+        inserted document(s) once the insert is queued.
+
+        Raises :class:`~pymongo.errors.WriteQueueFull` if the queue is
+        full and this writer was created with ``on_full="raise"``.
+        """
+        docs = doc_or_docs
+        return_one = False
+        if isinstance(docs, dict):
+            return_one = True
+            docs = [docs]
+
+        database = self.__collection.database
+        if manipulate:
+            docs = [database._fix_incoming(doc, self.__collection)
+                    for doc in docs]
+
+        (data, _) = bson.encode_many(docs, check_keys)
+        if not data:
+            raise InvalidOperation("cannot do an empty bulk insert")
+        self.__put(_INSERT, data)
+
+        ids = [doc.get("_id", None) for doc in docs]
+        if return_one:
+            return ids[0]
+        return ids
+
+    def update(self, spec, document, upsert=False, manipulate=False,
+               multi=False):
+        """Queue an update.
+
+        Takes the same arguments as
+        :meth:`~pymongo.collection.Collection.update`, except that the
+        update is never safe.
+        """
+        if not isinstance(spec, dict):
+            raise TypeError("spec must be an instance of dict")
+        if not isinstance(document, dict):
+            raise TypeError("document must be an instance of dict")
+        if upsert and manipulate:
+            document = self.__collection.database._fix_incoming(
+                document, self.__collection)
+
+        self.__put(_OTHER, message.update(self.__collection.full_name,
+                                          upsert, multi, spec, document,
+                                          False, {})[1])
+
+    def remove(self, spec_or_id=None):
+        """Queue a remove.
+
+        Takes the same arguments as
+        :meth:`~pymongo.collection.Collection.remove`, except that the
+        remove is never safe.
+        """
+        if spec_or_id is None:
+            spec_or_id = {}
+        if not isinstance(spec_or_id, dict):
+            spec_or_id = {"_id": spec_or_id}
+
+        self.__put(_OTHER, message.delete(self.__collection.full_name,
+                                          spec_or_id, False, {})[1])
+
+    def flush(self, timeout=None):
+        """Wait until all queued writes have been sent.
+
+        Returns ``True`` if the queue was emptied, or ``False`` if
+        `timeout` seconds passed first.
+
+        :Parameters:
+          - `timeout` (optional): maximum number of seconds to wait
+        """
+        deadline = timeout is not None and time.time() + timeout
+        self.__condition.acquire()
+        try:
+            while self.__queue or self.__in_flight:
+                if not self.__thread.isAlive():
+                    return False
+                if deadline:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self.__condition.wait(remaining)
+                else:
+                    self.__condition.wait()
+            return True
+        finally:
+            self.__condition.release()
+
+    def close(self, timeout=None):
+        """Send all queued writes and stop the background thread.
+
+        Writes can't be queued after calling this method. Writes that
+        are still queued when `timeout` passes are discarded, and
+        counted in :attr:`dropped`.
+
+        :Parameters:
+          - `timeout` (optional): maximum number of seconds to wait
+            for queued writes to be sent
+        """
+        _writers.pop(id(self), None)
+        self.__condition.acquire()
+        try:
+            self.__closed = True
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+        self.__thread.join(timeout)
+
+        self.__condition.acquire()
+        try:
+            self.__dropped += len(self.__queue)
+            self.__queue.clear()
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+
+    def __run(self):
+        connection = self.__collection.database.connection
+        try:
+            while True:
+                self.__condition.acquire()
+                try:
+                    while not self.__queue and not self.__closed:
+                        self.__condition.wait()
+                    if not self.__queue:
+                        return
+                    batch = []
+                    while self.__queue and len(batch) < self.__batch_size:
+                        batch.append(self.__queue.popleft())
+                    self.__in_flight = len(batch)
+                    self.__condition.notifyAll()
+                finally:
+                    self.__condition.release()
+
+                error = None
+                try:
+                    self.__send(connection, batch)
+                except Exception:
+                    error = sys.exc_info()[1]
+
+                self.__condition.acquire()
+                try:
+                    if error is None:
+                        self.__sent += len(batch)
+                    else:
+                        self.__failed += len(batch)
+                        self.__last_error = error
+                    self.__in_flight = 0
+                    self.__condition.notifyAll()
+                finally:
+                    self.__condition.release()
+        finally:
+            connection.end_request()
+
+    def __send(self, connection, batch):
+        """Send a batch of encoded writes as few messages as possible.
+
+        Runs of inserts are merged into single insert messages, and all
+        of the messages are sent together.
+        """
+        full_name = self.__collection.full_name
+        messages = []
+        inserts = []
+        size = 0
+        for (kind, data) in batch:
+            if inserts and (kind != _INSERT or
+                            size + len(data) > _MAX_INSERT_SIZE):
+                messages.append(message.insert_encoded(full_name,
+                                                       "".join(inserts),
+                                                       False, {})[1])
+                inserts = []
+                size = 0
+            if kind == _INSERT:
+                inserts.append(data)
+                size += len(data)
+            else:
+                messages.append(data)
+        if inserts:
+            messages.append(message.insert_encoded(full_name,
+                                                   "".join(inserts),
+                                                   False, {})[1])
+        try:
+            connection._send_message((0, "".join(messages)))
+        finally:
+            connection.result_cache.invalidate(full_name)
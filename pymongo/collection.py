@@ -16,15 +16,63 @@
 
 import warnings
 
+try:
+    import multiprocessing
+    _use_multiprocessing = True
+except ImportError:
+    _use_multiprocessing = False
+
+import bson
 from bson.code import Code
+from bson.raw import RawBSONDocument
 from bson.son import SON
 from pymongo import (helpers,
                      message)
+from pymongo.async_writer import AsyncWriter
+from pymongo.counter_aggregator import CounterAggregator
 from pymongo.cursor import Cursor
-from pymongo.errors import InvalidName
+from pymongo.errors import (AutoReconnect,
+                            ConfigurationError,
+                            InvalidName,
+                            InvalidOperation,
+                            ParallelInsertError)
+from pymongo.id_allocator import IdAllocator
+from pymongo.prepared import PreparedQuery
+from pymongo.tracked_document import TrackedDocument
+from pymongo.work_queue import WorkQueue
 
 _ZERO = "\x00\x00\x00\x00"
 
+# Send messages that are written back to back once they reach this size.
+_MAX_MESSAGES_SIZE = 4 * 1024 * 1024
+
+# keyword arguments to find_one() that can be handled without a Cursor
+_FIND_ONE_FAST_ARGS = frozenset(["fields", "as_class", "dates_as_millis",
+                                 "network_timeout", "_must_use_master",
+                                 "_is_command"])
+
+
+def _encode_documents(args):
+    """Encode a batch of documents for an insert.
+
+    Used by :meth:`Collection.insert_parallel` in worker processes.
+    """
+    (docs, check_keys) = args
+    return bson.encode_many(docs, check_keys)[0]
+
+
+def _chunks(iterable, size):
+    """Split `iterable` into lists of up to `size` items.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
 def _gen_index_name(keys):
     """Generate an index name from the set of fields it is over.
@@ -121,7 +169,7 @@ class Collection(object):
         :Parameters:
           - `name`: the name of the collection to get
         """
-        return Collection(self.__database, u"%s.%s" % (self.__name, name))
+        return self.__database[u"%s.%s" % (self.__name, name)]
 
     def __getitem__(self, name):
         return self.__getattr__(name)
@@ -201,7 +249,7 @@ class Collection(object):
 
         .. mongodoc:: insert
         """
-        if not isinstance(to_save, dict):
+        if not isinstance(to_save, (dict, RawBSONDocument)):
             raise TypeError("cannot save object of type %s" % type(to_save))
 
         if "_id" not in to_save:
@@ -211,6 +259,51 @@ class Collection(object):
                         manipulate, safe, **kwargs)
             return to_save.get("_id", None)
 
+    def save_changes(self, to_save, safe=False, **kwargs):
+        """Save the changes made to a tracked document.
+
+        If `to_save` is a
+        :class:`~pymongo.tracked_document.TrackedDocument` that was read
+        from this collection, only the fields that changed since it was
+        read (or last saved with this method) are sent, as a ``$set``
+        and ``$unset`` update. Nothing is sent if no fields changed.
+        Any other document is saved with :meth:`save`, and tracked from
+        then on if it is a
+        :class:`~pymongo.tracked_document.TrackedDocument`.
+
+        Unlike :meth:`save`, this method never overwrites changes made
+        by other clients to fields that weren't changed here. Returns
+        the ``"_id"`` of the saved document.
+
+        Raises :class:`~pymongo.errors.InvalidOperation` if the
+        ``"_id"`` of a tracked document was changed.
+
+        :Parameters:
+          - `to_save`: the document to be saved
+          - `safe` (optional): check that the save succeeded?
+          - `**kwargs` (optional): any additional arguments imply
+            ``safe=True``, and will be used as options for the
+            `getLastError` command
+
+        .. versionadded:: 1.10
+        """
+        if (not isinstance(to_save, TrackedDocument) or
+            not to_save.is_tracked or "_id" not in to_save):
+            _id = self.save(to_save, safe=safe, **kwargs)
+            if isinstance(to_save, TrackedDocument):
+                to_save.mark_clean()
+            return _id
+
+        changes = to_save.changes()
+        for modifier in changes.values():
+            if "_id" in modifier:
+                raise InvalidOperation("cannot change the _id of a "
+                                       "tracked document")
+        if changes:
+            self.update({"_id": to_save["_id"]}, changes, safe=safe, **kwargs)
+        to_save.mark_clean()
+        return to_save["_id"]
+
     def insert(self, doc_or_docs,
                manipulate=True, safe=False, check_keys=True, **kwargs):
         """Insert a document(s) into this collection.
@@ -223,6 +316,10 @@ class Collection(object):
         inserted documents.  If the document(s) does not already
         contain an ``"_id"`` one will be added.
 
+        A :class:`~bson.raw.RawBSONDocument` is sent as it is, without
+        being manipulated or checked, and the server adds an ``"_id"``
+        if it doesn't have one.
+
         If `safe` is ``True`` then the insert will be checked for
         errors, raising :class:`~pymongo.errors.OperationFailure` if
         one occurred. Safe inserts wait for a response from the
@@ -246,6 +343,8 @@ class Collection(object):
             ``safe=True``, and will be used as options for the
             `getLastError` command
 
+        .. versionchanged:: 1.10
+           Support for :class:`~bson.raw.RawBSONDocument`.
         .. versionadded:: 1.8
            Support for passing `getLastError` options as keyword
            arguments.
@@ -256,7 +355,7 @@ class Collection(object):
         """
         docs = doc_or_docs
         return_one = False
-        if isinstance(docs, dict):
+        if isinstance(docs, (dict, RawBSONDocument)):
             return_one = True
             docs = [docs]
 
@@ -265,12 +364,112 @@ class Collection(object):
 
         if kwargs:
             safe = True
-        self.__database.connection._send_message(
-            message.insert(self.__full_name, docs,
-                           check_keys, safe, kwargs), safe)
+        connection = self.__database.connection
+        try:
+            connection._send_message(
+                message.insert(self.__full_name, docs,
+                               check_keys, safe, kwargs), safe)
+        finally:
+            connection.result_cache.invalidate(self.__full_name)
 
         ids = [doc.get("_id", None) for doc in docs]
-        return return_one and ids[0] or ids
+        if return_one:
+            return ids[0]
+        return ids
+
+    def insert_parallel(self, docs, workers=4, batch_size=1000,
+                        manipulate=True, safe=False, check_keys=True,
+                        processes=0, **kwargs):
+        """Insert documents in batches sent on several sockets at once.
+
+        `docs` are split into batches of up to `batch_size`
+        documents. Each batch is encoded and sent as a separate bulk
+        insert by one of up to `workers` threads, each using its own
+        socket from the connection pool. If `processes` is greater
+        than ``0``, the batches are encoded by a
+        :mod:`multiprocessing` pool of that many processes instead,
+        which helps when encoding rather than the network is the
+        bottleneck. There is no ordering between batches.
+
+        Returns the ``"_id"`` values of the inserted documents, in the
+        same order as `docs`. If any batch fails a
+        :class:`~pymongo.errors.ParallelInsertError` is raised after
+        all batches have been tried; it lists the ids of the documents
+        in the batches that failed, with their errors, and of the ones
+        that were inserted.
+
+        :Parameters:
+          - `docs`: an iterable of documents to insert
+          - `workers` (optional): number of threads to send batches with
+          - `batch_size` (optional): maximum number of documents sent
+            in a single insert message
+          - `manipulate`, `safe`, `check_keys` and `**kwargs`
+            (optional): same as for :meth:`insert`, applied to each
+            batch
+          - `processes` (optional): number of processes to encode
+            batches with, requires :mod:`multiprocessing`
+
+        .. versionadded:: 1.10
+        """
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError("batch_size must be a positive int")
+        if processes and not _use_multiprocessing:
+            raise ConfigurationError("the multiprocessing module is "
+                                     "required to use processes")
+
+        if manipulate:
+            docs = [self.__database._fix_incoming(doc, self) for doc in docs]
+        else:
+            docs = list(docs)
+        if not docs:
+            raise InvalidOperation("cannot do an empty bulk insert")
+        batches = [docs[i:i + batch_size]
+                   for i in range(0, len(docs), batch_size)]
+
+        if processes:
+            pool = multiprocessing.Pool(processes)
+            try:
+                encoded = pool.map(_encode_documents,
+                                   [(batch, check_keys) for batch in batches])
+            finally:
+                pool.terminate()
+        else:
+            encoded = batches
+
+        if kwargs:
+            safe = True
+        connection = self.__database.connection
+
+        def send(batch):
+            if processes:
+                msg = message.insert_encoded(self.__full_name, batch,
+                                             safe, kwargs)
+            else:
+                msg = message.insert(self.__full_name, batch,
+                                     check_keys, safe, kwargs)
+            connection._send_message(msg, safe)
+
+        try:
+            results = helpers._map_in_threads(connection, send,
+                                              encoded, workers)
+        finally:
+            connection.result_cache.invalidate(self.__full_name)
+
+        ids = [doc.get("_id", None) for doc in docs]
+        errors = []
+        inserted = []
+        for (batch, (_, exc_info)) in zip(batches, results):
+            batch_ids = [doc.get("_id", None) for doc in batch]
+            if exc_info is None:
+                inserted.extend(batch_ids)
+            else:
+                errors.append((batch_ids, exc_info[1]))
+        if errors:
+            raise ParallelInsertError("%d of %d batches failed, first error: "
+                                      "%s" % (len(errors), len(batches),
+                                              errors[0][1]),
+                                      errors, inserted)
+        return ids
 
     def update(self, spec, document, upsert=False, manipulate=False,
                safe=False, multi=False, **kwargs):
@@ -345,9 +544,9 @@ class Collection(object):
 
         .. mongodoc:: update
         """
-        if not isinstance(spec, dict):
+        if not isinstance(spec, (dict, RawBSONDocument)):
             raise TypeError("spec must be an instance of dict")
-        if not isinstance(document, dict):
+        if not isinstance(document, (dict, RawBSONDocument)):
             raise TypeError("document must be an instance of dict")
         if not isinstance(upsert, bool):
             raise TypeError("upsert must be an instance of bool")
@@ -358,9 +557,13 @@ class Collection(object):
         if kwargs:
             safe = True
 
-        return self.__database.connection._send_message(
-            message.update(self.__full_name, upsert, multi,
-                           spec, document, safe, kwargs), safe)
+        connection = self.__database.connection
+        try:
+            return connection._send_message(
+                message.update(self.__full_name, upsert, multi,
+                               spec, document, safe, kwargs), safe)
+        finally:
+            connection.result_cache.invalidate(self.__full_name)
 
     def drop(self):
         """Alias for :meth:`~pymongo.database.Database.drop_collection`.
@@ -432,8 +635,72 @@ class Collection(object):
         if kwargs:
             safe = True
 
-        return self.__database.connection._send_message(
-            message.delete(self.__full_name, spec_or_id, safe, kwargs), safe)
+        connection = self.__database.connection
+        try:
+            return connection._send_message(
+                message.delete(self.__full_name, spec_or_id, safe, kwargs),
+                safe)
+        finally:
+            connection.result_cache.invalidate(self.__full_name)
+
+    def remove_many(self, ids, chunk_size=1000, safe=False, **kwargs):
+        """Remove the documents with the given ``"_id"`` values.
+
+        `ids` can be any iterable, and is consumed lazily. The ids are
+        removed in chunks of up to `chunk_size`, with one
+        ``{"_id": {"$in": chunk}}`` remove per chunk. The removes are
+        sent back to back without waiting for responses, and if `safe`
+        is ``True`` only the last one is checked for errors, so at most
+        one round trip is made. Returns the response to *lastError* for
+        the last chunk if `safe` is ``True``, otherwise ``None``.
+
+        Any additional keyword arguments imply ``safe=True``, and will
+        be used as options for the resultant `getLastError`
+        command.
+
+        :Parameters:
+          - `ids`: the ``"_id"`` values of the documents to remove
+          - `chunk_size` (optional): maximum number of ids per remove
+          - `safe` (optional): check that the last remove succeeded?
+          - `**kwargs` (optional): any additional arguments imply
+            ``safe=True``, and will be used as options for the
+            `getLastError` command
+
+        .. versionadded:: 1.10
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError("chunk_size must be a positive int")
+        if kwargs:
+            safe = True
+
+        connection = self.__database.connection
+        try:
+            messages = []
+            size = 0
+            last = None
+            for chunk in _chunks(ids, chunk_size):
+                if last is not None:
+                    data = message.delete(self.__full_name,
+                                          {"_id": {"$in": last}},
+                                          False, {})[1]
+                    messages.append(data)
+                    size += len(data)
+                    if size >= _MAX_MESSAGES_SIZE:
+                        connection._send_message((0, "".join(messages)))
+                        messages = []
+                        size = 0
+                last = chunk
+            if last is None:
+                return None
+
+            (request_id, data) = message.delete(self.__full_name,
+                                                {"_id": {"$in": last}},
+                                                safe, kwargs)
+            messages.append(data)
+            return connection._send_message((request_id, "".join(messages)),
+                                            safe)
+        finally:
+            connection.result_cache.invalidate(self.__full_name)
 
     def find_one(self, spec_or_id=None, *args, **kwargs):
         """Get a single document from the database.
@@ -459,6 +726,15 @@ class Collection(object):
            Allow passing any of the arguments that are valid for
            :meth:`find`.
 
+        .. versionchanged:: 1.10
+           When called with no positional arguments after
+           `spec_or_id`, and only the `fields`, `as_class`,
+           `dates_as_millis` or `network_timeout` keyword arguments,
+           the query is sent
+           without creating a :class:`~pymongo.cursor.Cursor`. The
+           spec is then only wrapped in ``$query`` if it has a
+           ``"query"`` key (and no ``"$query"`` key).
+
         .. versionchanged:: 1.7 Accept any type other than a ``dict``
            instance as an ``"_id"`` query, not just
            :class:`~bson.objectid.ObjectId` instances.
@@ -466,10 +742,85 @@ class Collection(object):
         if spec_or_id is not None and not isinstance(spec_or_id, dict):
             spec_or_id = {"_id": spec_or_id}
 
+        if not args and _FIND_ONE_FAST_ARGS.issuperset(kwargs):
+            return self.__find_one(spec_or_id, **kwargs)
+
         for result in self.find(spec_or_id, *args, **kwargs).limit(-1):
             return result
         return None
 
+    def __find_one(self, spec, fields=None, as_class=None,
+                   dates_as_millis=None, _must_use_master=False,
+                   _is_command=False, **kwargs):
+        """Get a single document without going through a :class:`Cursor`.
+
+        Builds the query message directly and only decodes the first
+        document of the response. Handles the subset of :meth:`find`
+        options listed in `_FIND_ONE_FAST_ARGS`.
+        """
+        if spec is None:
+            spec = {}
+        # A top-level "query" key would be taken as a wrapped query by
+        # the server, so only wrap the spec when that could happen.
+        elif not _is_command and "query" in spec and "$query" not in spec:
+            spec = SON({"$query": spec})
+
+        if fields is not None:
+            if not fields:
+                fields = {"_id": 1}
+            if not isinstance(fields, dict):
+                fields = helpers._fields_list_to_dict(fields)
+
+        options = 0
+        if self.__database.connection.slave_okay:
+            options |= 4  # slave_okay
+
+        return self._send_find_one(message.query(options, self.__full_name,
+                                                 0, -1, spec, fields),
+                                   as_class, dates_as_millis,
+                                   _must_use_master, **kwargs)
+
+    def _send_find_one(self, msg, as_class=None, dates_as_millis=None,
+                       _must_use_master=False, **kwargs):
+        """Send a query message for a single document and decode it.
+
+        Returns the first document of the response, or ``None``.
+        """
+        connection = self.__database.connection
+        if as_class is None:
+            as_class = connection.document_class
+        if dates_as_millis is None:
+            dates_as_millis = connection.dates_as_millis
+
+        cache = connection.result_cache
+        cached = cache.is_enabled(self.__full_name)
+        data = None
+        if cached:
+            key = msg[1][16:]
+            generation = cache.generation(self.__full_name)
+            data = cache.get(self.__full_name, key)
+
+        if data is None:
+            kwargs["_must_use_master"] = _must_use_master
+            response = connection._send_message_with_response(msg, **kwargs)
+            if isinstance(response, tuple):
+                response = response[1]
+
+            try:
+                data = helpers._unpack_response(response, decode=False)["data"]
+            except AutoReconnect:
+                connection.disconnect()
+                raise
+            if cached:
+                cache.put(self.__full_name, key, data, generation)
+
+        if not data:
+            return None
+        (document, _) = bson._bson_to_dict(data, as_class,
+                                           connection.tz_aware,
+                                           dates_as_millis)
+        return self.__database._fix_outgoing(document, self)
+
     def find(self, *args, **kwargs):
         """Query the database.
 
@@ -527,6 +878,10 @@ class Collection(object):
           - `as_class` (optional): class to use for documents in the
             query result (default is
             :attr:`~pymongo.connection.Connection.document_class`)
+          - `dates_as_millis` (optional): if ``True``, decode dates as
+            the number of milliseconds since the epoch instead of
+            :class:`~datetime.datetime` instances (default is
+            :attr:`~pymongo.connection.Connection.dates_as_millis`)
           - `network_timeout` (optional): specify a timeout to use for
             this query, which will override the
             :class:`~pymongo.connection.Connection`-level default
@@ -534,6 +889,9 @@ class Collection(object):
         .. note:: The `max_scan` parameter requires server
            version **>= 1.5.1**
 
+        .. versionadded:: 1.10
+           The `dates_as_millis` parameter.
+
         .. versionadded:: 1.8
            The `network_timeout` parameter.
 
@@ -551,6 +909,240 @@ class Collection(object):
         """
         return Cursor(self, *args, **kwargs)
 
+    def find_by_ids(self, ids, fields=None, chunk_size=1000, workers=4):
+        """Get the documents with the given ``"_id"`` values.
+
+        Returns a list with the document for each value in `ids`, in
+        the same order, and ``None`` for each value that didn't match
+        a document. Long lists of ids are split into ``$in`` queries
+        of up to `chunk_size` ids each, which are run concurrently
+        using up to `workers` threads, each with its own socket from
+        the connection pool. If any of the queries fails, the first
+        error (in the order of `ids`) is raised.
+
+        ``"_id"`` values must be hashable. If a value appears more
+        than once in `ids`, the same document is returned for each
+        occurrence. The ``"_id"`` is always fetched, to match up the
+        results; if `fields` excludes it, it's removed from each
+        document afterwards, except from read-only
+        :class:`~bson.raw.RawBSONDocument` documents.
+
+        :Parameters:
+          - `ids`: list of ``"_id"`` values to look up
+          - `fields` (optional): a list of field names that should be
+            returned for each document, or a dict specifying the
+            fields to return (see :meth:`find`)
+          - `chunk_size` (optional): maximum number of ids to query for
+            at once
+          - `workers` (optional): maximum number of queries to run at
+            the same time
+
+        .. versionadded:: 1.10
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError("chunk_size must be a positive int")
+
+        # ids is iterated twice, so it can't be a one-shot iterator
+        ids = list(ids)
+        unique = []
+        seen = set()
+        for _id in ids:
+            if _id not in seen:
+                seen.add(_id)
+                unique.append(_id)
+
+        strip_id = False
+        if fields is not None:
+            if not fields:
+                fields = {"_id": 1}
+            if not isinstance(fields, dict):
+                fields = helpers._fields_list_to_dict(fields)
+            if not fields.get("_id", True):
+                # the _id is needed to match up the results
+                fields = fields.copy()
+                del fields["_id"]
+                fields = fields or None
+                strip_id = True
+
+        def find_chunk(chunk):
+            return list(self.find({"_id": {"$in": chunk}}, fields))
+
+        chunks = [unique[i:i + chunk_size]
+                  for i in range(0, len(unique), chunk_size)]
+        found = {}
+        for (documents, exc_info) in helpers._map_in_threads(
+            self.__database.connection, find_chunk, chunks, workers):
+            if exc_info is not None:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            for document in documents:
+                found[document["_id"]] = document
+
+        if strip_id:
+            for document in found.itervalues():
+                if not isinstance(document, RawBSONDocument):
+                    del document["_id"]
+        return [found.get(_id) for _id in ids]
+
+    def async_writer(self, max_queue=10000, on_full="block",
+                     batch_size=1000):
+        """Get a write-behind queue for unsafe writes to this collection.
+
+        Writes made through the returned
+        :class:`~pymongo.async_writer.AsyncWriter` are encoded on the
+        calling thread and queued; a background thread sends them to
+        the server in batches. What happens when a write is made while
+        `max_queue` writes are waiting depends on `on_full`:
+
+          - ``"block"``: wait until there is room in the queue
+          - ``"drop_oldest"``: drop the oldest queued write
+          - ``"raise"``: raise :class:`~pymongo.errors.WriteQueueFull`
+
+        :Parameters:
+          - `max_queue` (optional): maximum number of queued writes
+          - `on_full` (optional): what to do when the queue is full
+          - `batch_size` (optional): maximum number of writes to send
+            at once
+
+        .. versionadded:: 1.10
+        """
+        return AsyncWriter(self, max_queue, on_full, batch_size)
+
+    def counter_aggregator(self, interval=1.0, max_pending=10000,
+                           safe=False):
+        """Get an aggregator for counter updates to this collection.
+
+        ``$inc``, ``$max`` and ``$min`` updates made through the
+        returned :class:`~pymongo.counter_aggregator.CounterAggregator`
+        are merged in memory, per document, and sent as one upsert per
+        document every `interval` seconds, or as soon as
+        `max_pending` updates have been merged::
+
+          >>> counters = db.stats.counter_aggregator()
+          >>> counters.inc({"page": "/"}, "views")
+          >>> counters.max({"page": "/"}, "slowest", 0.25)
+
+        :Parameters:
+          - `interval` (optional): number of seconds between flushes
+          - `max_pending` (optional): number of merged updates that
+            triggers an early flush
+          - `safe` (optional): send the upserts with safe mode on; errors
+            are raised by
+            :meth:`~pymongo.counter_aggregator.CounterAggregator.flush`
+
+        .. versionadded:: 1.10
+        """
+        return CounterAggregator(self, interval, max_pending, safe)
+
+    def id_allocator(self, name, block_size=100, prefetch=True):
+        """Get an allocator of sequential integer ids.
+
+        The returned :class:`~pymongo.id_allocator.IdAllocator` keeps
+        the last id reserved in the document ``{"_id": name}`` of this
+        collection, and reserves `block_size` ids at a time with
+        :meth:`find_and_modify`, so only one id in every `block_size`
+        costs a round trip to the server::
+
+          >>> ids = db.counters.id_allocator("orders", block_size=1000)
+          >>> db.orders.insert({"_id": ids.next(), "item": "book"})
+
+        :Parameters:
+          - `name`: the ``"_id"`` of the counter document
+          - `block_size` (optional): number of ids to reserve at a time
+          - `prefetch` (optional): if ``True``, reserve the next block
+            in a background thread when the current block runs low
+
+        .. versionadded:: 1.10
+        """
+        return IdAllocator(self, name, block_size, prefetch)
+
+    def work_queue(self, lease=60, prefetch=10, query=None, sort=None,
+                   ack_batch=100, ack_interval=1.0):
+        """Use this collection as a job queue.
+
+        The returned :class:`~pymongo.work_queue.WorkQueue` claims jobs
+        (documents whose ``"done"`` field isn't ``True``) with
+        :meth:`find_and_modify`, leasing each one for `lease` seconds.
+        A background thread claims up to `prefetch` jobs ahead of the
+        worker threads calling
+        :meth:`~pymongo.work_queue.WorkQueue.get`, and acknowledgements
+        are sent as a single safe :meth:`update` for up to `ack_batch`
+        jobs, at least every `ack_interval` seconds. Each claim is a
+        round trip to the server, so a queue claims jobs no faster
+        than one per round trip.
+
+        :Parameters:
+          - `lease` (optional): number of seconds a claimed job is
+            reserved for
+          - `prefetch` (optional): maximum number of claimed jobs kept
+            ready
+          - `query` (optional): only claim jobs matching this spec
+          - `sort` (optional): order to claim jobs in, as a list of
+            (key, direction) pairs - oldest ``"_id"`` first by default
+          - `ack_batch` (optional): maximum number of acknowledgements
+            sent at once
+          - `ack_interval` (optional): maximum number of seconds an
+            acknowledgement waits to be sent
+
+        .. versionadded:: 1.10
+        """
+        return WorkQueue(self, lease, prefetch, query, sort, ack_batch,
+                         ack_interval)
+
+    def prepare(self, spec, fields=None, sort=None):
+        """Prepare a query that will be run many times.
+
+        `spec` is a query spec where the values that change from one
+        run to the next are :class:`~pymongo.prepared.Param`
+        instances. The spec, `fields` and `sort` are encoded once;
+        running the returned
+        :class:`~pymongo.prepared.PreparedQuery` only encodes the
+        parameter values::
+
+          >>> from pymongo.prepared import Param
+          >>> q = db.test.prepare({"user_id": Param("user"),
+          ...                      "status": "active"})
+          >>> q.find_one({"user": 5})
+
+        Raises :class:`TypeError` if `spec` is not an instance of
+        :class:`dict`.
+
+        :Parameters:
+          - `spec`: a query template
+          - `fields` (optional): a list of field names that should be
+            returned in the result set, or a dict specifying the fields
+            to return (see :meth:`find`)
+          - `sort` (optional): a list of (key, direction) pairs
+            specifying the sort order for this query (see :meth:`find`)
+
+        .. versionadded:: 1.10
+        """
+        return PreparedQuery(self, spec, fields, sort)
+
+    def enable_result_cache(self, ttl=60):
+        """Cache the results of queries on this collection.
+
+        Results of :meth:`find_one` and of :meth:`find` queries that
+        fit in a single batch are kept in the connection's
+        :attr:`~pymongo.connection.Connection.result_cache` for `ttl`
+        seconds, or until this collection is written to through the
+        same connection. See :mod:`~pymongo.result_cache` for details.
+
+        :Parameters:
+          - `ttl` (optional): number of seconds to cache results for
+
+        .. versionadded:: 1.10
+        """
+        self.__database.connection.result_cache.enable(self.__full_name, ttl)
+
+    def disable_result_cache(self):
+        """Stop caching the results of queries on this collection.
+
+        Results that are already cached are dropped.
+
+        .. versionadded:: 1.10
+        """
+        self.__database.connection.result_cache.disable(self.__full_name)
+
     def count(self):
         """Get the number of documents in this collection.
 
@@ -668,6 +1260,11 @@ class Collection(object):
         :meth:`ensure_index` within the cache window will fail to
         re-create the missing index.
 
+        The first call for a collection within the cache window reads
+        the names of the collection's existing indexes, and only sends
+        a create for an index that isn't among them. The cache is kept
+        in :attr:`~pymongo.connection.Connection.index_cache`.
+
         Returns the name of the created index if an index is actually
         created. Returns ``None`` if the index already exists.
 
@@ -697,6 +1294,9 @@ class Collection(object):
             options (see the above list) should be passed as keyword
             arguments
 
+        .. versionchanged:: 1.10
+           Existing indexes are read the first time an index is
+           ensured on a collection.
         .. versionchanged:: 1.5.1
            Accept kwargs to support all index creation options.
 
@@ -711,8 +1311,20 @@ class Collection(object):
             keys = helpers._index_list(key_or_list)
             name = kwargs["name"] = _gen_index_name(keys)
 
-        if self.__database.connection._cache_index(self.__database.name,
-                                                   self.__name, name, ttl):
+        cache = self.__database.connection.index_cache
+        database_name = self.__database.name
+        if cache.contains(database_name, self.__name, name):
+            return None
+
+        if not cache.is_primed(database_name, self.__name):
+            indexes = self.__database.system.indexes.find(
+                {"ns": self.__full_name}, {"name": 1})
+            cache.prime(database_name, self.__name,
+                        [index["name"] for index in indexes], ttl)
+            if cache.contains(database_name, self.__name, name):
+                return None
+
+        if cache.add(database_name, self.__name, name, ttl):
             return self.create_index(key_or_list, deprecated_unique,
                                      ttl, **kwargs)
         return None
@@ -891,9 +1503,13 @@ class Collection(object):
             raise InvalidName("collection names must not contain '$'")
 
         new_name = "%s.%s" % (self.__database.name, new_name)
-        self.__database.connection.admin.command("renameCollection",
-                                                 self.__full_name,
-                                                 to=new_name, **kwargs)
+        connection = self.__database.connection
+        try:
+            connection.admin.command("renameCollection", self.__full_name,
+                                     to=new_name, **kwargs)
+        finally:
+            connection.result_cache.invalidate(self.__full_name)
+            connection.result_cache.invalidate(new_name)
 
     def distinct(self, key):
         """Get a list of distinct values for `key` among all documents
@@ -945,6 +1561,9 @@ class Collection(object):
         """
         response = self.__database.command("mapreduce", self.__name,
                                            map=map, reduce=reduce, **kwargs)
+        if isinstance(response.get("result"), basestring):
+            self.__database.connection.result_cache.invalidate(
+                u"%s.%s" % (self.__database.name, response["result"]))
         if full_response:
             return response
         return self.__database[response["result"]]
@@ -996,8 +1615,12 @@ class Collection(object):
 
         no_obj_error = "No matching object found"
 
-        out = self.__database.command("findAndModify", self.__name,
-                allowable_errors=[no_obj_error], **kwargs)
+        try:
+            out = self.__database.command("findAndModify", self.__name,
+                    allowable_errors=[no_obj_error], **kwargs)
+        finally:
+            self.__database.connection.result_cache.invalidate(
+                self.__full_name)
 
         if not out['ok']:
             if out["errmsg"] == no_obj_error:
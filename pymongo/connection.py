@@ -33,7 +33,6 @@ access:
   Database(Connection('localhost', 27017), u'test-database')
 """
 
-import datetime
 import os
 import select
 import socket
@@ -52,6 +51,8 @@ from pymongo.errors import (AutoReconnect,
                             DuplicateKeyError,
                             InvalidURI,
                             OperationFailure)
+from pymongo.index_cache import IndexCache
+from pymongo.result_cache import ResultCache
 
 
 _CONNECT_TIMEOUT = 20.0
@@ -216,7 +217,7 @@ class Connection(object):
     def __init__(self, host=None, port=None, pool_size=None,
                  auto_start_request=None, timeout=None, slave_okay=False,
                  network_timeout=None, document_class=dict, tz_aware=False,
-                 _connect=True):
+                 dates_as_millis=False, _connect=True):
         """Create a new connection to a single MongoDB instance at *host:port*.
 
         The resultant connection object has connection-pooling built
@@ -259,6 +260,10 @@ class Connection(object):
             :class:`~datetime.datetime` instances returned as values
             in a document by this :class:`Connection` will be timezone
             aware (otherwise they will be naive)
+          - `dates_as_millis` (optional): if ``True``, dates in
+            documents returned by this :class:`Connection` are
+            decoded as the number of milliseconds since the epoch
+            instead of :class:`~datetime.datetime` instances
 
         .. seealso:: :meth:`end_request`
         .. versionchanged:: 1.8
@@ -266,6 +271,8 @@ class Connection(object):
            <http://dochub.mongodb.org/core/connections>`_, in addition
            to a simple hostname. It can also be a list of hostnames or
            URIs.
+        .. versionadded:: 1.10
+           The `dates_as_millis` parameter.
         .. versionadded:: 1.8
            The `tz_aware` parameter.
         .. versionadded:: 1.7
@@ -278,6 +285,10 @@ class Connection(object):
 
         .. mongodoc:: connections
         """
+        # cache of Database handles returned by __getattr__, set first
+        # so that __getattr__ can't recurse while we're initializing
+        self.__databases = helpers._HandleCache()
+
         if host is None:
             host = self.HOST
         if isinstance(host, basestring):
@@ -343,9 +354,11 @@ class Connection(object):
         self.__network_timeout = network_timeout
         self.__document_class = document_class
         self.__tz_aware = tz_aware
+        self.__dates_as_millis = dates_as_millis
 
         # cache of existing indexes used by ensure_index ops
-        self.__index_cache = {}
+        self.__index_cache = IndexCache()
+        self.__result_cache = ResultCache()
         self.__auth_credentials = {}
 
         if _connect:
@@ -392,26 +405,7 @@ class Connection(object):
 
         Return ``False`` if the index exists and is valid.
         """
-        now = datetime.datetime.utcnow()
-        expire = datetime.timedelta(seconds=ttl) + now
-
-        if database not in self.__index_cache:
-            self.__index_cache[database] = {}
-            self.__index_cache[database][collection] = {}
-            self.__index_cache[database][collection][index] = expire
-            return True
-
-        if collection not in self.__index_cache[database]:
-            self.__index_cache[database][collection] = {}
-            self.__index_cache[database][collection][index] = expire
-            return True
-
-        if index in self.__index_cache[database][collection]:
-            if now < self.__index_cache[database][collection][index]:
-                return False
-
-        self.__index_cache[database][collection][index] = expire
-        return True
+        return self.__index_cache.add(database, collection, index, ttl)
 
     def _purge_index(self, database_name,
                      collection_name=None, index_name=None):
@@ -421,22 +415,7 @@ class Connection(object):
 
         If `collection_name` is None purge an entire database.
         """
-        if not database_name in self.__index_cache:
-            return
-
-        if collection_name is None:
-            del self.__index_cache[database_name]
-            return
-
-        if not collection_name in self.__index_cache[database_name]:
-            return
-
-        if index_name is None:
-            del self.__index_cache[database_name][collection_name]
-            return
-
-        if index_name in self.__index_cache[database_name][collection_name]:
-            del self.__index_cache[database_name][collection_name][index_name]
+        self.__index_cache.purge(database_name, collection_name, index_name)
 
     def _cache_database_credentials(self, db_name, username, password):
         """Add credentials to the database authentication cache
@@ -516,6 +495,48 @@ class Connection(object):
         """
         return self.__tz_aware
 
+    @property
+    def dates_as_millis(self):
+        """Does this connection decode dates as milliseconds since the
+        epoch?
+
+        See the `dates_as_millis` parameter to :meth:`Connection`.
+
+        .. versionadded:: 1.10
+        """
+        return self.__dates_as_millis
+
+    def get_index_cache(self):
+        return self.__index_cache
+
+    def set_index_cache(self, cache):
+        if not isinstance(cache, IndexCache):
+            raise TypeError("index_cache must be an instance of IndexCache")
+        self.__index_cache = cache
+
+    index_cache = property(get_index_cache, set_index_cache,
+                           doc="""The :class:`~pymongo.index_cache.IndexCache`
+                           used by
+                           :meth:`~pymongo.collection.Collection.ensure_index`
+                           on this connection.
+
+                           Can be set to a cache shared with other
+                           connections or processes.
+
+                           .. versionadded:: 1.10
+                           """)
+
+    @property
+    def result_cache(self):
+        """The :class:`~pymongo.result_cache.ResultCache` used by
+        collections on this connection.
+
+        See :meth:`~pymongo.collection.Collection.enable_result_cache`.
+
+        .. versionadded:: 1.10
+        """
+        return self.__result_cache
+
     def __add_hosts_and_get_primary(self, response):
         if "hosts" in response:
             self.__nodes.update([_str_to_node(h) for h in response["hosts"]])
@@ -839,8 +860,22 @@ class Connection(object):
 
         :Parameters:
           - `name`: the name of the database to get
+
+        .. versionchanged:: 1.10
+           The same :class:`~pymongo.database.Database` instance is
+           returned each time a database is accessed by name, while
+           that instance is in use or was recently created. A database
+           that has had a manipulator added is never shared this way.
         """
-        return database.Database(self, name)
+        db = self.__databases.get(name)
+        if db is None:
+            db = self.__databases.add(name, database.Database(self, name))
+        return db
+
+    def _uncache_database(self, db):
+        """Stop returning `db` when a database is accessed by name.
+        """
+        self.__databases.remove(db.name, db)
 
     def __getitem__(self, name):
         """Get a database by name.
@@ -915,7 +950,10 @@ class Connection(object):
                             "(Database, str, unicode)")
 
         self._purge_index(name)
-        self[name].command("dropDatabase")
+        try:
+            self[name].command("dropDatabase")
+        finally:
+            self.__result_cache.invalidate_database(name)
 
     def copy_database(self, from_name, to_name,
                       from_host=None, username=None, password=None):
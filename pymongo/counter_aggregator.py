@@ -0,0 +1,341 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Client side aggregation of counter updates.
+
+A :class:`CounterAggregator` merges ``$inc``, ``$max`` and ``$min``
+updates made to the same documents in memory, and periodically sends a
+single upsert per document::
+
+  >>> counters = db.hits.counter_aggregator(interval=5)
+  >>> for page in ["/", "/about", "/"]:
+  ...     counters.inc(page, "views")
+  >>> counters.flush()  # sends 2 updates: {"$inc": {"views": 2}} for "/"
+
+Pending updates are sent when the interpreter exits. ``$max`` and
+``$min`` require a server that supports those operators.
+
+.. versionadded:: 1.10
+"""
+
+import atexit
+import sys
+import threading
+import time
+
+import bson
+from pymongo import message
+from pymongo.errors import InvalidOperation
+
+_INC, _MAX, _MIN = "$inc", "$max", "$min"
+
+# All aggregators that haven't been closed, closed when the interpreter
+# exits. Open aggregators are kept alive by their threads anyway, so
+# these needn't be weak references.
+_aggregators = {}
+
+
+def _flush_all():
+    for aggregator in _aggregators.values():
+        aggregator.close()
+atexit.register(_flush_all)
+
+
+def _merge_inc(old, new):
+    return old + new
+
+
+def _merge_max(old, new):
+    if new > old:
+        return new
+    return old
+
+
+def _merge_min(old, new):
+    if new < old:
+        return new
+    return old
+
+_MERGE = {_INC: _merge_inc, _MAX: _merge_max, _MIN: _merge_min}
+
+
+class CounterAggregator(object):
+    """Merges counter updates to a collection and sends them in the
+    background.
+
+    Should not be created directly by application developers - see
+    :meth:`~pymongo.collection.Collection.counter_aggregator` instead.
+    """
+
+    def __init__(self, collection, interval=1.0, max_pending=10000,
+                 safe=False):
+        if not isinstance(interval, (int, long, float)) or interval <= 0:
+            raise ValueError("interval must be a positive number")
+        if not isinstance(max_pending, int) or max_pending < 1:
+            raise ValueError("max_pending must be a positive int")
+
+        self.__collection = collection
+        self.__interval = interval
+        self.__max_pending = max_pending
+        self.__safe = safe
+
+        self.__condition = threading.Condition()
+        # held while flushing, so updates are sent in order
+        self.__flush_lock = threading.Lock()
+        # encoded spec -> [spec, {operator: {field: value}}]
+        self.__entries = {}
+        # entries in the order they were created
+        self.__order = []
+        self.__pending = 0
+        self.__closed = False
+
+        self.__merged = 0
+        self.__sent = 0
+        self.__failed = 0
+        self.__last_error = None
+
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.setDaemon(True)
+        self.__thread.start()
+        _aggregators[id(self)] = self
+
+    @property
+    def collection(self):
+        """The :class:`~pymongo.collection.Collection` updated.
+        """
+        return self.__collection
+
+    @property
+    def pending(self):
+        """The number of calls merged since the last flush.
+        """
+        return self.__pending
+
+    @property
+    def merged(self):
+        """The number of calls merged by this aggregator.
+        """
+        return self.__merged
+
+    @property
+    def sent(self):
+        """The number of updates sent to the server.
+        """
+        return self.__sent
+
+    @property
+    def failed(self):
+        """The number of updates lost because of an error.
+        """
+        return self.__failed
+
+    @property
+    def last_error(self):
+        """The last error raised while sending updates, or ``None``.
+        """
+        return self.__last_error
+
+    def __add(self, operator, spec_or_id, field_or_fields, value):
+        if isinstance(field_or_fields, basestring):
+            fields = {field_or_fields: value}
+        elif isinstance(field_or_fields, dict):
+            fields = field_or_fields
+        else:
+            raise TypeError("field_or_fields must be an instance of "
+                            "basestring or dict")
+        if operator == _INC:
+            for amount in fields.values():
+                if not isinstance(amount, (int, long, float)):
+                    raise TypeError("amounts must be instances of int, "
+                                    "long or float")
+
+        if not isinstance(spec_or_id, dict):
+            spec_or_id = {"_id": spec_or_id}
+        key = bson.BSON.encode(spec_or_id)
+        merge = _MERGE[operator]
+
+        self.__condition.acquire()
+        try:
+            if self.__closed:
+                raise InvalidOperation("cannot update through a closed "
+                                       "CounterAggregator")
+            entry = self.__entries.get(key)
+            if entry is not None:
+                for (op, values) in entry[1].items():
+                    if op != operator and [f for f in fields if f in values]:
+                        # can't have two operators on the same field in
+                        # one update: start a new one, sent after this one
+                        entry = None
+                        break
+            if entry is None:
+                entry = [spec_or_id, {}]
+                self.__entries[key] = entry
+                self.__order.append(entry)
+
+            values = entry[1].setdefault(operator, {})
+            for (field, value) in fields.items():
+                if field in values:
+                    values[field] = merge(values[field], value)
+                else:
+                    values[field] = value
+
+            self.__pending += 1
+            self.__merged += 1
+            if self.__pending >= self.__max_pending:
+                self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+
+    def inc(self, spec_or_id, field_or_fields, amount=1):
+        """Add `amount` to a field of the document matching
+        `spec_or_id`.
+
+        `field_or_fields` can be a field name, or a dictionary mapping
+        field names to amounts (in which case `amount` is ignored).
+
+        :Parameters:
+          - `spec_or_id`: a query spec, or the ``"_id"`` of the
+            document to update
+          - `field_or_fields`: the field(s) to increment
+          - `amount` (optional): amount to add
+        """
+        self.__add(_INC, spec_or_id, field_or_fields, amount)
+
+    def max(self, spec_or_id, field_or_fields, value):
+        """Set a field of the document matching `spec_or_id` to `value`
+        if `value` is greater than the field's current value.
+
+        `field_or_fields` can be a field name, or a dictionary mapping
+        field names to values (in which case `value` is ignored).
+
+        :Parameters:
+          - `spec_or_id`: a query spec, or the ``"_id"`` of the
+            document to update
+          - `field_or_fields`: the field(s) to update
+          - `value`: value to compare with the field's current value
+        """
+        self.__add(_MAX, spec_or_id, field_or_fields, value)
+
+    def min(self, spec_or_id, field_or_fields, value):
+        """Set a field of the document matching `spec_or_id` to `value`
+        if `value` is less than the field's current value.
+
+        `field_or_fields` can be a field name, or a dictionary mapping
+        field names to values (in which case `value` is ignored).
+
+        :Parameters:
+          - `spec_or_id`: a query spec, or the ``"_id"`` of the
+            document to update
+          - `field_or_fields`: the field(s) to update
+          - `value`: value to compare with the field's current value
+        """
+        self.__add(_MIN, spec_or_id, field_or_fields, value)
+
+    def flush(self):
+        """Send all pending updates now.
+
+        If this aggregator was created with ``safe=True`` any error is
+        raised here, after the remaining updates have been sent.
+        """
+        self.__flush_lock.acquire()
+        try:
+            self.__condition.acquire()
+            try:
+                order = self.__order
+                self.__entries = {}
+                self.__order = []
+                self.__pending = 0
+            finally:
+                self.__condition.release()
+            if order:
+                self.__send(order)
+        finally:
+            self.__flush_lock.release()
+
+    def close(self):
+        """Send all pending updates and stop the background thread.
+
+        Updates can't be made after calling this method.
+        """
+        _aggregators.pop(id(self), None)
+        self.__condition.acquire()
+        try:
+            self.__closed = True
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+        self.__thread.join()
+        self.flush()
+
+    def __run(self):
+        try:
+            while True:
+                deadline = time.time() + self.__interval
+                self.__condition.acquire()
+                try:
+                    while (not self.__closed and
+                           self.__pending < self.__max_pending):
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        self.__condition.wait(remaining)
+                    if self.__closed:
+                        return
+                finally:
+                    self.__condition.release()
+
+                try:
+                    self.flush()
+                except Exception:
+                    # already counted in __send
+                    pass
+        finally:
+            self.__collection.database.connection.end_request()
+
+    def __send(self, order):
+        """Send an upsert for each entry in `order`.
+
+        Unsafe updates are all sent together in a single write to the
+        socket.
+        """
+        collection = self.__collection
+        exc_info = None
+        try:
+            if self.__safe:
+                for (spec, document) in order:
+                    try:
+                        collection.update(spec, document, upsert=True,
+                                          safe=True)
+                        self.__sent += 1
+                    except Exception:
+                        exc_info = sys.exc_info()
+                        self.__failed += 1
+            else:
+                full_name = collection.full_name
+                data = "".join([message.update(full_name, True, False,
+                                               spec, document, False, {})[1]
+                                for (spec, document) in order])
+                connection = collection.database.connection
+                try:
+                    connection._send_message((0, data))
+                    self.__sent += len(order)
+                finally:
+                    connection.result_cache.invalidate(full_name)
+        except Exception:
+            exc_info = sys.exc_info()
+            self.__failed += len(order)
+
+        if exc_info is not None:
+            self.__last_error = exc_info[1]
+            raise exc_info[0], exc_info[1], exc_info[2]
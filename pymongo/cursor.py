@@ -14,6 +14,15 @@
 
 """Cursor class to iterate over Mongo query results."""
 
+import array
+
+try:
+    import numpy
+    _use_numpy = True
+except ImportError:
+    _use_numpy = False
+
+import bson
 from bson.code import Code
 from bson.son import SON
 from pymongo import (helpers,
@@ -28,6 +37,27 @@ _QUERY_OPTIONS = {
     "no_timeout": 16}
 
 
+def _array_typecode(size):
+    """Get an :mod:`array` typecode for signed integers of `size` bytes.
+    """
+    for code in "ilq":
+        try:
+            if array.array(code).itemsize == size:
+                return code
+        except ValueError:
+            pass
+    return None
+
+# dtype name -> (column type code, numpy dtype, array typecode)
+_COLUMN_DTYPES = {
+    "float64": ("d", "<f8", "d"),
+    "int64": ("q", "<i8", _array_typecode(8)),
+    "int32": ("i", "<i4", _array_typecode(4)),
+    "bool": ("?", "bool", "B"),
+    "datetime64[ms]": ("M", "<M8[ms]", _array_typecode(8)),
+    "objectid": ("O", "S12", "B")}
+
+
 # TODO might be cool to be able to do find().include("foo") or
 # find().exclude(["bar", "baz"]) or find().slice("a", 1, 2) as an
 # alternative to the fields specifier.
@@ -37,9 +67,9 @@ class Cursor(object):
 
     def __init__(self, collection, spec=None, fields=None, skip=0, limit=0,
                  timeout=True, snapshot=False, tailable=False, sort=None,
-                 max_scan=None, as_class=None,
+                 max_scan=None, as_class=None, dates_as_millis=None,
                  _must_use_master=False, _is_command=False,
-                 **kwargs):
+                 _prepared=None, **kwargs):
         """Create a new cursor.
 
         Should not be called directly by application developers - see
@@ -73,6 +103,8 @@ class Cursor(object):
 
         if as_class is None:
             as_class = collection.database.connection.document_class
+        if dates_as_millis is None:
+            dates_as_millis = collection.database.connection.dates_as_millis
 
         self.__collection = collection
         self.__spec = spec
@@ -98,13 +130,21 @@ class Cursor(object):
         self.__hint = None
         self.__as_class = as_class
         self.__tz_aware = collection.database.connection.tz_aware
+        self.__dates_as_millis = dates_as_millis
         self.__must_use_master = _must_use_master
         self.__is_command = _is_command
 
+        # builds the first query message from a pre-encoded spec, see
+        # pymongo.prepared - only valid while the spec is unchanged
+        self.__prepared = None
+        if not (snapshot or max_scan):
+            self.__prepared = _prepared
+
         self.__data = []
         self.__connection_id = None
         self.__retrieved = 0
         self.__killed = False
+        self.__raw = False
 
         # this is for passing network_timeout through if it's specified
         # need to use kwargs as None is a legit value for network_timeout
@@ -150,7 +190,8 @@ class Cursor(object):
         """
         copy = Cursor(self.__collection, self.__spec, self.__fields,
                       self.__skip, self.__limit, self.__timeout,
-                      self.__tailable, self.__snapshot)
+                      self.__tailable, self.__snapshot,
+                      dates_as_millis=self.__dates_as_millis)
         copy.__ordering = self.__ordering
         copy.__explain = self.__explain
         copy.__hint = self.__hint
@@ -351,6 +392,7 @@ class Cursor(object):
         """
         self.__check_okay_to_chain()
         self.__max_scan = max_scan
+        self.__prepared = None
         return self
 
     def sort(self, key_or_list, direction=None):
@@ -374,6 +416,7 @@ class Cursor(object):
         self.__check_okay_to_chain()
         keys = helpers._index_list(key_or_list, direction)
         self.__ordering = helpers._index_document(keys)
+        self.__prepared = None
         return self
 
     def count(self, with_limit_and_skip=False):
@@ -474,6 +517,7 @@ class Cursor(object):
           - `index`: index to hint on (as an index specifier)
         """
         self.__check_okay_to_chain()
+        self.__prepared = None
         if index is None:
             self.__hint = None
             return self
@@ -506,10 +550,13 @@ class Cursor(object):
             code = Code(code)
 
         self.__spec["$where"] = code
+        self.__prepared = None
         return self
 
     def __send_message(self, message):
         """Send a query or getmore message and handles the response.
+
+        Returns the raw BSON of the documents in the response.
         """
         db = self.__collection.database
         kwargs = {"_must_use_master": self.__must_use_master}
@@ -527,10 +574,13 @@ class Cursor(object):
 
         self.__connection_id = connection_id
 
+        raw_response = response
         try:
             response = helpers._unpack_response(response, self.__id,
                                                 self.__as_class,
-                                                self.__tz_aware)
+                                                self.__tz_aware,
+                                                not self.__raw,
+                                                self.__dates_as_millis)
         except AutoReconnect:
             db.connection.disconnect()
             raise
@@ -541,11 +591,41 @@ class Cursor(object):
             assert response["starting_from"] == self.__retrieved
 
         self.__retrieved += response["number_returned"]
-        self.__data = response["data"]
+        if self.__raw:
+            self.__data = response["data"] and [response["data"]] or []
+        else:
+            self.__data = response["data"]
 
         if self.__limit and self.__id and self.__limit <= self.__retrieved:
             self.__die()
 
+        return raw_response[20:]
+
+    def __send_cached_message(self, cache, message):
+        """Send a query message, using `cache` to avoid the round trip
+        if possible.
+
+        Results are only cached if they are complete.
+        """
+        ns = self.__collection.full_name
+        key = message[1][16:]
+        generation = cache.generation(ns)
+        data = cache.get(ns, key)
+        if data is None:
+            data = self.__send_message(message)
+            if not self.__id:
+                cache.put(ns, key, data, generation)
+            return
+
+        self.__id = 0
+        if self.__raw:
+            self.__data = data and [data] or []
+        else:
+            self.__data = bson.decode_all(data, self.__as_class,
+                                          self.__tz_aware,
+                                          self.__dates_as_millis)
+            self.__retrieved = len(self.__data)
+
     def _refresh(self):
         """Refreshes the cursor with more data from Mongo.
 
@@ -557,11 +637,20 @@ class Cursor(object):
             return len(self.__data)
 
         if self.__id is None:  # Query
-            self.__send_message(
-                message.query(self.__query_options(),
-                              self.__collection.full_name,
-                              self.__skip, self.__limit,
-                              self.__query_spec(), self.__fields))
+            if self.__prepared:
+                msg = self.__prepared(self.__query_options(),
+                                      self.__skip, self.__limit)
+            else:
+                msg = message.query(self.__query_options(),
+                                    self.__collection.full_name,
+                                    self.__skip, self.__limit,
+                                    self.__query_spec(), self.__fields)
+            cache = self.__collection.database.connection.result_cache
+            if (not self.__tailable and
+                cache.is_enabled(self.__collection.full_name)):
+                self.__send_cached_message(cache, msg)
+            else:
+                self.__send_message(msg)
             if not self.__id:
                 self.__killed = True
         elif self.__id:  # Get More
@@ -578,6 +667,95 @@ class Cursor(object):
 
         return len(self.__data)
 
+    def to_columns(self, fields, dtypes=None):
+        """Get the results of this cursor as one typed array per field.
+
+        Documents are read straight from the server replies into
+        typed buffers, without building a Python object for each
+        value. Returns a dictionary mapping each field name to a
+        ``(values, mask)`` pair. ``mask[i]`` is true if ``values[i]``
+        was taken from the i-th result document. Documents where the
+        field is missing, or has a value that can't be converted to
+        the column type, get a zero value and a false mask entry.
+
+        If :mod:`numpy` is installed the values and masks are
+        :class:`numpy.ndarray` instances, otherwise they are
+        :class:`array.array` instances. The supported `dtypes` are
+        ``"float64"`` (the default), ``"int64"``, ``"int32"``,
+        ``"bool"``, ``"datetime64[ms]"`` (milliseconds since the
+        epoch, UTC) and ``"objectid"`` (the 12 raw bytes of each
+        :class:`~bson.objectid.ObjectId`).
+
+        Only top-level fields can be extracted. If no `fields` were
+        passed to :meth:`~pymongo.collection.Collection.find`, only
+        the requested columns are fetched from the server. Any
+        :class:`~pymongo.son_manipulator.SONManipulator` instances
+        added to the database are *not* applied.
+
+        Raises :class:`~pymongo.errors.InvalidOperation` if this
+        cursor has already been used, or is tailable.
+
+        :Parameters:
+          - `fields`: list of names of the fields to extract
+          - `dtypes` (optional): a dtype name for every field, either
+            as a dictionary keyed on field name or as a list in the
+            same order as `fields`
+
+        .. versionadded:: 1.10
+        """
+        self.__check_okay_to_chain()
+        if self.__tailable:
+            raise InvalidOperation("cannot get the columns of a "
+                                   "tailable cursor")
+        fields = tuple(fields)
+        for field in fields:
+            if not isinstance(field, basestring):
+                raise TypeError("field names must be instances "
+                                "of basestring")
+        if dtypes is None:
+            dtypes = ["float64"] * len(fields)
+        elif isinstance(dtypes, dict):
+            dtypes = [dtypes.get(field, "float64") for field in fields]
+        if len(dtypes) != len(fields):
+            raise ValueError("need exactly one dtype per field")
+        for dtype in dtypes:
+            if dtype not in _COLUMN_DTYPES:
+                raise ValueError("unsupported dtype %r" % (dtype,))
+        codes = "".join([_COLUMN_DTYPES[dtype][0] for dtype in dtypes])
+        names = tuple([isinstance(field, unicode) and
+                       field.encode("utf-8") or field for field in fields])
+
+        if self.__fields is None:
+            self.__fields = helpers._fields_list_to_dict(fields)
+            self.__prepared = None
+
+        chunks = []
+        if not self.__empty:
+            self.__raw = True
+            try:
+                while self._refresh():
+                    chunks.extend(self.__data)
+                    self.__data = []
+            finally:
+                self.__raw = False
+
+        columns = bson._decode_columns("".join(chunks), names, codes)
+
+        result = {}
+        for field, dtype, (values, mask) in zip(fields, dtypes, columns):
+            (_, numpy_type, typecode) = _COLUMN_DTYPES[dtype]
+            if _use_numpy:
+                values = numpy.frombuffer(values, dtype=numpy_type)
+                mask = numpy.frombuffer(mask, dtype="bool")
+            else:
+                if typecode is None:
+                    raise InvalidOperation("dtype %r requires numpy on "
+                                           "this platform" % (dtype,))
+                values = array.array(typecode, values)
+                mask = array.array("B", mask)
+            result[field] = (values, mask)
+        return result
+
     @property
     def alive(self):
         """Does this cursor have the potential to return more data?
@@ -18,6 +18,7 @@ import warnings
 
 from bson.code import Code
 from bson.dbref import DBRef
+from bson.raw import RawBSONDocument
 from bson.son import SON
 from pymongo import helpers
 from pymongo.collection import Collection
@@ -25,6 +26,7 @@ from pymongo.errors import (CollectionInvalid,
                             InvalidName,
                             OperationFailure)
 from pymongo.son_manipulator import ObjectIdInjector
+from pymongo.tracked_document import TrackedDocument
 
 
 def _check_name(name):
@@ -58,6 +60,10 @@ class Database(object):
 
         .. mongodoc:: databases
         """
+        # cache of Collection handles returned by __getattr__, set first
+        # so that __getattr__ can't recurse while we're initializing
+        self.__collections = helpers._HandleCache()
+
         if not isinstance(name, basestring):
             raise TypeError("name must be an instance of basestring")
 
@@ -70,7 +76,7 @@ class Database(object):
         self.__incoming_copying_manipulators = []
         self.__outgoing_manipulators = []
         self.__outgoing_copying_manipulators = []
-        self.add_son_manipulator(ObjectIdInjector())
+        self.__add_manipulator(ObjectIdInjector())
         self.__system_js = SystemJS(self)
 
     def add_son_manipulator(self, manipulator):
@@ -80,7 +86,18 @@ class Database(object):
 
         :Parameters:
           - `manipulator`: the manipulator to add
+
+        .. versionchanged:: 1.10
+           A database with added manipulators is no longer returned
+           when the database is accessed by name (``connection.db``):
+           as before, manipulators only apply to the :class:`Database`
+           instance they are added to.
         """
+        self.__add_manipulator(manipulator)
+        # handles returned by name are shared, so stop sharing this one
+        self.__connection._uncache_database(self)
+
+    def __add_manipulator(self, manipulator):
         def method_overwritten(instance, method):
             return getattr(instance, method) != \
                 getattr(super(instance.__class__, instance), method)
@@ -141,8 +158,16 @@ class Database(object):
 
         :Parameters:
           - `name`: the name of the collection to get
+
+        .. versionchanged:: 1.10
+           The same :class:`~pymongo.collection.Collection` instance is
+           returned each time a collection is accessed by name, while
+           that instance is in use or was recently created.
         """
-        return Collection(self, name)
+        collection = self.__collections.get(name)
+        if collection is None:
+            collection = self.__collections.add(name, Collection(self, name))
+        return collection
 
     def __getitem__(self, name):
         """Get a collection of this database by name.
@@ -202,6 +227,9 @@ class Database(object):
           - `son`: the son object going into the database
           - `collection`: the collection the son object is being saved in
         """
+        if isinstance(son, RawBSONDocument):
+            # sent as it is
+            return son
         for manipulator in self.__incoming_manipulators:
             son = manipulator.transform_incoming(son, collection)
         for manipulator in self.__incoming_copying_manipulators:
@@ -215,10 +243,14 @@ class Database(object):
           - `son`: the son object coming out of the database
           - `collection`: the collection the son object was saved in
         """
+        if isinstance(son, RawBSONDocument):
+            return son
         for manipulator in reversed(self.__outgoing_manipulators):
             son = manipulator.transform_outgoing(son, collection)
         for manipulator in reversed(self.__outgoing_copying_manipulators):
             son = manipulator.transform_outgoing(son, collection)
+        if isinstance(son, TrackedDocument):
+            son.mark_clean()
         return son
 
     def command(self, command, value=1,
@@ -321,7 +353,12 @@ class Database(object):
 
         self.__connection._purge_index(self.__name, name)
 
-        self.command("drop", unicode(name), allowable_errors=["ns not found"])
+        try:
+            self.command("drop", unicode(name),
+                         allowable_errors=["ns not found"])
+        finally:
+            self.__connection.result_cache.invalidate(u"%s.%s" %
+                                                      (self.__name, name))
 
     def validate_collection(self, name_or_collection):
         """Validate a collection.
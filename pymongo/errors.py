@@ -79,6 +79,32 @@ class InvalidOperation(PyMongoError):
     """
 
 
+class ParallelInsertError(PyMongoError):
+    """Raised when some of the batches sent by
+    :meth:`~pymongo.collection.Collection.insert_parallel` fail.
+
+    :attr:`errors` is a list of ``(ids, error)`` pairs, one for each
+    failed batch, where `ids` are the ``"_id"`` values of the documents
+    in that batch. :attr:`ids` are the ``"_id"`` values of the
+    documents in the batches that succeeded.
+
+    .. versionadded:: 1.10
+    """
+
+    def __init__(self, error, errors, ids):
+        self.errors = errors
+        self.ids = ids
+        PyMongoError.__init__(self, error)
+
+
+class WriteQueueFull(PyMongoError):
+    """Raised when a write can't be queued because the queue of an
+    :class:`~pymongo.async_writer.AsyncWriter` is full.
+
+    .. versionadded:: 1.10
+    """
+
+
 class InvalidName(PyMongoError):
     """Raised when an invalid name is used.
     """
@@ -20,7 +20,11 @@ try:
 except:  # for Python < 2.5
     import md5
     _md5func = md5.new
+import Queue
 import struct
+import sys
+import threading
+import weakref
 
 import bson
 from bson.son import SON
@@ -72,7 +76,8 @@ def _index_document(index_list):
     return index
 
 
-def _unpack_response(response, cursor_id=None, as_class=dict, tz_aware=False):
+def _unpack_response(response, cursor_id=None, as_class=dict, tz_aware=False,
+                     decode=True, dates_as_millis=False):
     """Unpack a response from the database.
 
     Check the response for errors and unpack, returning a dictionary
@@ -84,6 +89,10 @@ def _unpack_response(response, cursor_id=None, as_class=dict, tz_aware=False):
         used for raising an informative exception when we get cursor id not
         valid at server response
       - `as_class` (optional): class to use for resulting documents
+      - `decode` (optional): if ``False``, the response data is left
+        as a string of concatenated BSON documents
+      - `dates_as_millis` (optional): decode dates as milliseconds
+        since the epoch
     """
     response_flag = struct.unpack("<i", response[:4])[0]
     if response_flag & 1:
@@ -103,7 +112,11 @@ def _unpack_response(response, cursor_id=None, as_class=dict, tz_aware=False):
     result["cursor_id"] = struct.unpack("<q", response[4:12])[0]
     result["starting_from"] = struct.unpack("<i", response[12:16])[0]
     result["number_returned"] = struct.unpack("<i", response[16:20])[0]
-    result["data"] = bson.decode_all(response[20:], as_class, tz_aware)
+    if not decode:
+        result["data"] = response[20:]
+        return result
+    result["data"] = bson.decode_all(response[20:], as_class, tz_aware,
+                                     dates_as_millis)
     assert len(result["data"]) == result["number_returned"]
     return result
 
@@ -158,3 +171,89 @@ def _fields_list_to_dict(fields):
                             "(string, unicode)")
         as_dict[field] = 1
     return as_dict
+
+
+def _map_in_threads(connection, function, items, workers):
+    """Call `function` on each of `items` using up to `workers` threads.
+
+    Each thread uses its own socket from `connection`'s pool and
+    returns it when done. Returns a list of ``(result, exc_info)``
+    pairs in the same order as `items`, where `exc_info` is the
+    ``sys.exc_info()`` of the exception raised by `function`, or
+    ``None``.
+    """
+    results = [None] * len(items)
+
+    def call(i, item):
+        try:
+            results[i] = (function(item), None)
+        except Exception:
+            results[i] = (None, sys.exc_info())
+
+    if workers <= 1 or len(items) <= 1:
+        for (i, item) in enumerate(items):
+            call(i, item)
+        return results
+
+    queue = Queue.Queue()
+    for item in enumerate(items):
+        queue.put(item)
+
+    def work():
+        try:
+            while True:
+                try:
+                    (i, item) = queue.get_nowait()
+                except Queue.Empty:
+                    return
+                call(i, item)
+        finally:
+            connection.end_request()
+
+    threads = []
+    for _ in range(min(workers, len(items))):
+        thread = threading.Thread(target=work)
+        thread.setDaemon(True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class _HandleCache(object):
+    """Database or Collection handles, keyed by name.
+
+    A handle stays cached for as long as anything else references it.
+    The `size` most recently created handles are also kept alive by the
+    cache itself, so handles that are only used in passing (as in
+    ``connection.db.collection.find()``) are reused too, while the
+    number of unreferenced handles kept stays bounded.
+    """
+
+    def __init__(self, size=100):
+        self.__handles = weakref.WeakValueDictionary()
+        self.__recent = []
+        self.__size = size
+
+    def get(self, name):
+        """Get the cached handle for `name`, or ``None``.
+        """
+        return self.__handles.get(name)
+
+    def add(self, name, handle):
+        """Cache `handle` for `name`, unless there already is a handle for
+        `name`. Returns the cached handle.
+        """
+        handle = self.__handles.setdefault(name, handle)
+        self.__recent.append(handle)
+        if len(self.__recent) > self.__size:
+            del self.__recent[0]
+        return handle
+
+    def remove(self, name, handle):
+        """Stop caching `handle`, if it's the handle cached for `name`.
+        """
+        if self.__handles.get(name) is handle:
+            del self.__handles[name]
+            self.__recent = [h for h in self.__recent if h is not handle]
@@ -0,0 +1,155 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Sequential integer ids reserved from the server in blocks.
+
+An :class:`IdAllocator` keeps a counter document in a collection and
+reserves ranges of ids from it with a single ``findAndModify``, handing
+the ids out locally::
+
+  >>> ids = db.counters.id_allocator("users", block_size=100)
+  >>> ids.next()
+  1
+  >>> ids.next()
+  2
+
+Ids are unique across all allocators using the same counter document,
+but allocators in different processes hand out ids from different
+blocks, so ids are not allocated in order across processes, and ids
+left in a block when a process exits are never used.
+
+.. versionadded:: 1.10
+"""
+
+import threading
+
+from pymongo.errors import OperationFailure
+
+
+class IdAllocator(object):
+    """Hands out ids from blocks reserved with ``findAndModify``.
+
+    Should not be created directly by application developers - see
+    :meth:`~pymongo.collection.Collection.id_allocator` instead.
+    """
+
+    def __init__(self, collection, name, block_size=100, prefetch=True):
+        if not isinstance(block_size, (int, long)) or block_size < 1:
+            raise ValueError("block_size must be a positive int")
+
+        self.__collection = collection
+        self.__name = name
+        self.__block_size = block_size
+        self.__prefetch = prefetch
+        # prefetch the next block when fewer ids than this are left
+        self.__low_water = block_size // 4
+
+        self.__condition = threading.Condition()
+        self.__next = 0
+        self.__end = 0
+        # (next, end) of a block reserved ahead of time
+        self.__next_block = None
+        self.__fetching = False
+
+    @property
+    def collection(self):
+        """The :class:`~pymongo.collection.Collection` holding the
+        counter document.
+        """
+        return self.__collection
+
+    @property
+    def name(self):
+        """The ``"_id"`` of the counter document.
+        """
+        return self.__name
+
+    @property
+    def block_size(self):
+        """The number of ids reserved at a time.
+        """
+        return self.__block_size
+
+    def __reserve(self):
+        """Reserve a block of ids, returning (first id, last id + 1).
+        """
+        counter = self.__collection.find_and_modify(
+            {"_id": self.__name}, {"$inc": {"n": self.__block_size}},
+            upsert=True, new=True)
+        if not counter or "n" not in counter:
+            raise OperationFailure("could not reserve ids from %r" %
+                                   self.__name)
+        end = counter["n"] + 1
+        return (end - self.__block_size, end)
+
+    def __prefetch_block(self):
+        block = None
+        try:
+            try:
+                block = self.__reserve()
+            except Exception:
+                # the next call to next() that needs the block will try
+                # again and raise the error
+                pass
+        finally:
+            self.__condition.acquire()
+            try:
+                self.__next_block = block
+                self.__fetching = False
+                self.__condition.notifyAll()
+            finally:
+                self.__condition.release()
+            self.__collection.database.connection.end_request()
+
+    def next(self):
+        """Get the next id.
+        """
+        self.__condition.acquire()
+        try:
+            while self.__next >= self.__end:
+                if self.__next_block is not None:
+                    (self.__next, self.__end) = self.__next_block
+                    self.__next_block = None
+                elif self.__fetching:
+                    self.__condition.wait()
+                else:
+                    self.__fetching = True
+                    self.__condition.release()
+                    block = None
+                    try:
+                        block = self.__reserve()
+                    finally:
+                        self.__condition.acquire()
+                        self.__fetching = False
+                        if block is not None:
+                            (self.__next, self.__end) = block
+                        self.__condition.notifyAll()
+
+            id = self.__next
+            self.__next += 1
+
+            if (self.__prefetch and not self.__fetching and
+                self.__next_block is None and
+                self.__end - self.__next <= self.__low_water):
+                self.__fetching = True
+                thread = threading.Thread(target=self.__prefetch_block)
+                thread.setDaemon(True)
+                thread.start()
+
+            return id
+        finally:
+            self.__condition.release()
+
+    def __iter__(self):
+        return self
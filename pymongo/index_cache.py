@@ -0,0 +1,351 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cache of the indexes known to exist, used by
+:meth:`~pymongo.collection.Collection.ensure_index`.
+
+Every :class:`~pymongo.connection.Connection` has an :class:`IndexCache`,
+available as :attr:`~pymongo.connection.Connection.index_cache`. The
+first :meth:`~pymongo.collection.Collection.ensure_index` call on a
+collection reads the names of its existing indexes, so indexes that are
+already there are never created again; later calls within the cache
+window don't talk to the server at all.
+
+Processes forked from a common parent (as in a preforking web server)
+can share what they know by giving their connections an
+:class:`IndexCache` backed by the same file::
+
+  >>> connection.index_cache = IndexCache("/tmp/myapp-indexes")
+
+.. versionadded:: 1.10
+"""
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+    _use_fcntl = True
+except ImportError:
+    _use_fcntl = False
+
+import bson
+from pymongo.errors import ConfigurationError
+
+# Rewrite the shared file without expired entries once it's this big.
+_COMPACT_SIZE = 64 * 1024
+
+# Name used for the entry recording that a collection has been primed.
+# Can't clash with an index name because index names can't be None.
+_PRIMED = None
+
+
+def _monotonic_clock():
+    """Get a function returning the time in seconds from a clock that
+    isn't affected by changes to the system time.
+
+    Falls back to :func:`time.time` where no such clock is available.
+    """
+    if hasattr(time, "monotonic"):
+        return time.monotonic
+    try:
+        import ctypes
+        import ctypes.util
+
+        class timespec(ctypes.Structure):
+            _fields_ = [("tv_sec", ctypes.c_long),
+                        ("tv_nsec", ctypes.c_long)]
+
+        librt = ctypes.CDLL(ctypes.util.find_library("rt") or
+                            ctypes.util.find_library("c"), use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        CLOCK_MONOTONIC = 1
+
+        def monotonic():
+            t = timespec()
+            if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)):
+                raise OSError(ctypes.get_errno(), "clock_gettime failed")
+            return t.tv_sec + t.tv_nsec * 1e-9
+        monotonic()
+        return monotonic
+    except Exception:
+        return time.time
+
+_now = _monotonic_clock()
+
+
+class IndexCache(object):
+    """A thread safe cache of the indexes known to exist.
+
+    Entries are keyed on database, collection and index name, and
+    expire a number of seconds after they are added.
+
+    :Parameters:
+      - `path` (optional): file used to share the cache with other
+        processes on the same machine; requires :mod:`fcntl`
+    """
+
+    def __init__(self, path=None):
+        if path is not None and not _use_fcntl:
+            raise ConfigurationError("a file backed IndexCache requires "
+                                     "the fcntl module")
+        self.__lock = threading.Lock()
+        # (database, collection) -> {index name: expiry time}
+        self.__indexes = {}
+        self.__path = path
+        # stat of the shared file when we last read it
+        self.__file_stamp = None
+
+    @property
+    def path(self):
+        """The file shared with other processes, or ``None``.
+        """
+        return self.__path
+
+    def __get(self, key, name, now):
+        """Is index `name` of collection `key` cached? The lock must be
+        held.
+        """
+        expires = self.__indexes.get(key, {}).get(name)
+        if expires is not None and now < expires:
+            return True
+        if self.__path is not None and self.__load():
+            expires = self.__indexes.get(key, {}).get(name)
+            return expires is not None and now < expires
+        return False
+
+    def __set(self, key, name, now, ttl):
+        """Cache index `name` of collection `key`. The lock must be held.
+        """
+        self.__indexes.setdefault(key, {})[name] = now + ttl
+        if self.__path is not None:
+            self.__append([(key, name, now + ttl, ttl)])
+
+    def contains(self, database, collection, index):
+        """Is `index` cached as existing?
+
+        :Parameters:
+          - `database`: name of the database
+          - `collection`: name of the collection
+          - `index`: name of the index
+        """
+        self.__lock.acquire()
+        try:
+            return self.__get((database, collection), index, _now())
+        finally:
+            self.__lock.release()
+
+    def add(self, database, collection, index, ttl):
+        """Cache `index` as existing for `ttl` seconds.
+
+        Returns ``False`` if the index was already cached, or ``True``
+        if it has been newly cached (or had expired and is being
+        cached again).
+
+        :Parameters:
+          - `database`: name of the database
+          - `collection`: name of the collection
+          - `index`: name of the index
+          - `ttl`: number of seconds to cache the index for
+        """
+        key = (database, collection)
+        now = _now()
+        self.__lock.acquire()
+        try:
+            if self.__get(key, index, now):
+                return False
+            self.__set(key, index, now, ttl)
+            return True
+        finally:
+            self.__lock.release()
+
+    def is_primed(self, database, collection):
+        """Has :meth:`prime` been called for this collection within the
+        cache window?
+        """
+        return self.contains(database, collection, _PRIMED)
+
+    def prime(self, database, collection, indexes, ttl):
+        """Cache `indexes` as all of the indexes on a collection.
+
+        :Parameters:
+          - `database`: name of the database
+          - `collection`: name of the collection
+          - `indexes`: names of the existing indexes
+          - `ttl`: number of seconds to cache the indexes for
+        """
+        key = (database, collection)
+        now = _now()
+        expires = now + ttl
+        self.__lock.acquire()
+        try:
+            cached = self.__indexes.setdefault(key, {})
+            for name in indexes:
+                cached[name] = expires
+            cached[_PRIMED] = expires
+            if self.__path is not None:
+                self.__append([(key, name, expires, ttl)
+                               for name in list(indexes) + [_PRIMED]])
+        finally:
+            self.__lock.release()
+
+    def purge(self, database, collection=None, index=None):
+        """Remove entries from the cache.
+
+        If `index` is ``None`` purge an entire collection. If
+        `collection` is ``None`` purge an entire database. Other
+        processes sharing the cache file may keep using entries they
+        have already read until they expire.
+        """
+        def matches(key, name):
+            if key[0] != database:
+                return False
+            if collection is not None and key[1] != collection:
+                return False
+            return index is None or name == index
+
+        self.__lock.acquire()
+        try:
+            for key in self.__indexes.keys():
+                cached = self.__indexes[key]
+                for name in cached.keys():
+                    if matches(key, name):
+                        del cached[name]
+                if not cached:
+                    del self.__indexes[key]
+            if self.__path is not None:
+                self.__rewrite(lambda key, name: not matches(key, name))
+        finally:
+            self.__lock.release()
+
+    def clear(self):
+        """Remove all entries from the cache.
+        """
+        self.__lock.acquire()
+        try:
+            self.__indexes = {}
+            if self.__path is not None:
+                self.__rewrite(lambda key, name: False)
+        finally:
+            self.__lock.release()
+
+    def __open(self, lock_type):
+        """Open the shared file and lock it.
+        """
+        fd = os.open(self.__path, os.O_RDWR | os.O_CREAT, 0600)
+        try:
+            fcntl.flock(fd, lock_type)
+        except:
+            os.close(fd)
+            raise
+        return fd
+
+    def __close(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __read(self, fd, now):
+        """Read the live entries from the shared file.
+
+        Entries that seem to have been added in the future were written
+        before the clock was reset (e.g. by a reboot) and are ignored.
+        """
+        os.lseek(fd, 0, 0)
+        chunks = []
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        try:
+            records = bson.decode_all("".join(chunks))
+        except Exception:
+            # a writer died half way through; what we have is still good
+            # enough to be a cache, but start over rather than guess
+            return []
+        entries = []
+        for record in records:
+            expires = record["expires"]
+            if now < expires and expires - record["ttl"] <= now:
+                entries.append(((record["db"], record["coll"]),
+                                record["index"], expires, record["ttl"]))
+        return entries
+
+    def __load(self):
+        """Merge entries from the shared file into the cache if it has
+        changed since we last read it. The lock must be held.
+
+        Returns ``True`` if the file was read.
+        """
+        try:
+            stat = os.stat(self.__path)
+        except OSError:
+            return False
+        stamp = (stat.st_mtime, stat.st_size, stat.st_ino)
+        if stamp == self.__file_stamp:
+            return False
+
+        fd = self.__open(fcntl.LOCK_SH)
+        try:
+            entries = self.__read(fd, _now())
+            stat = os.fstat(fd)
+            self.__file_stamp = (stat.st_mtime, stat.st_size, stat.st_ino)
+        finally:
+            self.__close(fd)
+
+        for (key, name, expires, ttl) in entries:
+            cached = self.__indexes.setdefault(key, {})
+            if expires > cached.get(name, 0):
+                cached[name] = expires
+        return True
+
+    def __encode(self, entries):
+        return "".join([bson.BSON.encode({"db": key[0], "coll": key[1],
+                                          "index": name, "expires": expires,
+                                          "ttl": ttl})
+                        for (key, name, expires, ttl) in entries])
+
+    def __append(self, entries):
+        """Add entries to the shared file, compacting it if it has
+        grown too big. The lock must be held.
+        """
+        fd = self.__open(fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size > _COMPACT_SIZE:
+                self.__write(fd, self.__read(fd, _now()) + entries)
+            else:
+                os.lseek(fd, 0, 2)
+                os.write(fd, self.__encode(entries))
+        finally:
+            self.__close(fd)
+
+    def __rewrite(self, keep):
+        """Rewrite the shared file with the live entries for which
+        `keep(key, name)` is true. The lock must be held.
+        """
+        fd = self.__open(fcntl.LOCK_EX)
+        try:
+            self.__write(fd, [entry for entry in self.__read(fd, _now())
+                              if keep(entry[0], entry[1])])
+        finally:
+            self.__close(fd)
+
+    def __write(self, fd, entries):
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, 0)
+        os.write(fd, self.__encode(entries))
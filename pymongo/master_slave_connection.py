@@ -19,6 +19,7 @@ instances."""
 
 import random
 
+from pymongo import helpers
 from pymongo.connection import Connection
 from pymongo.database import Database
 
@@ -54,6 +55,7 @@ class MasterSlaveConnection(object):
                 raise TypeError("slave %r is not an instance of Connection" %
                                 slave)
 
+        self.__databases = helpers._HandleCache()
         self.__in_request = False
         self.__master = master
         self.__slaves = slaves
@@ -76,6 +78,25 @@ class MasterSlaveConnection(object):
     def tz_aware(self):
         return True
 
+    @property
+    def dates_as_millis(self):
+        return False
+
+    @property
+    def index_cache(self):
+        """The :class:`~pymongo.index_cache.IndexCache` of the master.
+        """
+        return self.__master.index_cache
+
+    @property
+    def result_cache(self):
+        """The :class:`~pymongo.result_cache.ResultCache` of the master.
+
+        Writes always go to the master, so its cache is shared by all
+        reads through this connection.
+        """
+        return self.__master.result_cache
+
     @property
     def slave_okay(self):
         """Is it okay for this connection to connect directly to a slave?
@@ -185,8 +206,22 @@ class MasterSlaveConnection(object):
 
         :Parameters:
           - `name`: the name of the database to get
+
+        .. versionchanged:: 1.10
+           The same :class:`~pymongo.database.Database` instance is
+           returned each time a database is accessed by name, while
+           that instance is in use or was recently created. A database
+           that has had a manipulator added is never shared this way.
+        """
+        db = self.__databases.get(name)
+        if db is None:
+            db = self.__databases.add(name, Database(self, name))
+        return db
+
+    def _uncache_database(self, db):
+        """Stop returning `db` when a database is accessed by name.
         """
-        return Database(self, name)
+        self.__databases.remove(db.name, db)
 
     def __getitem__(self, name):
         """Get a database by name.
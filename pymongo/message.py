@@ -28,7 +28,7 @@ import struct
 import bson
 from bson.son import SON
 try:
-    from pymongo import _cbson
+    from pymongo import _cmessage
     _use_c = True
 except ImportError:
     _use_c = False
@@ -64,7 +64,7 @@ def insert(collection_name, docs, check_keys, safe, last_error_args):
     """
     data = __ZERO
     data += bson._make_c_string(collection_name)
-    bson_data = "".join([bson.BSON.encode(doc, check_keys) for doc in docs])
+    (bson_data, _) = bson.encode_many(docs, check_keys)
     if not bson_data:
         raise InvalidOperation("cannot do an empty bulk insert")
     data += bson_data
@@ -75,7 +75,27 @@ def insert(collection_name, docs, check_keys, safe, last_error_args):
     else:
         return __pack_message(2002, data)
 if _use_c:
-    insert = _cbson._insert_message
+    insert = _cmessage._insert_message
+
+
+def insert_encoded(collection_name, bson_data, safe, last_error_args):
+    """Get an **insert** message for documents that are already encoded.
+
+    `bson_data` is the concatenated BSON of the documents to insert.
+
+    .. versionadded:: 1.10
+    """
+    if not bson_data:
+        raise InvalidOperation("cannot do an empty bulk insert")
+    data = __ZERO
+    data += bson._make_c_string(collection_name)
+    data += bson_data
+    if safe:
+        (_, insert_message) = __pack_message(2002, data)
+        (request_id, error_message) = __last_error(last_error_args)
+        return (request_id, insert_message + error_message)
+    else:
+        return __pack_message(2002, data)
 
 
 def update(collection_name, upsert, multi, spec, doc, safe, last_error_args):
@@ -99,7 +119,7 @@ def update(collection_name, upsert, multi, spec, doc, safe, last_error_args):
     else:
         return __pack_message(2001, data)
 if _use_c:
-    update = _cbson._update_message
+    update = _cmessage._update_message
 
 
 def query(options, collection_name,
@@ -115,7 +135,7 @@ def query(options, collection_name,
         data += bson.BSON.encode(field_selector)
     return __pack_message(2004, data)
 if _use_c:
-    query = _cbson._query_message
+    query = _cmessage._query_message
 
 
 def get_more(collection_name, num_to_return, cursor_id):
@@ -127,7 +147,7 @@ def get_more(collection_name, num_to_return, cursor_id):
     data += struct.pack("<q", cursor_id)
     return __pack_message(2005, data)
 if _use_c:
-    get_more = _cbson._get_more_message
+    get_more = _cmessage._get_more_message
 
 
 def delete(collection_name, spec, safe, last_error_args):
@@ -143,6 +163,8 @@ def delete(collection_name, spec, safe, last_error_args):
         return (request_id, remove_message + error_message)
     else:
         return __pack_message(2006, data)
+if _use_c:
+    delete = _cmessage._delete_message
 
 
 def kill_cursors(cursor_ids):
@@ -0,0 +1,344 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Queries with a fixed shape that are encoded once and run many times.
+
+A query template is a normal query spec where some values are
+:class:`Param` placeholders::
+
+  >>> from pymongo.prepared import Param
+  >>> by_user = db.events.prepare({"user_id": Param("user"),
+  ...                              "status": "active"})
+  >>> by_user.find_one({"user": 42})
+  >>> for event in by_user.find({"user": 43}):
+  ...     print event
+
+The template, fields and sort are encoded to BSON once, by
+:meth:`~pymongo.collection.Collection.prepare`. Running the query only
+encodes the parameter values and patches them, along with the affected
+length fields, into the pre-built message.
+
+.. versionadded:: 1.10
+"""
+
+import os
+import random
+import struct
+
+import bson
+from bson.binary import Binary
+from bson.errors import InvalidBSON
+from bson.son import SON
+from pymongo import helpers
+from pymongo.cursor import Cursor
+
+# Binary subtype used to mark parameters in the encoded template
+# ("user defined" in the BSON spec).
+_MARKER_SUBTYPE = 0x80
+
+# Sizes of values that don't start with a length, by element type.
+_FIXED_SIZES = {"\x01": 8, "\x06": 0, "\x07": 12, "\x08": 1, "\x09": 8,
+                "\x0A": 0, "\x10": 4, "\x11": 8, "\x12": 8, "\x7F": 0,
+                "\xFF": 0}
+
+
+class Param(object):
+    """A placeholder for a value in a prepared query template.
+
+    :Parameters:
+      - `name`: the name used to pass a value for this parameter when
+        running the query. The same name can be used more than once
+        in a template
+    """
+
+    def __init__(self, name):
+        if not isinstance(name, basestring):
+            raise TypeError("name must be an instance of basestring")
+        self.__name = name
+
+    @property
+    def name(self):
+        """The name of this parameter.
+        """
+        return self.__name
+
+    def __repr__(self):
+        return "Param(%r)" % self.__name
+
+
+def _value_size(data, position, element_type):
+    """Get the size of the value at `position` in some encoded BSON.
+    """
+    if element_type in _FIXED_SIZES:
+        return _FIXED_SIZES[element_type]
+    if element_type in "\x02\x0D\x0E":
+        return 4 + struct.unpack("<i", data[position:position + 4])[0]
+    if element_type in "\x03\x04\x0F":
+        return struct.unpack("<i", data[position:position + 4])[0]
+    if element_type == "\x05":
+        return 5 + struct.unpack("<i", data[position:position + 4])[0]
+    if element_type == "\x0B":
+        end = data.index("\x00", data.index("\x00", position) + 1)
+        return end + 1 - position
+    if element_type == "\x0C":
+        return 16 + struct.unpack("<i", data[position:position + 4])[0]
+    raise InvalidBSON("unknown element type %r" % element_type)
+
+
+def _find_slots(data, token, start=0, enclosing=()):
+    """Find the parameter markers and document lengths in `data`.
+
+    Returns ``(markers, lengths)``. `lengths` is the offset of the
+    length field of each document, starting with the one at `start`.
+    `markers` has a ``(start, end, index, enclosing)`` tuple for each
+    marker element, where `index` is the parameter number stored in
+    the marker and `enclosing` are the offsets of the length fields of
+    all the documents containing it.
+    """
+    markers = []
+    lengths = [start]
+    enclosing = enclosing + (start,)
+    marker = "%s%s" % (chr(_MARKER_SUBTYPE), token)
+    position = start + 4
+    end = start + struct.unpack("<i", data[start:start + 4])[0] - 1
+    while position < end:
+        element_start = position
+        element_type = data[position]
+        position = data.index("\x00", position + 1) + 1
+        if element_type in "\x03\x04":
+            (inner_markers, inner_lengths) = _find_slots(data, token,
+                                                         position, enclosing)
+            markers.extend(inner_markers)
+            lengths.extend(inner_lengths)
+        elif (element_type == "\x05" and
+              data.startswith(marker, position + 4)):
+            index = struct.unpack("<i", data[position + 5 + len(token):
+                                     position + 9 + len(token)])[0]
+            markers.append((element_start,
+                            position + _value_size(data, position, "\x05"),
+                            index, enclosing))
+        position += _value_size(data, position, element_type)
+    return (markers, lengths)
+
+
+class PreparedQuery(object):
+    """A query that is encoded once and then run with different
+    parameter values.
+
+    Should not be created directly by application developers - see
+    :meth:`~pymongo.collection.Collection.prepare` instead.
+    """
+
+    def __init__(self, collection, spec, fields=None, sort=None):
+        if not isinstance(spec, dict):
+            raise TypeError("spec must be an instance of dict")
+        if fields is not None:
+            if not fields:
+                fields = {"_id": 1}
+            if not isinstance(fields, dict):
+                fields = helpers._fields_list_to_dict(fields)
+
+        self.__collection = collection
+        self.__spec = spec
+        self.__fields = fields
+        self.__sort = sort
+        self.__names = []
+
+        token = os.urandom(8)
+        query = SON([("$query", self.__mark(spec, token))])
+        if sort:
+            query["$orderby"] = helpers._index_document(sort)
+        data = bson.BSON.encode(query)
+
+        (markers, lengths) = _find_slots(data, token)
+        markers.sort()
+
+        # (offset of the length field, template length, parameter numbers)
+        self.__lengths = []
+        for offset in lengths:
+            length = struct.unpack("<i", data[offset:offset + 4])[0]
+            inside = [i for (i, (_, _, _, enclosing)) in enumerate(markers)
+                      if offset in enclosing]
+            self.__lengths.append((offset, length, inside))
+
+        # (key, parameter name, size of the marker element)
+        self.__params = []
+        cuts = [(offset, offset + 4, None) for offset in lengths]
+        for (i, (start, end, index, _)) in enumerate(markers):
+            key = data[start + 1:data.index("\x00", start + 1)]
+            self.__params.append((key.decode("utf-8"), self.__names[index],
+                                  end - start))
+            cuts.append((start, end, i))
+        cuts.sort()
+
+        # Constant pieces of the encoded query, and what goes between
+        # them: a document length (None) or an encoded parameter (int).
+        self.__pieces = []
+        self.__slots = []
+        position = 0
+        for (start, end, i) in cuts:
+            self.__pieces.append(data[position:start])
+            self.__slots.append(i)
+            position = end
+        self.__pieces.append(data[position:])
+
+        self.__full_name = bson._make_c_string(collection.full_name)
+        self.__field_data = ""
+        if fields is not None:
+            self.__field_data = bson.BSON.encode(fields)
+
+    def __mark(self, value, token):
+        """Replace the :class:`Param` instances in `value` with markers.
+        """
+        if isinstance(value, Param):
+            self.__names.append(value.name)
+            return Binary(token + struct.pack("<i", len(self.__names) - 1),
+                          _MARKER_SUBTYPE)
+        if isinstance(value, dict):
+            marked = value.__class__()
+            for (key, item) in value.iteritems():
+                marked[key] = self.__mark(item, token)
+            return marked
+        if isinstance(value, (list, tuple)):
+            return [self.__mark(item, token) for item in value]
+        return value
+
+    def __fill(self, value, params):
+        """Replace the :class:`Param` instances in `value` with values.
+        """
+        if isinstance(value, Param):
+            return params[value.name]
+        if isinstance(value, dict):
+            filled = value.__class__()
+            for (key, item) in value.iteritems():
+                filled[key] = self.__fill(item, params)
+            return filled
+        if isinstance(value, (list, tuple)):
+            return [self.__fill(item, params) for item in value]
+        return value
+
+    @property
+    def collection(self):
+        """The :class:`~pymongo.collection.Collection` this query is
+        run against.
+        """
+        return self.__collection
+
+    @property
+    def params(self):
+        """The names of the parameters in this query's template.
+        """
+        names = []
+        for name in self.__names:
+            if name not in names:
+                names.append(name)
+        return names
+
+    def __check_params(self, params):
+        if params is None:
+            params = {}
+        missing = [name for name in self.__names if name not in params]
+        if missing:
+            raise TypeError("missing value for parameter %r" % missing[0])
+        for name in params:
+            if name not in self.__names:
+                raise TypeError("unknown parameter %r" % (name,))
+        return params
+
+    def _encode(self, params):
+        """Get the encoded query with `params` patched in.
+        """
+        elements = []
+        deltas = []
+        for (key, name, size) in self.__params:
+            element = bson.BSON.encode({key: params[name]})[4:-1]
+            elements.append(element)
+            deltas.append(len(element) - size)
+
+        lengths = []
+        for (_, length, inside) in self.__lengths:
+            for i in inside:
+                length += deltas[i]
+            lengths.append(struct.pack("<i", length))
+
+        pieces = self.__pieces
+        data = [pieces[0]]
+        n = 0
+        for (i, slot) in enumerate(self.__slots):
+            if slot is None:
+                data.append(lengths[n])
+                n += 1
+            else:
+                data.append(elements[slot])
+            data.append(pieces[i + 1])
+        return "".join(data)
+
+    def _message(self, query, options, num_to_skip, num_to_return):
+        """Get a **query** message for the encoded `query`.
+
+        Returns ``(request_id, message)`` like
+        :func:`pymongo.message.query`.
+        """
+        request_id = random.randint(-2 ** 31, 2 ** 31 - 1)
+        data = "".join([struct.pack("<I", options), self.__full_name,
+                        struct.pack("<ii", num_to_skip, num_to_return),
+                        query, self.__field_data])
+        return (request_id, struct.pack("<iiii", 16 + len(data), request_id,
+                                        0, 2004) + data)
+
+    def find_one(self, params=None, **kwargs):
+        """Run this query, returning a single document or ``None``.
+
+        :Parameters:
+          - `params` (optional): dictionary mapping every parameter
+            name to the value to use for it
+          - `as_class` (optional): class to use for the resulting
+            document
+          - `dates_as_millis` (optional): if ``True``, decode dates as
+            the number of milliseconds since the epoch
+          - `network_timeout` (optional): specify a timeout to use for
+            this query
+        """
+        params = self.__check_params(params)
+        options = 0
+        if self.__collection.database.connection.slave_okay:
+            options |= 4  # slave_okay
+        return self.__collection._send_find_one(
+            self._message(self._encode(params), options, 0, -1), **kwargs)
+
+    def find(self, params=None, **kwargs):
+        """Run this query, returning a :class:`~pymongo.cursor.Cursor`.
+
+        Any keyword arguments other than `fields` and `sort` are
+        passed through to :meth:`~pymongo.collection.Collection.find`.
+        The first batch of results is requested using the pre-built
+        message. Calling a method on the cursor that changes the query
+        itself, like :meth:`~pymongo.cursor.Cursor.sort`, falls back to
+        encoding the query as usual.
+
+        :Parameters:
+          - `params` (optional): dictionary mapping every parameter
+            name to the value to use for it
+          - `**kwargs` (optional): other options for
+            :meth:`~pymongo.collection.Collection.find`
+        """
+        params = self.__check_params(params)
+        query = self._encode(params)
+
+        def message(options, num_to_skip, num_to_return):
+            return self._message(query, options, num_to_skip, num_to_return)
+
+        return Cursor(self.__collection, self.__fill(self.__spec, params),
+                      self.__fields, sort=self.__sort, _prepared=message,
+                      **kwargs)
@@ -0,0 +1,302 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A client side cache of query results.
+
+Every :class:`~pymongo.connection.Connection` has a
+:class:`ResultCache`, available as
+:attr:`~pymongo.connection.Connection.result_cache`. Caching is off
+until it is turned on for a collection::
+
+  >>> db.config.enable_result_cache(ttl=30)
+  >>> db.config.find_one({"name": "feature_flags"})  # from the server
+  >>> db.config.find_one({"name": "feature_flags"})  # from the cache
+  >>> connection.result_cache.hits
+  1
+
+Results are cached as the raw BSON sent by the server, keyed on the
+whole query (spec, fields, sort, skip, limit and options), and decoded
+again on every hit, so documents returned from the cache can be
+modified freely. Only results that fit in a single reply from the
+server are cached.
+
+Inserts, updates, removes, :meth:`~pymongo.collection.Collection.drop`,
+:meth:`~pymongo.collection.Collection.rename`,
+:meth:`~pymongo.collection.Collection.find_and_modify` and
+:meth:`~pymongo.connection.Connection.drop_database` calls made through
+the same connection invalidate the affected collections. Changes made
+by other clients, or through
+:meth:`~pymongo.database.Database.command`, are only seen once the
+cached results expire.
+
+.. versionadded:: 1.10
+"""
+
+import threading
+import time
+
+# Fields of each link in the LRU list.
+_PREV, _NEXT, _NS, _KEY, _DATA, _EXPIRES = range(6)
+
+
+class ResultCache(object):
+    """A byte bounded LRU cache of query results.
+
+    :Parameters:
+      - `max_bytes` (optional): the maximum total size of cached
+        results (including their keys), in bytes
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.__lock = threading.Lock()
+        self.__max_bytes = max_bytes
+        self.__size = 0
+
+        # namespace -> ttl, for namespaces with caching enabled
+        self.__ttls = {}
+        # namespace or database name -> count of invalidations
+        self.__generations = {}
+        # namespace -> {key: link}
+        self.__entries = {}
+
+        # circular doubly linked list, least recently used first
+        self.__root = []
+        self.__root[:] = [self.__root, self.__root, None, None, None, None]
+
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __get_max_bytes(self):
+        return self.__max_bytes
+
+    def __set_max_bytes(self, max_bytes):
+        self.__lock.acquire()
+        try:
+            self.__max_bytes = max_bytes
+            self.__evict()
+        finally:
+            self.__lock.release()
+
+    max_bytes = property(__get_max_bytes, __set_max_bytes,
+                         doc="""The maximum total size of cached results.
+
+        Setting this to a lower value evicts results immediately.
+        """)
+
+    @property
+    def size(self):
+        """The total size of the cached results, in bytes.
+        """
+        return self.__size
+
+    @property
+    def hits(self):
+        """The number of queries answered from the cache.
+        """
+        return self.__hits
+
+    @property
+    def misses(self):
+        """The number of queries on cached collections that had to be
+        sent to the server.
+        """
+        return self.__misses
+
+    @property
+    def evictions(self):
+        """The number of results dropped to stay under :attr:`max_bytes`.
+        """
+        return self.__evictions
+
+    def __len__(self):
+        return sum([len(entries) for entries in self.__entries.values()])
+
+    def reset_counters(self):
+        """Reset :attr:`hits`, :attr:`misses` and :attr:`evictions` to 0.
+        """
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def enable(self, ns, ttl):
+        """Cache the results of queries on namespace `ns` for `ttl`
+        seconds.
+
+        :Parameters:
+          - `ns`: full name of the collection
+          - `ttl`: number of seconds that results are cached for
+        """
+        if not isinstance(ttl, (int, long, float)):
+            raise TypeError("ttl must be an instance of int or float")
+        if ttl <= 0:
+            raise ValueError("ttl must be greater than 0")
+        self.__lock.acquire()
+        try:
+            self.__ttls[ns] = ttl
+        finally:
+            self.__lock.release()
+
+    def disable(self, ns):
+        """Stop caching query results for namespace `ns`, dropping the
+        results that are already cached.
+
+        :Parameters:
+          - `ns`: full name of the collection
+        """
+        self.__lock.acquire()
+        try:
+            self.__ttls.pop(ns, None)
+            self.__generations.pop(ns, None)
+            self.__remove(ns)
+        finally:
+            self.__lock.release()
+
+    def is_enabled(self, ns):
+        """Is caching enabled for namespace `ns`?
+        """
+        return ns in self.__ttls
+
+    def generation(self, ns):
+        """Get a token for the current state of namespace `ns`.
+
+        Pass it to :meth:`put` along with results fetched after calling
+        this method, so that results that were fetched while `ns` was
+        being invalidated don't get cached.
+        """
+        return (self.__generations.get(ns.split(".", 1)[0], 0),
+                self.__generations.get(ns, 0))
+
+    def get(self, ns, key):
+        """Get the cached result for query `key` on namespace `ns`.
+
+        Returns the raw BSON of the result documents, or ``None``.
+        """
+        if ns not in self.__ttls:
+            return None
+        self.__lock.acquire()
+        try:
+            link = self.__entries.get(ns, {}).get(key)
+            if link is None or link[_EXPIRES] <= time.time():
+                if link is not None:
+                    self.__unlink(link)
+                self.__misses += 1
+                return None
+
+            # move to the most recently used end
+            root = self.__root
+            link[_PREV][_NEXT] = link[_NEXT]
+            link[_NEXT][_PREV] = link[_PREV]
+            link[_PREV] = root[_PREV]
+            link[_NEXT] = root
+            root[_PREV][_NEXT] = link
+            root[_PREV] = link
+
+            self.__hits += 1
+            return link[_DATA]
+        finally:
+            self.__lock.release()
+
+    def put(self, ns, key, data, generation):
+        """Cache `data` as the result of query `key` on namespace `ns`.
+
+        Does nothing if caching isn't enabled for `ns` or if `ns` has
+        been invalidated since `generation` was obtained.
+        """
+        if ns not in self.__ttls:
+            return
+        size = len(key) + len(data)
+        self.__lock.acquire()
+        try:
+            ttl = self.__ttls.get(ns)
+            if (ttl is None or size > self.__max_bytes or
+                generation != self.generation(ns)):
+                return
+
+            entries = self.__entries.setdefault(ns, {})
+            if key in entries:
+                self.__unlink(entries[key])
+                entries = self.__entries.setdefault(ns, {})
+
+            root = self.__root
+            link = [root[_PREV], root, ns, key, data, time.time() + ttl]
+            root[_PREV][_NEXT] = link
+            root[_PREV] = link
+            entries[key] = link
+            self.__size += size
+            self.__evict()
+        finally:
+            self.__lock.release()
+
+    def invalidate(self, ns):
+        """Drop all cached results for namespace `ns`.
+        """
+        if ns not in self.__ttls:
+            return
+        self.__lock.acquire()
+        try:
+            self.__generations[ns] = self.__generations.get(ns, 0) + 1
+            self.__remove(ns)
+        finally:
+            self.__lock.release()
+
+    def invalidate_database(self, name):
+        """Drop all cached results for collections in database `name`.
+        """
+        self.__lock.acquire()
+        try:
+            self.__generations[name] = self.__generations.get(name, 0) + 1
+            prefix = name + "."
+            for ns in self.__entries.keys():
+                if ns.startswith(prefix):
+                    self.__remove(ns)
+        finally:
+            self.__lock.release()
+
+    def clear(self):
+        """Drop all cached results.
+        """
+        self.__lock.acquire()
+        try:
+            for ns in self.__entries.keys():
+                self.__generations[ns] = self.__generations.get(ns, 0) + 1
+                self.__remove(ns)
+        finally:
+            self.__lock.release()
+
+    def __unlink(self, link):
+        """Remove `link` from the cache. The lock must be held.
+        """
+        link[_PREV][_NEXT] = link[_NEXT]
+        link[_NEXT][_PREV] = link[_PREV]
+        entries = self.__entries[link[_NS]]
+        del entries[link[_KEY]]
+        if not entries:
+            del self.__entries[link[_NS]]
+        self.__size -= len(link[_KEY]) + len(link[_DATA])
+
+    def __remove(self, ns):
+        """Remove all results for `ns`. The lock must be held.
+        """
+        for link in self.__entries.get(ns, {}).values():
+            self.__unlink(link)
+
+    def __evict(self):
+        """Evict results until we're under max_bytes. The lock must be
+        held.
+        """
+        root = self.__root
+        while self.__size > self.__max_bytes and root[_NEXT] is not root:
+            self.__unlink(root[_NEXT])
+            self.__evictions += 1
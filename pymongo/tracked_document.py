@@ -0,0 +1,131 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Documents that remember what they looked like when they were read.
+
+Use :class:`TrackedDocument` as the `document_class` of a connection
+(or the `as_class` of a query) and save changed documents with
+:meth:`~pymongo.collection.Collection.save_changes`, which only sends
+the fields that changed::
+
+  >>> connection.document_class = TrackedDocument
+  >>> profile = db.profiles.find_one({"name": "mike"})
+  >>> profile["address"]["city"] = "Paris"
+  >>> del profile["nickname"]
+  >>> profile.changes()
+  {'$set': {'address.city': 'Paris'}, '$unset': {'nickname': 1}}
+  >>> db.profiles.save_changes(profile)
+
+Fields are compared by their BSON encoding, so changes in type (e.g.
+from ``1`` to ``1.0``) are seen, but changes in the order of the keys
+of an embedded document are not. Documents read with a `fields`
+projection can be tracked too: fields that weren't read are left alone.
+
+.. versionadded:: 1.10
+"""
+
+import bson
+from pymongo.errors import InvalidOperation
+
+
+def _encode(key, value):
+    return bson.BSON.encode({key: value})
+
+
+def _is_path_safe(document):
+    """Can the keys of `document` be used in a dotted path?
+    """
+    for key in document:
+        if "." in key or key.startswith("$"):
+            return False
+    return True
+
+
+def _diff(path, old, new, to_set, to_unset):
+    """Add the updates needed to turn `old` into `new` (two values known
+    to be different) at `path` to `to_set` and `to_unset`.
+    """
+    if (isinstance(old, dict) and isinstance(new, dict) and old and new and
+        _is_path_safe(old) and _is_path_safe(new)):
+        for (key, value) in new.items():
+            if key not in old:
+                to_set[path + "." + key] = value
+            elif _encode(key, old[key]) != _encode(key, value):
+                _diff(path + "." + key, old[key], value, to_set, to_unset)
+        for key in old:
+            if key not in new:
+                to_unset[path + "." + key] = 1
+    else:
+        to_set[path] = new
+
+
+class TrackedDocument(dict):
+    """A :class:`dict` that can record its state, and compute the
+    update needed to save the changes made since then.
+
+    Documents read from the server through a cursor or
+    :meth:`~pymongo.collection.Collection.find_one` are recorded
+    automatically.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.__snapshot = None
+
+    @property
+    def is_tracked(self):
+        """Has the state of this document been recorded?
+        """
+        return self.__snapshot is not None
+
+    def mark_clean(self):
+        """Record the current state of this document.
+        """
+        # this runs for every document read, so just keep the encoded
+        # document: it's only taken apart if it turns out to have changed
+        self.__snapshot = bson.BSON.encode(self)
+
+    def changes(self):
+        """Get the update document that makes the changes made since the
+        state of this document was recorded.
+
+        Changed embedded documents are updated field by field. Returns
+        an empty dict if nothing changed. Raises
+        :class:`~pymongo.errors.InvalidOperation` if the state of this
+        document hasn't been recorded.
+        """
+        if self.__snapshot is None:
+            raise InvalidOperation("the state of this document hasn't "
+                                   "been recorded")
+        if bson.BSON.encode(self) == self.__snapshot:
+            return {}
+
+        snapshot = bson.BSON(self.__snapshot).decode()
+        to_set = {}
+        to_unset = {}
+        for (key, value) in self.iteritems():
+            if key not in snapshot:
+                to_set[key] = value
+            elif _encode(key, snapshot[key]) != _encode(key, value):
+                _diff(key, snapshot[key], value, to_set, to_unset)
+        for key in snapshot:
+            if key not in self:
+                to_unset[key] = 1
+
+        update = {}
+        if to_set:
+            update["$set"] = to_set
+        if to_unset:
+            update["$unset"] = to_unset
+        return update
@@ -0,0 +1,352 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A job queue stored in a collection.
+
+Jobs are documents; any document in the collection whose ``"done"``
+field isn't ``True`` is a job waiting to be done. A :class:`WorkQueue`
+claims jobs by setting their ``"lease_until"`` field with
+``findAndModify``, and acknowledges finished jobs by setting their
+``"done"`` field. Jobs whose lease runs out before they are acknowledged
+can be claimed again, by any client.
+
+A background thread keeps a few claimed jobs ready, so worker threads
+sharing a queue rarely wait for the server, and acknowledgements are
+sent in batches::
+
+  >>> queue = db.jobs.work_queue(lease=120)
+  >>> queue.put({"task": "resize", "image": "cat.jpg"})
+  >>> job = queue.get()
+  >>> resize(job["image"])
+  >>> queue.ack(job)
+
+Claiming still takes one round trip per job: ``findAndModify`` only
+modifies a single document, and claiming many with one update couldn't
+tell this client which ones it got. Prefetching hides that latency
+from the workers, but the number of jobs a single queue can claim per
+second is bounded by it.
+
+Leases are computed with the clock of the client claiming the job, so
+client clocks should be kept in sync.
+
+.. versionadded:: 1.10
+"""
+
+import atexit
+import datetime
+import sys
+import threading
+import time
+
+from pymongo import helpers
+from pymongo.errors import InvalidOperation
+
+# Time to wait before looking for jobs again when the queue is empty.
+_EMPTY_POLL_INTERVAL = 0.5
+
+# All queues that haven't been closed, closed when the interpreter
+# exits so that acknowledgements aren't lost.
+_queues = {}
+
+
+def _close_all():
+    for queue in _queues.values():
+        queue.close()
+atexit.register(_close_all)
+
+
+class WorkQueue(object):
+    """A job queue consumer and producer for a collection.
+
+    Should not be created directly by application developers - see
+    :meth:`~pymongo.collection.Collection.work_queue` instead.
+    """
+
+    def __init__(self, collection, lease=60, prefetch=10, query=None,
+                 sort=None, ack_batch=100, ack_interval=1.0):
+        if not isinstance(lease, (int, long, float)) or lease <= 0:
+            raise ValueError("lease must be a positive number")
+        if not isinstance(prefetch, int) or prefetch < 1:
+            raise ValueError("prefetch must be a positive int")
+        if not isinstance(ack_batch, int) or ack_batch < 1:
+            raise ValueError("ack_batch must be a positive int")
+        if query is not None and not isinstance(query, dict):
+            raise TypeError("query must be an instance of dict")
+
+        self.__collection = collection
+        self.__lease = lease
+        self.__prefetch = prefetch
+        self.__query = query or {}
+        self.__sort = helpers._index_document(sort or [("_id", 1)])
+        self.__ack_batch = ack_batch
+        self.__ack_interval = ack_interval
+
+        self.__condition = threading.Condition()
+        # claimed jobs and the time.time() their leases run out
+        self.__jobs = []
+        self.__acks = []
+        self.__ack_deadline = None
+        self.__closed = False
+
+        self.__claimed = 0
+        self.__expired = 0
+        self.__acked = 0
+        self.__last_error = None
+
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.setDaemon(True)
+        self.__thread.start()
+        _queues[id(self)] = self
+
+    @property
+    def collection(self):
+        """The :class:`~pymongo.collection.Collection` holding the jobs.
+        """
+        return self.__collection
+
+    @property
+    def claimed(self):
+        """The number of jobs claimed from the server.
+        """
+        return self.__claimed
+
+    @property
+    def expired(self):
+        """The number of claimed jobs dropped because their lease ran
+        out before a worker took them.
+        """
+        return self.__expired
+
+    @property
+    def acked(self):
+        """The number of acknowledgements sent to the server.
+        """
+        return self.__acked
+
+    @property
+    def last_error(self):
+        """The last error raised by the background thread, or ``None``.
+        """
+        return self.__last_error
+
+    def put(self, job, safe=False):
+        """Add a job to the queue.
+
+        Returns the ``"_id"`` of the job.
+
+        :Parameters:
+          - `job`: the job document
+          - `safe` (optional): check that the insert succeeded
+        """
+        return self.__collection.insert(job, safe=safe)
+
+    def get(self, timeout=None):
+        """Take a claimed job.
+
+        Returns the job document, or ``None`` if no job could be taken
+        within `timeout` seconds.
+
+        :Parameters:
+          - `timeout` (optional): maximum number of seconds to wait
+        """
+        deadline = timeout is not None and time.time() + timeout
+        self.__condition.acquire()
+        try:
+            while True:
+                if self.__closed:
+                    raise InvalidOperation("cannot get from a closed "
+                                           "WorkQueue")
+                now = time.time()
+                while self.__jobs:
+                    (job, lease_until) = self.__jobs.pop(0)
+                    self.__condition.notifyAll()
+                    # leave time to do the work before someone else
+                    # can claim the job
+                    if lease_until - now > self.__lease / 2.0:
+                        return job
+                    self.__expired += 1
+                if deadline:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                    self.__condition.wait(remaining)
+                else:
+                    self.__condition.wait()
+        finally:
+            self.__condition.release()
+
+    def ack(self, job):
+        """Acknowledge that a job is finished.
+
+        Acknowledgements are sent in batches, by :meth:`flush` or by the
+        background thread.
+
+        :Parameters:
+          - `job`: the job document, or its ``"_id"``
+        """
+        if isinstance(job, dict):
+            job = job["_id"]
+        self.__condition.acquire()
+        try:
+            if self.__closed:
+                raise InvalidOperation("cannot ack through a closed "
+                                       "WorkQueue")
+            if not self.__acks:
+                self.__ack_deadline = time.time() + self.__ack_interval
+            self.__acks.append(job)
+            if len(self.__acks) >= self.__ack_batch:
+                self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+
+    def flush(self):
+        """Send all pending acknowledgements now.
+
+        Acknowledgements are sent as safe updates, so a job isn't
+        counted in :attr:`acked` until the server has marked it done.
+        If sending fails the acknowledgements that weren't sent stay
+        pending, and the error is raised.
+        """
+        self.__condition.acquire()
+        try:
+            acks = self.__acks
+            self.__acks = []
+            self.__ack_deadline = None
+        finally:
+            self.__condition.release()
+        for i in range(0, len(acks), self.__ack_batch):
+            batch = acks[i:i + self.__ack_batch]
+            try:
+                self.__collection.update({"_id": {"$in": batch}},
+                                         {"$set": {"done": True,
+                                                   "lease_until": None}},
+                                         multi=True, safe=True)
+            except:
+                self.__condition.acquire()
+                try:
+                    self.__acks[0:0] = acks[i:]
+                    if self.__ack_deadline is None:
+                        self.__ack_deadline = (time.time() +
+                                               self.__ack_interval)
+                finally:
+                    self.__condition.release()
+                raise
+            self.__condition.acquire()
+            try:
+                self.__acked += len(batch)
+            finally:
+                self.__condition.release()
+
+    def close(self):
+        """Send pending acknowledgements and stop the background thread.
+
+        Claimed jobs that haven't been taken are released, so that they
+        can be claimed again straight away.
+        """
+        _queues.pop(id(self), None)
+        self.__condition.acquire()
+        try:
+            self.__closed = True
+            self.__condition.notifyAll()
+        finally:
+            self.__condition.release()
+        self.__thread.join()
+
+        jobs = [job["_id"] for (job, _) in self.__jobs]
+        self.__jobs = []
+        self.flush()
+        if jobs:
+            self.__collection.update({"_id": {"$in": jobs}},
+                                     {"$set": {"lease_until": None}},
+                                     multi=True)
+
+    def __claim(self):
+        """Claim a job from the server.
+
+        One ``findAndModify`` per job - there's no way to claim several
+        jobs atomically and learn which ones were claimed.
+        """
+        now = datetime.datetime.utcnow()
+        lease_until = time.time() + self.__lease
+        query = dict(self.__query)
+        query["done"] = {"$ne": True}
+        query["lease_until"] = {"$not": {"$gt": now}}
+        job = self.__collection.find_and_modify(
+            query, {"$set": {"lease_until": now + datetime.timedelta(
+                        seconds=self.__lease)}},
+            sort=self.__sort, new=True)
+        if job is None:
+            return None
+        return (job, lease_until)
+
+    def __run(self):
+        empty_until = 0
+        flush_after = 0
+        try:
+            while True:
+                self.__condition.acquire()
+                try:
+                    while True:
+                        if self.__closed:
+                            return
+                        now = time.time()
+                        due = (len(self.__acks) >= self.__ack_batch or
+                               (self.__ack_deadline is not None and
+                                now >= self.__ack_deadline))
+                        flush = due and now >= flush_after
+                        claim = (len(self.__jobs) < self.__prefetch and
+                                 now >= empty_until)
+                        if flush or claim:
+                            break
+
+                        timeouts = []
+                        if due:
+                            timeouts.append(flush_after - now)
+                        elif self.__ack_deadline is not None:
+                            timeouts.append(self.__ack_deadline - now)
+                        if len(self.__jobs) < self.__prefetch:
+                            timeouts.append(empty_until - now)
+                        if timeouts:
+                            self.__condition.wait(max(min(timeouts), 0.001))
+                        else:
+                            self.__condition.wait()
+                finally:
+                    self.__condition.release()
+
+                try:
+                    if flush:
+                        try:
+                            self.flush()
+                        except Exception:
+                            # retry later rather than straight away
+                            flush_after = time.time() + _EMPTY_POLL_INTERVAL
+                            raise
+                    if claim:
+                        claimed = self.__claim()
+                        self.__condition.acquire()
+                        try:
+                            if claimed is None:
+                                empty_until = (time.time() +
+                                               _EMPTY_POLL_INTERVAL)
+                            else:
+                                self.__jobs.append(claimed)
+                                self.__claimed += 1
+                                self.__condition.notifyAll()
+                        finally:
+                            self.__condition.release()
+                except Exception:
+                    self.__last_error = sys.exc_info()[1]
+                    empty_until = time.time() + _EMPTY_POLL_INTERVAL
+        finally:
+            self.__collection.database.connection.end_request()
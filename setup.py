@@ -131,14 +131,15 @@ c_ext = Feature(
     ext_modules=[Extension('bson._cbson',
                            include_dirs=['bson'],
                            sources=['bson/_cbsonmodule.c',
-                                    'bson/time64.c',
                                     'bson/buffer.c',
                                     'bson/encoding_helpers.c']),
+                 Extension('bson._cobjectid',
+                           include_dirs=['bson'],
+                           sources=['bson/_cobjectidmodule.c']),
                  Extension('pymongo._cmessage',
                            include_dirs=['bson'],
                            sources=['pymongo/_cmessagemodule.c',
                                     'bson/_cbsonmodule.c',
-                                    'bson/time64.c',
                                     'bson/buffer.c',
                                     'bson/encoding_helpers.c'])])
 
@@ -0,0 +1,69 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the async_writer module."""
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from pymongo.database import Database
+from pymongo.errors import InvalidOperation
+from test_connection import get_connection
+
+
+class TestAsyncWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(get_connection(), "pymongo_test")
+
+    def test_writes(self):
+        db = self.db
+        db.drop_collection("test")
+
+        writer = db.test.async_writer(batch_size=7)
+        for i in range(100):
+            writer.insert({"x": i})
+        writer.insert([{"x": 100}, {"x": 101}])
+        self.assertEqual(0, writer.insert({"_id": 0}))
+        self.assertEqual([""], writer.insert([{"_id": ""}]))
+        writer.update({"x": 1}, {"$set": {"y": 1}})
+        writer.update({}, {"$set": {"z": 1}}, multi=True)
+        writer.remove({"x": 2})
+        self.assert_(writer.flush(10))
+
+        self.assertEqual(106, writer.queued)
+        self.assertEqual(106, writer.sent)
+        self.assertEqual(0, writer.pending)
+        self.assertEqual(0, writer.dropped)
+        self.assertEqual(0, writer.failed)
+
+        self.assertEqual(103, db.test.count())
+        self.assertEqual(1, db.test.find_one({"x": 1})["y"])
+        self.assertEqual(103, db.test.find({"z": 1}).count())
+        self.assertEqual(None, db.test.find_one({"x": 2}))
+
+        writer.close()
+        self.assertRaises(InvalidOperation, writer.insert, {})
+
+    def test_options(self):
+        self.assertRaises(ValueError, self.db.test.async_writer,
+                          on_full="wait")
+        self.assertRaises(ValueError, self.db.test.async_writer,
+                          max_queue=0)
+        self.assertRaises(ValueError, self.db.test.async_writer,
+                          batch_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
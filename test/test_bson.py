@@ -18,8 +18,12 @@
 
 import unittest
 import datetime
+import os
 import re
+import struct
 import sys
+import tempfile
+from StringIO import StringIO
 try:
     import uuid
     should_test_uuid = True
@@ -32,14 +36,21 @@ from nose.plugins.skip import SkipTest
 import bson
 from bson import (BSON,
                   decode_all,
-                  is_valid)
+                  decode_file_iter,
+                  decode_iter,
+                  encode_into,
+                  encode_many,
+                  is_valid,
+                  validate)
 from bson.binary import Binary
 from bson.code import Code
 from bson.objectid import ObjectId
 from bson.dbref import DBRef
+from bson.raw import RawBSONDocument
 from bson.son import SON
 from bson.timestamp import Timestamp
-from bson.errors import (InvalidDocument,
+from bson.errors import (InvalidBSON,
+                         InvalidDocument,
                          InvalidStringData)
 from bson.max_key import MaxKey
 from bson.min_key import MinKey
@@ -67,6 +78,54 @@ class TestBSON(unittest.TestCase):
         self.assertFalse(is_valid("\x05\x00\x00\x00\x01"))
         self.assertFalse(is_valid("\x05\x00\x00\x00"))
         self.assertFalse(is_valid("\x05\x00\x00\x00\x00\x00"))
+        self.assertFalse(is_valid("\x14\x00\x00\x00\x04a\x00\x0b\x00"
+                                  "\x00\x00\x100\x00\x01\x00\x00\x00"
+                                  "\x00\x00"))
+
+    def test_validate(self):
+        self.assertRaises(TypeError, validate, u"test")
+
+        doc = BSON.encode(SON([("a", 1), ("b", [u"x", {"c": 2}]),
+                               ("d", Code("f", {"e": 1}))]))
+        self.assertEqual(None, validate(doc))
+        self.assertEqual(None, validate(doc * 3, multiple=True))
+        self.assertEqual(None, validate("", multiple=True))
+        self.assertEqual(0, validate(""))
+        self.assertEqual(len(doc), validate(doc * 2))
+        self.assertEqual(2 * len(doc), validate(doc * 2 + "\x05",
+                                                multiple=True))
+        self.assert_(is_valid(doc * 2, multiple=True))
+        self.assertFalse(is_valid(doc * 2))
+
+        # bad eoo of the document
+        self.assertEqual(len(doc) - 1, validate(doc[:-1] + "\x01"))
+        # bad type of "a"
+        self.assertEqual(4, validate(doc[:4] + "\x13" + doc[5:]))
+        # bad UTF-8 in u"x", the first element of "b"
+        position = doc.index("x\x00")
+        self.assertEqual(doc.index("\x020\x00"),
+                         validate(doc[:position] + "\xff" +
+                                  doc[position + 1:]))
+        # string not terminated by a null
+        self.assertEqual(doc.index("\x020\x00"),
+                         validate(doc[:position + 1] + "x" +
+                                  doc[position + 2:]))
+        # an element running past the end of its array
+        self.assertEqual(11, validate("\x14\x00\x00\x00\x04a\x00"
+                                      "\x0b\x00\x00\x00\x100\x00\x01\x00"
+                                      "\x00\x00\x00\x00"))
+        # a string length that overflows when added to the position
+        bad = ("\x0e\x00\x00\x00\x02a\x00" +
+               struct.pack("<i", 0x7FFFFFFB) + "x\x00\x00")
+        self.assertFalse(is_valid(bad))
+        self.assertEqual(4, validate(bad))
+
+        nested = {}
+        for _ in range(99):
+            nested = {"a": nested}
+        self.assertEqual(None, validate(BSON.encode(nested)))
+        data = BSON.encode({"a": nested})
+        self.assertEqual(7 * 100, validate(data))
 
     def test_random_data_is_not_bson(self):
         qcheck.check_unittest(self, qcheck.isnt(is_valid),
@@ -185,6 +244,11 @@ class TestBSON(unittest.TestCase):
         qcheck.check_unittest(self, encode_then_decode,
                               qcheck.gen_mongo_dict(3))
 
+    def test_decode_nested(self):
+        doc = {"a": [1, [2, [u"x", {"b": [3.5, None]}]], []],
+               "code": Code("return x", {"x": [1, {"y": [2]}]})}
+        self.assertEqual(doc, BSON.encode(doc).decode())
+
     def test_aware_datetime(self):
         aware = datetime.datetime(1993, 4, 4, 2, tzinfo=FixedOffset(555, "SomeZone"))
         as_utc = (aware - aware.utcoffset()).replace(tzinfo=utc)
@@ -294,6 +358,62 @@ class TestBSON(unittest.TestCase):
             if bson.has_c():
                 raise
 
+    def test_dates_as_millis(self):
+        dates = [(datetime.datetime(1, 1, 1), -62135596800000),
+                 (datetime.datetime(1969, 12, 31, 23, 59, 59, 999999), -1),
+                 (datetime.datetime(1970, 1, 1), 0),
+                 (datetime.datetime(2000, 2, 29, 12, 30, 15, 1000),
+                  951827415001),
+                 (datetime.datetime(9999, 12, 31, 23, 59, 59, 999000),
+                  253402300799999)]
+        for (date, millis) in dates:
+            date = date.replace(microsecond=date.microsecond // 1000 * 1000)
+            data = BSON.encode({"d": date})
+            self.assertEqual("\x10\x00\x00\x00\x09d\x00" +
+                             struct.pack("<q", millis) + "\x00", data)
+            self.assertEqual(date, data.decode()["d"])
+            self.assertEqual(date.replace(tzinfo=utc),
+                             data.decode(tz_aware=True)["d"])
+            self.assertEqual(millis, data.decode(dates_as_millis=True)["d"])
+            self.assertEqual([{"d": millis}] * 2,
+                             decode_all(data * 2, dates_as_millis=True))
+            self.assertEqual([{"d": millis}],
+                             list(decode_iter(data, dates_as_millis=True)))
+
+        paris = FixedOffset(60, "Paris")
+        data = BSON.encode({"d": datetime.datetime(1970, 1, 1, 1, 0, 0, 5000,
+                                                   paris)})
+        self.assertEqual(5, data.decode(dates_as_millis=True)["d"])
+
+        # any true tz_aware means timezone-aware datetimes
+        aware = datetime.datetime(1970, 1, 1, 0, 0, 0, 5000, utc)
+        self.assertEqual(aware, data.decode(tz_aware=2)["d"])
+        self.assertEqual([{"d": aware}], decode_all(data, dict, 2))
+        self.assertEqual([{"d": aware}], list(decode_iter(data, dict, 2)))
+        self.assertEqual(aware, bson._bson_to_dict(data, dict, 2)[0]["d"])
+
+        for millis in (-62135596800001, 253402300800000, -2 ** 63):
+            data = BSON("\x10\x00\x00\x00\x09d\x00" +
+                        struct.pack("<q", millis) + "\x00")
+            self.assertRaises(ValueError, data.decode)
+            self.assertRaises(ValueError, data.decode, dict, True)
+            self.assertEqual(millis, data.decode(dates_as_millis=True)["d"])
+
+    def test_shared_keys(self):
+        long_key = u"k" * 100
+        data = BSON.encode(SON([("a", 1), (u"\xe9", 2), (long_key, 3)]))
+        docs = decode_all(data * 2, SON)
+        self.assertEqual(docs[0], docs[1])
+        self.assertEqual([u"a", u"\xe9", long_key], docs[1].keys())
+        if bson.has_c():
+            self.assert_(docs[0].keys()[0] is docs[1].keys()[0])
+            self.assert_(docs[0].keys()[1] is docs[1].keys()[1])
+
+        for _ in range(2):
+            self.assertRaises(UnicodeDecodeError, decode_all,
+                              "\x0c\x00\x00\x00\x10\xff\x00\x01\x00"
+                              "\x00\x00\x00")
+
     def test_custom_class(self):
         self.assert_(isinstance(BSON.encode({}).decode(), dict))
         self.assertFalse(isinstance(BSON.encode({}).decode(), SON))
@@ -322,6 +442,23 @@ class TestBSON(unittest.TestCase):
             self.assertEqual(type(value), orig_type)
             self.assertEqual(value, orig_type(value))
 
+    def test_subclass_dispatch(self):
+        class _mylong(long):
+            pass
+        class _mybinary(Binary):
+            pass
+        class _mylist(list):
+            pass
+        d = {"a": _mylong(1), "b": _mybinary("x", 5), "c": _mylist([1])}
+        # twice, to use the cached encoders the second time
+        for _ in range(2):
+            self.assertEqual({"a": 1, "b": Binary("x", 5), "c": [1]},
+                             BSON.encode(d).decode())
+
+    def test_long_array(self):
+        doc = {"x": range(2500)}
+        self.assertEqual(doc, BSON.encode(doc).decode())
+
     def test_ordered_dict(self):
         try:
             from collections import OrderedDict
@@ -330,6 +467,120 @@ class TestBSON(unittest.TestCase):
         d = OrderedDict([("one", 1), ("two", 2), ("three", 3), ("four", 4)])
         self.assertEqual(d, BSON.encode(d).decode(as_class=OrderedDict))
 
+    def test_encode_into(self):
+        if sys.version_info[:2] < (2, 6):
+            raise SkipTest()
+
+        buf = bytearray()
+        self.assertEqual(12, encode_into(buf, {"a": 1}))
+        end = encode_into(buf, SON([("b", u"x"), ("c", [1.5])]))
+        self.assertEqual(len(buf), end)
+        self.assertEqual(BSON.encode({"a": 1}) +
+                         BSON.encode(SON([("b", u"x"), ("c", [1.5])])),
+                         str(buf))
+
+        self.assertEqual(12, encode_into(buf, {"z": 9}, 0))
+        self.assertEqual([{"z": 9}, {"b": u"x", "c": [1.5]}],
+                         decode_all(str(buf)))
+        self.assertEqual(end, len(buf))
+
+        buf = bytearray("header")
+        self.assertEqual(18, encode_into(buf, {"a": 1}, offset=6))
+        self.assertEqual("header", str(buf[:6]))
+        self.assertEqual(30, encode_into(buf, {"a": 2}, 18))
+
+        self.assertRaises(ValueError, encode_into, buf, {}, 31)
+        self.assertRaises(ValueError, encode_into, buf, {}, -1)
+        self.assertRaises(TypeError, encode_into, "", {})
+        self.assertRaises(InvalidDocument, encode_into, buf, {"$a": 1},
+                          check_keys=True)
+        self.assertEqual(30, len(buf))
+
+    def test_encode_many(self):
+        docs = [{"a": 1}, SON([("b", u"x"), ("c", [1.5])]), {}]
+        (data, offsets) = encode_many(docs)
+        self.assertEqual("".join([BSON.encode(doc) for doc in docs]), data)
+        self.assertEqual([0, 12, 12 + len(BSON.encode(docs[1]))], offsets)
+        self.assertEqual(docs, decode_all(data))
+
+        self.assertEqual(("", []), encode_many([]))
+        self.assertEqual(data, encode_many(iter(docs))[0])
+        self.assertRaises(InvalidDocument, encode_many, [{"$a": 1}], True)
+        self.assertRaises(TypeError, encode_many, [{}, 5])
+        self.assertRaises(TypeError, encode_many, 5)
+
+    def test_decode_iter(self):
+        docs = [{"a": 1}, SON([("b", u"x"), ("c", [1.5])]), {}]
+        data = encode_many(docs)[0]
+        self.assertEqual(docs, list(decode_iter(data)))
+        self.assertEqual(docs, list(decode_iter(buffer(data))))
+        if sys.version_info[:2] >= (2, 6):
+            self.assertEqual(docs, list(decode_iter(bytearray(data))))
+        self.assertEqual([], list(decode_iter("")))
+        self.assertEqual([BSON.encode(doc) for doc in docs],
+                         [doc.raw for doc in
+                          decode_iter(data, RawBSONDocument)])
+
+        self.assertRaises(InvalidBSON, list, decode_iter(data[:-1]))
+        self.assertRaises(InvalidBSON, list, decode_iter(data + "\x05"))
+        self.assertRaises(InvalidBSON, list,
+                          decode_iter("\x04\x00\x00\x00\x00"))
+
+    def test_decode_file_iter(self):
+        docs = [{"a": 1}, SON([("b", u"x"), ("c", [1.5])]), {}]
+        data = encode_many(docs)[0]
+        self.assertEqual(docs, list(decode_file_iter(StringIO(data))))
+        self.assertEqual([], list(decode_file_iter(StringIO(""))))
+        self.assertRaises(InvalidBSON, list,
+                          decode_file_iter(StringIO(data[:-1])))
+        self.assertRaises(InvalidBSON, list,
+                          decode_file_iter(StringIO(data + "\x05")))
+
+        (fd, path) = tempfile.mkstemp()
+        try:
+            os.close(fd)
+            self.assertEqual([], list(decode_file_iter(path)))
+            f = open(path, "wb")
+            f.write(data)
+            f.close()
+            self.assertEqual(docs, list(decode_file_iter(path)))
+            self.assertEqual([BSON.encode(doc) for doc in docs],
+                             [doc.raw for doc in
+                              decode_file_iter(path, RawBSONDocument)])
+        finally:
+            os.remove(path)
+
+    def test_decode_columns(self):
+        oid = ObjectId()
+        data = "".join([BSON.encode({"x": 1.5, "y": 2, "_id": oid}),
+                        BSON.encode({"x": "hello", "y": 2 ** 40}),
+                        BSON.encode({"z": True, "x": 3})])
+
+        columns = bson._decode_columns(data, ("x", "y", "_id", "z"), "dqO?")
+        (x, y, _id, z) = columns
+        self.assertEqual(struct.pack("<ddd", 1.5, 0, 3), x[0])
+        self.assertEqual("\x01\x00\x01", x[1])
+        self.assertEqual(struct.pack("<qqq", 2, 2 ** 40, 0), y[0])
+        self.assertEqual("\x01\x01\x00", y[1])
+        self.assertEqual(oid.binary + "\x00" * 24, _id[0])
+        self.assertEqual("\x01\x00\x00", _id[1])
+        self.assertEqual("\x00\x00\x01", z[0])
+        self.assertEqual("\x00\x00\x01", z[1])
+
+        self.assertEqual([("", "")], bson._decode_columns("", ("x",), "d"))
+        self.assertRaises(ValueError, bson._decode_columns, data, ("x",), "z")
+        self.assertRaises(InvalidBSON, bson._decode_columns,
+                          data[:-1], ("x",), "d")
+
+        # a string length that overflows when added to the position
+        if bson.has_c():
+            bad = ("\x0e\x00\x00\x00\x02a\x00" +
+                   struct.pack("<i", 0x7FFFFFFB) + "x\x00\x00")
+            self.assertRaises(InvalidBSON, bson._decode_columns,
+                              bad, ("b",), "d")
+            self.assertRaises(InvalidBSON, bson._decode_columns,
+                              bad, ("a",), "d")
+
 
 if __name__ == "__main__":
     unittest.main()
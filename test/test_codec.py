@@ -0,0 +1,113 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the custom type codec registry."""
+
+import cPickle
+import decimal
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from bson import BSON, decode_all
+from bson.binary import Binary
+from bson.codec import (_binary_decoders,
+                        _encoders,
+                        register_binary_decoder,
+                        register_encoder,
+                        unregister_binary_decoder,
+                        unregister_encoder)
+from bson.errors import InvalidDocument
+from bson.son import SON
+
+
+def _pickle(value):
+    return Binary(cPickle.dumps(value, 2), 200)
+
+
+class _Money(decimal.Decimal):
+    pass
+
+
+class TestCodec(unittest.TestCase):
+
+    def tearDown(self):
+        _encoders.clear()
+        _binary_decoders.clear()
+
+    def test_register(self):
+        self.assertRaises(TypeError, register_encoder, "set", _pickle)
+        self.assertRaises(TypeError, register_encoder, set, None)
+        self.assertRaises(TypeError, register_binary_decoder, "200", str)
+        self.assertRaises(ValueError, register_binary_decoder, 0, str)
+        self.assertRaises(ValueError, register_binary_decoder, 256, str)
+        self.assertRaises(TypeError, register_binary_decoder, 200, None)
+        self.assertRaises(KeyError, unregister_encoder, set)
+        self.assertRaises(KeyError, unregister_binary_decoder, 200)
+
+    def test_encode(self):
+        doc = {"price": decimal.Decimal("9.99"),
+               "list": [decimal.Decimal("1")],
+               "sub": {"price": _Money("2.5")}}
+        self.assertRaises(InvalidDocument, BSON.encode, doc)
+
+        register_encoder(decimal.Decimal, str)
+        self.assertEqual({"price": "9.99", "list": ["1"],
+                          "sub": {"price": "2.5"}},
+                         BSON.encode(doc).decode())
+
+        unregister_encoder(decimal.Decimal)
+        self.assertRaises(InvalidDocument, BSON.encode, doc)
+
+    def test_builtin_types(self):
+        class MyDict(dict):
+            pass
+        for python_type in (int, bool, unicode, MyDict, Binary, SON,
+                            type(None)):
+            self.assertRaises(ValueError, register_encoder,
+                              python_type, str)
+
+    def test_encoder_result(self):
+        # the value returned is encoded without custom encoders
+        register_encoder(set, frozenset)
+        register_encoder(frozenset, list)
+        self.assertRaises(InvalidDocument, BSON.encode, {"s": set()})
+
+        register_encoder(set, lambda value: SON([("s", frozenset())]))
+        self.assertEqual({"s": {"s": []}},
+                         BSON.encode({"s": set()}).decode())
+
+        def fail(value):
+            raise ValueError("cannot encode")
+        register_encoder(set, fail)
+        self.assertRaises(ValueError, BSON.encode, {"s": set()})
+
+    def test_decode(self):
+        register_encoder(set, _pickle)
+        data = BSON.encode({"s": set([1, 2]), "b": Binary("x", 201)})
+        self.assertEqual({"s": _pickle(set([1, 2])), "b": Binary("x", 201)},
+                         data.decode())
+
+        register_binary_decoder(200, cPickle.loads)
+        self.assertEqual({"s": set([1, 2]), "b": Binary("x", 201)},
+                         data.decode())
+        self.assertEqual([{"s": set([1, 2]), "b": Binary("x", 201)}] * 2,
+                         decode_all(data * 2))
+
+        unregister_binary_decoder(200)
+        self.assertEqual(_pickle(set([1, 2])), data.decode()["s"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,9 +27,11 @@ from nose.plugins.skip import SkipTest
 
 sys.path[0:0] = [""]
 
+from bson import BSON
 from bson.binary import Binary
 from bson.code import Code
 from bson.objectid import ObjectId
+from bson.raw import RawBSONDocument
 from bson.son import SON
 from pymongo import ASCENDING, DESCENDING
 from pymongo.collection import Collection
@@ -38,6 +40,7 @@ from pymongo.errors import (DuplicateKeyError,
                             InvalidName,
                             InvalidOperation,
                             OperationFailure,
+                            ParallelInsertError,
                             TimeoutError)
 from test.test_connection import get_connection
 from test import (qcheck,
@@ -312,6 +315,37 @@ class TestCollection(unittest.TestCase):
         self.db.test.remove()
         self.assertEqual(0, self.db.test.count())
 
+    def test_remove_many(self):
+        db = self.db
+        db.drop_collection("test")
+        db.test.insert([{"_id": i} for i in range(1000)], safe=True)
+
+        db.test.remove_many(xrange(0, 1000, 2), chunk_size=33)
+        db.test.remove_many(iter([1, 3, 5, 2000]), safe=True)
+        self.assertEqual(497, db.test.count())
+        self.assertEqual(7, db.test.find_one(sort=[("_id", 1)])["_id"])
+
+        self.assertEqual(None, db.test.remove_many([], safe=True))
+        self.assertRaises(ValueError, db.test.remove_many, [1],
+                          chunk_size=0)
+
+    def test_raw_document(self):
+        db = self.db
+        db.drop_collection("test")
+        db.drop_collection("test2")
+        db.test.insert({"_id": 1, "x": {"y": [1, 2]}}, safe=True)
+
+        raw = db.test.find_one(as_class=RawBSONDocument)
+        self.assert_(isinstance(raw, RawBSONDocument))
+        self.assertEqual([1, 2], raw["x"]["y"])
+        self.assertEqual(1, db.test2.insert(raw, safe=True))
+        self.assertEqual(raw.raw, db.test2.find_one(
+                as_class=RawBSONDocument).raw)
+
+        db.test2.update({"_id": 1}, RawBSONDocument(BSON.encode({"z": 3})),
+                        safe=True)
+        self.assertEqual({"_id": 1, "z": 3}, db.test2.find_one())
+
     def test_find_w_fields(self):
         db = self.db
         db.test.remove({})
@@ -440,6 +474,34 @@ class TestCollection(unittest.TestCase):
 
         self.assertRaises(InvalidOperation, db.test.insert, [])
 
+    def test_insert_parallel(self):
+        db = self.db
+        db.drop_collection("test")
+
+        docs = [{"x": i} for i in range(1000)]
+        ids = db.test.insert_parallel(docs, workers=4, batch_size=90,
+                                      safe=True)
+        self.assertEqual(1000, len(ids))
+        self.assertEqual([doc["_id"] for doc in docs], ids)
+        self.assertEqual(1000, db.test.count())
+        self.assertEqual(range(1000),
+                         [doc["x"] for doc in db.test.find().sort("x")])
+
+        db.test.create_index("x", unique=True)
+        try:
+            db.test.insert_parallel([{"x": 2000 + i} for i in range(10)] +
+                                    [{"x": 5}], batch_size=5, safe=True)
+        except ParallelInsertError, e:
+            self.assertEqual(1, len(e.errors))
+            self.assertEqual(10, len(e.ids))
+            self.assert_(isinstance(e.errors[0][1], DuplicateKeyError))
+        else:
+            self.fail("ParallelInsertError not raised")
+
+        self.assertRaises(InvalidOperation, db.test.insert_parallel, [])
+        self.assertRaises(ValueError, db.test.insert_parallel, [{}],
+                          batch_size=0)
+
     def test_insert_iterables(self):
         db = self.db
 
@@ -865,6 +927,48 @@ class TestCollection(unittest.TestCase):
         self.assertEqual(None, db.test.find_one({"hello": "foo"}))
         self.assertEqual(None, db.test.find_one(ObjectId()))
 
+        db.test.save({"query": "a", "x": 1})
+        self.assertEqual(1, db.test.find_one({"query": "a"})["x"])
+        self.assertEqual(1, db.test.find_one({"query": "a"},
+                                             as_class=SON)["x"])
+        self.assert_(isinstance(db.test.find_one({"query": "a"},
+                                                 as_class=SON), SON))
+
+    def test_find_by_ids(self):
+        db = self.db
+        db.drop_collection("test")
+
+        for i in range(0, 100, 2):
+            db.test.insert({"_id": i, "x": i * 2, "y": "foo"})
+
+        ids = range(100)[::-1] + [4, 4, 1000]
+        docs = db.test.find_by_ids(ids, chunk_size=7)
+        self.assertEqual(len(ids), len(docs))
+        for (_id, doc) in zip(ids, docs):
+            if _id % 2 or _id >= 100:
+                self.assertEqual(None, doc)
+            else:
+                self.assertEqual({"_id": _id, "x": _id * 2, "y": "foo"}, doc)
+
+        self.assertEqual([{"_id": 2, "x": 4}, None],
+                         db.test.find_by_ids([2, 3], fields=["x"]))
+        self.assertEqual([{"x": 4}],
+                         db.test.find_by_ids([2], fields={"_id": 0, "x": 1}))
+        self.assertEqual([{"y": "foo"}],
+                         db.test.find_by_ids([2], fields={"_id": 0, "x": 0}))
+        self.assertEqual([], db.test.find_by_ids([]))
+        self.assertEqual([{"_id": 2, "x": 4, "y": "foo"}, None],
+                         db.test.find_by_ids(iter([2, 3])))
+        self.assertRaises(ValueError, db.test.find_by_ids, [1], chunk_size=0)
+
+        # raw documents are read-only, so they keep their _id
+        db.connection.document_class = RawBSONDocument
+        try:
+            (raw,) = db.test.find_by_ids([2], fields={"_id": 0, "x": 1})
+        finally:
+            db.connection.document_class = dict
+        self.assertEqual({"_id": 2, "x": 4}, dict(raw))
+
     def test_find_one_non_objectid(self):
         db = self.db
         db.drop_collection("test")
@@ -111,6 +111,14 @@ class TestConnection(unittest.TestCase):
         self.assertEqual(connection.test, connection["test"])
         self.assertEqual(connection.test, Database(connection, "test"))
 
+    def test_database_handles_cached(self):
+        connection = Connection(_connect=False)
+        self.assert_(connection.test is connection.test)
+        self.assert_(connection.test is connection["test"])
+        self.assert_(connection.test is connection[u"test"])
+        self.assert_(connection.test is not connection.mike)
+        self.assert_(connection.test is not Connection(_connect=False).test)
+
     def test_database_names(self):
         connection = Connection(self.host, self.port)
 
@@ -466,6 +474,26 @@ class TestConnection(unittest.TestCase):
         self.assertEqual(aware.pymongo_test.test.find_one()["x"].replace(tzinfo=None),
                          naive.pymongo_test.test.find_one()["x"])
 
+    def test_dates_as_millis(self):
+        millis = Connection(self.host, self.port, dates_as_millis=True)
+        naive = Connection(self.host, self.port)
+        self.assert_(millis.dates_as_millis)
+        self.assertFalse(naive.dates_as_millis)
+        millis.pymongo_test.drop_collection("test")
+
+        epoch = datetime.datetime(1970, 1, 1)
+        millis.pymongo_test.test.insert({"x": epoch}, safe=True)
+
+        self.assertEqual(0, millis.pymongo_test.test.find_one()["x"])
+        self.assertEqual(0, millis.pymongo_test.test.find().next()["x"])
+        self.assertEqual(epoch, millis.pymongo_test.test.find_one(
+                dates_as_millis=False)["x"])
+        self.assertEqual(epoch, naive.pymongo_test.test.find_one()["x"])
+        self.assertEqual(0, naive.pymongo_test.test.find_one(
+                dates_as_millis=True)["x"])
+        self.assertEqual(0, naive.pymongo_test.test.find(
+                dates_as_millis=True).next()["x"])
+
     def test_auth_from_database(self):
         conn = Connection(self.host, self.port)
 
@@ -0,0 +1,142 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the counter_aggregator module."""
+import struct
+import time
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+import bson
+from pymongo.connection import Connection
+from pymongo.database import Database
+from pymongo.errors import InvalidOperation
+from test_connection import get_connection
+
+
+def _decode_updates(data):
+    """Decode a string of update messages to (spec, document) pairs.
+    """
+    updates = []
+    while data:
+        length = struct.unpack("<i", data[:4])[0]
+        body = data[20:length]
+        body = body[body.index("\x00") + 5:]
+        updates.append(tuple(bson.decode_all(body)))
+        data = data[length:]
+    return updates
+
+
+class TestCounterAggregatorMerging(unittest.TestCase):
+
+    def setUp(self):
+        self.sent = []
+        connection = Connection(_connect=False)
+        connection._send_message = lambda msg, safe=False: \
+            self.sent.extend(_decode_updates(msg[1]))
+        connection.end_request = lambda: None
+        self.counters = connection.pymongo_test.test.counter_aggregator(
+            interval=60)
+
+    def tearDown(self):
+        self.counters.close()
+
+    def test_merge(self):
+        counters = self.counters
+        for i in range(10):
+            counters.inc("a", "n")
+        counters.inc("a", {"n": 5, "m": 2})
+        counters.inc({"page": "/"}, "views", 3)
+        counters.max("a", "top", 4)
+        counters.max("a", "top", 9)
+        counters.max("a", "top", 2)
+        counters.min("a", "low", 4)
+        counters.min("a", "low", 1)
+        self.assertEqual(17, counters.pending)
+        self.assertEqual([], self.sent)
+
+        counters.flush()
+        self.assertEqual(0, counters.pending)
+        self.assertEqual(2, counters.sent)
+        self.assertEqual([({"_id": "a"}, {"$inc": {"n": 15, "m": 2},
+                                          "$max": {"top": 9},
+                                          "$min": {"low": 1}}),
+                          ({"page": "/"}, {"$inc": {"views": 3}})],
+                         self.sent)
+
+    def test_conflicting_operators(self):
+        counters = self.counters
+        counters.inc("a", "n", 2)
+        counters.max("a", "n", 10)
+        counters.inc("a", "n", 3)
+        counters.flush()
+        self.assertEqual([({"_id": "a"}, {"$inc": {"n": 2}}),
+                          ({"_id": "a"}, {"$max": {"n": 10}}),
+                          ({"_id": "a"}, {"$inc": {"n": 3}})],
+                         self.sent)
+
+    def test_max_pending(self):
+        counters = self.counters.collection.counter_aggregator(
+            interval=60, max_pending=5)
+        for i in range(5):
+            counters.inc(i, "n")
+        for i in range(100):
+            if self.sent:
+                break
+            time.sleep(0.01)
+        self.assertEqual(5, len(self.sent))
+        counters.close()
+
+    def test_close(self):
+        counters = self.counters
+        counters.inc("a", "n")
+        counters.close()
+        self.assertEqual([({"_id": "a"}, {"$inc": {"n": 1}})], self.sent)
+        self.assertRaises(InvalidOperation, counters.inc, "a", "n")
+
+    def test_options(self):
+        collection = self.counters.collection
+        self.assertRaises(ValueError, collection.counter_aggregator,
+                          interval=0)
+        self.assertRaises(ValueError, collection.counter_aggregator,
+                          max_pending=0)
+        self.assertRaises(TypeError, self.counters.inc, "a", 5)
+        self.assertRaises(TypeError, self.counters.inc, "a", "n", "1")
+
+
+class TestCounterAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(get_connection(), "pymongo_test")
+
+    def test_counters(self):
+        db = self.db
+        db.drop_collection("test")
+
+        counters = db.test.counter_aggregator(safe=True)
+        for i in range(100):
+            counters.inc(i % 3, "n")
+        counters.flush()
+        self.assertEqual(3, counters.sent)
+        self.assertEqual([34, 33, 33],
+                         [db.test.find_one(i)["n"] for i in range(3)])
+
+        counters.inc(0, "n", 6)
+        counters.close()
+        self.assertEqual(40, db.test.find_one(0)["n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
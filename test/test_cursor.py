@@ -29,6 +29,7 @@ from pymongo.cursor import Cursor
 from pymongo.database import Database
 from pymongo.errors import (InvalidOperation,
                             OperationFailure)
+from pymongo.prepared import Param
 from test_connection import get_connection
 import version
 
@@ -647,6 +648,46 @@ class TestCursor(unittest.TestCase):
         self.assertEqual(50, len(list(self.db.test.find()
                                       .max_scan(90).max_scan(50))))
 
+    def test_to_columns(self):
+        db = self.db
+        db.drop_collection("test")
+        for i in range(150):
+            db.test.insert({"x": i, "y": i * 0.5, "odd": bool(i % 2)})
+        db.test.insert({"x": "not a number"})
+
+        columns = db.test.find().sort("_id").batch_size(20).to_columns(
+            ["x", "y", "odd"], {"x": "int64", "odd": "bool"})
+        (x, x_mask) = columns["x"]
+        (y, y_mask) = columns["y"]
+        (odd, odd_mask) = columns["odd"]
+        self.assertEqual(151, len(x))
+        self.assertEqual(range(150) + [0], list(x))
+        self.assertEqual([True] * 150 + [False], map(bool, x_mask))
+        self.assertEqual([i * 0.5 for i in range(150)] + [0], list(y))
+        self.assertEqual([True] * 150 + [False], map(bool, y_mask))
+        self.assertEqual([bool(i % 2) for i in range(150)] + [False],
+                         map(bool, odd))
+
+        columns = db.test.find({"x": {"$lt": 10}}).limit(5).to_columns(["x"])
+        self.assertEqual(5, len(columns["x"][0]))
+
+        columns = db.test.find({"x": {"$gt": 1000}}).to_columns(["x"])
+        self.assertEqual(0, len(columns["x"][0]))
+
+        columns = db.test.prepare({"x": {"$lt": Param("n")}}).find(
+            {"n": 3}).to_columns(["odd"], ["bool"])
+        self.assertEqual([False, True, False], map(bool, columns["odd"][0]))
+
+        cursor = db.test.find()
+        cursor.next()
+        self.assertRaises(InvalidOperation, cursor.to_columns, ["x"])
+        self.assertRaises(InvalidOperation,
+                          db.test.find(tailable=True).to_columns, ["x"])
+        self.assertRaises(ValueError, db.test.find().to_columns,
+                          ["x"], ["float16"])
+        self.assertRaises(ValueError, db.test.find().to_columns,
+                          ["x", "y"], ["float64"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -15,10 +15,12 @@
 """Test the database module."""
 
 import datetime
+import gc
 import random
 import sys
 sys.path[0:0] = [""]
 import unittest
+import weakref
 
 from bson.code import Code
 from bson.dbref import DBRef
@@ -70,6 +72,44 @@ class TestDatabase(unittest.TestCase):
         self.assertNotEqual(db.test, Collection(db, "mike"))
         self.assertEqual(db.test.mike, db["test.mike"])
 
+    def test_collection_handles_cached(self):
+        connection = Connection(_connect=False)
+        db = connection.pymongo_test
+        self.assert_(db.test is db.test)
+        self.assert_(db.test is db["test"])
+        self.assert_(db.test.mike is db["test.mike"])
+        self.assert_(db.test is not db.mike)
+        self.assert_(db.test is not Database(connection, "pymongo_test").test)
+        self.assertRaises(InvalidName, getattr, db, "te$t")
+
+    def test_manipulated_handle_not_shared(self):
+        connection = Connection(_connect=False)
+        db = connection.pymongo_test
+        db.add_son_manipulator(NamespaceInjector())
+        self.assert_(connection.pymongo_test is not db)
+        self.assert_("_ns" not in
+                     connection.pymongo_test._fix_incoming({}, db.test))
+
+        # past the cache bound the manipulator still only applies to db
+        for i in range(500):
+            connection["pymongo_test%d" % i]
+        gc.collect()
+        self.assertEqual("test", db._fix_incoming({}, db.test)["_ns"])
+        self.assert_("_ns" not in
+                     connection.pymongo_test._fix_incoming({}, db.test))
+
+    def test_handle_cache_bounded(self):
+        db = Connection(_connect=False).pymongo_test
+        test = db.test
+        unused = weakref.ref(db.unused)
+        for i in range(500):
+            db["test%d" % i]
+        gc.collect()
+        # unreferenced handles are dropped, ones in use are kept
+        self.assertEqual(None, unused())
+        self.assert_(test is db.test)
+        self.assert_(db.test499 is db.test499)
+
     def test_create_collection(self):
         db = Database(self.connection, "pymongo_test")
 
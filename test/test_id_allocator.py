@@ -0,0 +1,94 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the id_allocator module."""
+import threading
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from pymongo.connection import Connection
+from pymongo.database import Database
+from test_connection import get_connection
+
+
+class TestIdAllocatorBlocks(unittest.TestCase):
+
+    def setUp(self):
+        self.counters = {}
+        self.calls = []
+        self.collection = Connection(_connect=False).pymongo_test.counters
+        self.collection.find_and_modify = self.find_and_modify
+
+    def find_and_modify(self, query, update, upsert=False, new=False):
+        self.calls.append(query["_id"])
+        n = self.counters.get(query["_id"], 0) + update["$inc"]["n"]
+        self.counters[query["_id"]] = n
+        return {"_id": query["_id"], "n": n}
+
+    def test_blocks(self):
+        ids = self.collection.id_allocator("a", block_size=10,
+                                           prefetch=False)
+        self.assertEqual(range(1, 26), [ids.next() for i in range(25)])
+        self.assertEqual(3, len(self.calls))
+
+        other = self.collection.id_allocator("a", block_size=10,
+                                             prefetch=False)
+        self.assertEqual(31, other.next())
+        self.assertEqual(26, ids.next())
+        self.assertEqual(1, self.collection.id_allocator("b").next())
+
+    def test_prefetch(self):
+        ids = self.collection.id_allocator("a", block_size=8)
+        self.assertEqual(range(1, 101), [ids.next() for i in range(100)])
+
+    def test_threads(self):
+        ids = self.collection.id_allocator("a", block_size=7)
+        results = []
+
+        def allocate():
+            for i in range(500):
+                results.append(ids.next())
+
+        threads = [threading.Thread(target=allocate) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2000, len(set(results)))
+
+    def test_options(self):
+        self.assertRaises(ValueError, self.collection.id_allocator, "a",
+                          block_size=0)
+
+
+class TestIdAllocator(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(get_connection(), "pymongo_test")
+
+    def test_ids(self):
+        db = self.db
+        db.drop_collection("counters")
+
+        ids = db.counters.id_allocator("test", block_size=10)
+        self.assertEqual(range(1, 16), [ids.next() for i in range(15)])
+        self.assertEqual(20, db.counters.find_one("test")["n"])
+
+        other = db.counters.id_allocator("test", block_size=10)
+        self.assertEqual(21, other.next())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the index_cache module."""
+import os
+import tempfile
+import time
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from pymongo.connection import Connection
+from pymongo.index_cache import IndexCache
+
+
+class TestIndexCache(unittest.TestCase):
+
+    def test_add(self):
+        cache = IndexCache()
+        self.assert_(cache.add("db", "a", "x_1", 10))
+        self.assertFalse(cache.add("db", "a", "x_1", 10))
+        self.assert_(cache.contains("db", "a", "x_1"))
+        self.assertFalse(cache.contains("db", "b", "x_1"))
+        self.assertFalse(cache.contains("other", "a", "x_1"))
+
+        self.assert_(cache.add("db", "a", "y_1", 0.1))
+        time.sleep(0.2)
+        self.assertFalse(cache.contains("db", "a", "y_1"))
+        self.assert_(cache.add("db", "a", "y_1", 10))
+
+    def test_prime(self):
+        cache = IndexCache()
+        self.assertFalse(cache.is_primed("db", "a"))
+        cache.prime("db", "a", ["_id_", "x_1"], 10)
+        self.assert_(cache.is_primed("db", "a"))
+        self.assert_(cache.contains("db", "a", "x_1"))
+        self.assertFalse(cache.contains("db", "a", "y_1"))
+        self.assertFalse(cache.is_primed("db", "b"))
+
+    def test_purge(self):
+        cache = IndexCache()
+        for ns in [("db", "a"), ("db", "b"), ("other", "a")]:
+            cache.prime(ns[0], ns[1], ["x_1", "y_1"], 10)
+
+        cache.purge("db", "a", "x_1")
+        self.assertFalse(cache.contains("db", "a", "x_1"))
+        self.assert_(cache.contains("db", "a", "y_1"))
+        self.assert_(cache.is_primed("db", "a"))
+
+        cache.purge("db", "a")
+        self.assertFalse(cache.contains("db", "a", "y_1"))
+        self.assertFalse(cache.is_primed("db", "a"))
+        self.assert_(cache.contains("db", "b", "x_1"))
+
+        cache.purge("db")
+        self.assertFalse(cache.contains("db", "b", "x_1"))
+        self.assert_(cache.contains("other", "a", "x_1"))
+
+        cache.clear()
+        self.assertFalse(cache.contains("other", "a", "x_1"))
+
+    def test_shared_file(self):
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            first = IndexCache(path)
+            second = IndexCache(path)
+            self.assertEqual(path, first.path)
+
+            self.assert_(first.add("db", "a", "x_1", 10))
+            self.assert_(second.contains("db", "a", "x_1"))
+            self.assertFalse(second.add("db", "a", "x_1", 10))
+
+            second.prime("db", "b", ["_id_"], 10)
+            self.assert_(first.is_primed("db", "b"))
+            self.assert_(IndexCache(path).contains("db", "b", "_id_"))
+
+            first.purge("db", "a")
+            self.assertFalse(IndexCache(path).contains("db", "a", "x_1"))
+            self.assert_(IndexCache(path).contains("db", "b", "_id_"))
+
+            first.clear()
+            self.assertFalse(IndexCache(path).is_primed("db", "b"))
+        finally:
+            os.remove(path)
+
+    def test_connection(self):
+        connection = Connection(_connect=False)
+        self.assert_(isinstance(connection.index_cache, IndexCache))
+        self.assert_(connection._cache_index("db", "a", "x_1", 10))
+        self.assertFalse(connection._cache_index("db", "a", "x_1", 10))
+        connection._purge_index("db")
+        self.assert_(connection._cache_index("db", "a", "x_1", 10))
+
+        cache = IndexCache()
+        connection.index_cache = cache
+        self.assert_(connection.index_cache is cache)
+        self.assertRaises(TypeError, setattr, connection, "index_cache", {})
+
+
+if __name__ == "__main__":
+    unittest.main()
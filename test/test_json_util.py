@@ -16,6 +16,7 @@
 
 import unittest
 import datetime
+import decimal
 import re
 import sys
 json_lib = True
@@ -36,6 +37,7 @@ from nose.plugins.skip import SkipTest
 
 sys.path[0:0] = [""]
 
+from bson.codec import register_encoder, unregister_encoder
 from bson.objectid import ObjectId
 from bson.dbref import DBRef
 from bson.min_key import MinKey
@@ -103,5 +105,14 @@ class TestJsonUtil(unittest.TestCase):
             raise SkipTest()
         self.round_trip({'uuid' : uuid.UUID('f47ac10b-58cc-4372-a567-0e02b2c3d479')})
 
+    def test_custom_encoder(self):
+        doc = {"price": decimal.Decimal("9.99")}
+        self.assertRaises(TypeError, json.dumps, doc, default=default)
+        register_encoder(decimal.Decimal, str)
+        try:
+            self.assertEqual({"price": "9.99"}, self.round_tripped(doc))
+        finally:
+            unregister_encoder(decimal.Decimal)
+
 if __name__ == "__main__":
     unittest.main()
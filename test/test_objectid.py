@@ -14,9 +14,12 @@
 
 """Tests for the objectid module."""
 
+import copy
 import datetime
+import pickle
 import warnings
 import unittest
+import weakref
 import sys
 import time
 sys.path[0:0] = [""]
@@ -124,5 +127,64 @@ class TestObjectId(unittest.TestCase):
         oid = ObjectId.from_datetime(aware)
         self.assertEqual(as_utc, oid.generation_time)
 
+    def test_hash(self):
+        a = ObjectId()
+        self.assertEqual(hash(a), hash(ObjectId(a.binary)))
+        self.assertNotEqual(hash(a), hash(ObjectId()))
+        self.assertEqual(1, len(set([a, ObjectId(str(a)), ObjectId(a)])))
+
+    def test_ordering(self):
+        ids = [ObjectId("%024x" % i) for i in (3, 256, 1, 2)]
+        self.assertEqual(["%024x" % i for i in (1, 2, 3, 256)],
+                         [str(o) for o in sorted(ids)])
+        self.assert_(ids[0] < ids[1] <= ids[1])
+        self.assert_(ids[1] > ids[2] >= ids[2])
+
+    def test_slots(self):
+        a = ObjectId()
+        self.failIf(hasattr(a, "__dict__"))
+        self.assertRaises(AttributeError, setattr, a, "foo", 1)
+        self.assertEqual(a.binary, a._ObjectId__id)
+        self.assertEqual("ObjectId('%s')" % a, repr(a))
+
+    def test_weakref(self):
+        a = ObjectId()
+        ref = weakref.ref(a)
+        self.assert_(ref() is a)
+        del a
+        self.assertEqual(None, ref())
+
+    def test_copy(self):
+        a = ObjectId()
+        self.assertEqual(a, copy.copy(a))
+        self.assertEqual(a, copy.deepcopy(a))
+        self.assertEqual({"_id": a}, copy.deepcopy({"_id": a}))
+
+    def test_pickle(self):
+        a = ObjectId()
+        for protocol in (0, 1, 2):
+            b = pickle.loads(pickle.dumps(a, protocol))
+            self.assertEqual(a, b)
+            self.assertEqual(str(a), str(b))
+            self.assertEqual(ObjectId, type(b))
+
+    def test_pickle_backwards_compatible(self):
+        # pickles created by versions where ObjectId had a __dict__
+        pickled = ("ccopy_reg\n_reconstructor\np0\n(cbson.objectid\n"
+                   "ObjectId\np1\nc__builtin__\nobject\np2\nNtp3\nRp4\n"
+                   "(dp5\nS'_ObjectId__id'\np6\nS'\\x124Vx\\x90\\xab\\xcd"
+                   "\\xef\\x124Vx'\np7\nsb.")
+        self.assertEqual(ObjectId("1234567890abcdef12345678"),
+                         pickle.loads(pickled))
+        # so older versions can read the pickles we create
+        self.assertEqual(pickled,
+                         pickle.dumps(ObjectId("1234567890abcdef12345678")))
+
+        pickled = ("\x80\x02cbson.objectid\nObjectId\nq\x00)\x81q\x01}q\x02U"
+                   "\r_ObjectId__idq\x03U\x0c\x124Vx\x90\xab\xcd\xef\x124Vx"
+                   "q\x04sb.")
+        self.assertEqual(ObjectId("1234567890abcdef12345678"),
+                         pickle.loads(pickled))
+
 if __name__ == "__main__":
     unittest.main()
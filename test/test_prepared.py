@@ -0,0 +1,126 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the prepared module."""
+import datetime
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from bson import BSON
+from bson.objectid import ObjectId
+from bson.son import SON
+from pymongo import (ASCENDING,
+                     DESCENDING,
+                     message)
+from pymongo.connection import Connection
+from pymongo.database import Database
+from pymongo.prepared import Param
+from test_connection import get_connection
+
+
+class TestPreparedEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = Connection(_connect=False).pymongo_test.test
+
+    def assertEncodes(self, expected, prepared, params):
+        self.assertEqual(BSON.encode(expected), prepared._encode(params))
+
+    def test_encode(self):
+        spec = SON([("a", Param("a")), ("b", "constant"),
+                    ("c", SON([("$in", [1, Param("c"), 3])])),
+                    ("d", SON([("e", SON([("f", Param("f"))])),
+                               ("g", Param("a"))]))])
+        prepared = self.collection.prepare(spec)
+        self.assertEqual(["a", "c", "f"], prepared.params)
+
+        for params in [{"a": 1, "c": 2, "f": 3},
+                       {"a": u"a long string" * 10, "c": None,
+                        "f": {"nested": [1, 2, 3]}},
+                       {"a": ObjectId(), "c": 2 ** 40,
+                        "f": datetime.datetime(2010, 1, 1)}]:
+            expected = SON([("a", params["a"]), ("b", "constant"),
+                            ("c", SON([("$in", [1, params["c"], 3])])),
+                            ("d", SON([("e", SON([("f", params["f"])])),
+                                       ("g", params["a"])]))])
+            self.assertEncodes(SON([("$query", expected)]), prepared, params)
+
+    def test_encode_with_sort(self):
+        prepared = self.collection.prepare({"x": Param("x")},
+                                           sort=[("y", DESCENDING)])
+        self.assertEncodes(SON([("$query", {"x": "hello"}),
+                                ("$orderby", {"y": DESCENDING})]),
+                           prepared, {"x": "hello"})
+
+    def test_message(self):
+        prepared = self.collection.prepare({"x": Param("x")}, fields=["y"])
+        (request_id, msg) = prepared._message(prepared._encode({"x": 5}),
+                                              4, 2, -1)
+        (_, expected) = message.query(4, "pymongo_test.test", 2, -1,
+                                      SON([("$query", {"x": 5})]),
+                                      {"y": 1})
+        self.assertEqual(expected[:4] + expected[8:], msg[:4] + msg[8:])
+
+    def test_params(self):
+        prepared = self.collection.prepare({"x": Param("x"), "y": 1})
+        self.assertRaises(TypeError, prepared.find_one)
+        self.assertRaises(TypeError, prepared.find_one, {"x": 1, "z": 2})
+        self.assertRaises(TypeError, prepared.find, {})
+        self.assertRaises(TypeError, Param, 5)
+        self.assertRaises(TypeError, self.collection.prepare, [])
+
+
+class TestPrepared(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(get_connection(), "pymongo_test")
+
+    def test_find_one(self):
+        db = self.db
+        db.drop_collection("test")
+        for i in range(10):
+            db.test.insert({"x": i, "y": i % 2, "s": "a" * i})
+
+        prepared = db.test.prepare({"x": Param("x"), "y": Param("y")},
+                                   fields=["x"])
+        self.assertEqual(3, prepared.find_one({"x": 3, "y": 1})["x"])
+        self.assertEqual(None, prepared.find_one({"x": 3, "y": 0}))
+        self.assertFalse("y" in prepared.find_one({"x": 4, "y": 0}))
+
+        prepared = db.test.prepare({"s": Param("s")})
+        self.assertEqual(5, prepared.find_one({"s": "aaaaa"})["x"])
+        self.assertEqual(0, prepared.find_one({"s": ""})["x"])
+
+    def test_find(self):
+        db = self.db
+        db.drop_collection("test")
+        for i in range(10):
+            db.test.insert({"x": i, "y": i % 2})
+
+        prepared = db.test.prepare({"y": Param("y")}, sort=[("x", ASCENDING)])
+        self.assertEqual([1, 3, 5, 7, 9],
+                         [doc["x"] for doc in prepared.find({"y": 1})])
+        self.assertEqual([4, 6],
+                         [doc["x"] for doc in
+                          prepared.find({"y": 0}).skip(2).limit(2)])
+        self.assertEqual([8, 6],
+                         [doc["x"] for doc in
+                          prepared.find({"y": 0}).sort("x", DESCENDING)
+                          .limit(2)])
+        self.assertEqual(5, prepared.find({"y": 1}).count())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for RawBSONDocument."""
+
+import datetime
+import re
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from bson import BSON, decode_all
+from bson.binary import Binary
+from bson.code import Code
+from bson.dbref import DBRef
+from bson.errors import InvalidBSON
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.objectid import ObjectId
+from bson.raw import RawBSONDocument
+from bson.son import SON
+from bson.timestamp import Timestamp
+from bson.tz_util import utc
+
+
+class TestRawBSONDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = SON([("_id", ObjectId()),
+                        ("name", u"mike"),
+                        ("n", 5),
+                        ("big", 2 ** 40),
+                        ("f", 1.5),
+                        ("yes", True),
+                        ("none", None),
+                        ("when", datetime.datetime(2010, 1, 2, 3, 4, 5)),
+                        ("bin", Binary("\x00\x01", 128)),
+                        ("code", Code("return x", {"x": 1})),
+                        ("ts", Timestamp(4, 5)),
+                        ("min", MinKey()),
+                        ("max", MaxKey()),
+                        ("sub", SON([("a", 1), ("b", [1, {"c": 2}])])),
+                        ("list", [1, [2, 3], {"d": u"e"}])])
+        self.doc["re"] = re.compile("a.*b", re.I)
+        self.data = BSON.encode(self.doc)
+
+    def test_types(self):
+        self.assertRaises(TypeError, RawBSONDocument, u"")
+        self.assertRaises(InvalidBSON, RawBSONDocument, "\x05\x00\x00\x00")
+        self.assertRaises(InvalidBSON, RawBSONDocument,
+                          "\x07\x00\x00\x00\x00\x00")
+        self.assertRaises(InvalidBSON, RawBSONDocument,
+                          "\x05\x00\x00\x00\x01")
+
+    def test_access(self):
+        raw = RawBSONDocument(self.data)
+        self.assertEqual(self.data, raw.raw)
+        self.assertEqual(self.doc.keys(), raw.keys())
+        self.assertEqual(len(self.doc), len(raw))
+        for key in self.doc:
+            self.assert_(key in raw)
+        regex = self.doc.pop("re")
+        self.assertEqual(regex.pattern, raw["re"].pattern)
+        self.assertEqual(regex.flags, raw["re"].flags)
+        for key in self.doc:
+            self.assertEqual(self.doc[key], raw[key])
+        self.failIf("other" in raw)
+        self.assertRaises(KeyError, lambda: raw["other"])
+        self.assertEqual(None, raw.get("other"))
+
+        self.assert_(isinstance(raw["sub"], RawBSONDocument))
+        self.assert_(isinstance(raw["sub"]["b"][1], RawBSONDocument))
+        self.assert_(isinstance(raw["list"][2], RawBSONDocument))
+        self.assertEqual(raw, RawBSONDocument(self.data))
+
+    def test_dbref_stays_raw(self):
+        data = BSON.encode({"ref": DBRef("coll", 5)})
+        ref = RawBSONDocument(data)["ref"]
+        self.assert_(isinstance(ref, RawBSONDocument))
+        self.assertEqual("coll", ref["$ref"])
+
+    def test_tz_aware(self):
+        raw = RawBSONDocument(self.data)
+        self.assertEqual(None, raw["when"].tzinfo)
+        raw = RawBSONDocument(self.data, tz_aware=True)
+        self.assertEqual(utc, raw["when"].tzinfo)
+
+    def test_read_only(self):
+        raw = RawBSONDocument(self.data)
+
+        def set():
+            raw["x"] = 1
+
+        def delete():
+            del raw["n"]
+        self.assertRaises(TypeError, set)
+        self.assertRaises(TypeError, delete)
+
+    def test_decode(self):
+        raw = BSON(self.data).decode(RawBSONDocument)
+        self.assert_(isinstance(raw, RawBSONDocument))
+        self.assertEqual(self.data, raw.raw)
+
+        docs = decode_all(self.data * 3, RawBSONDocument, True)
+        self.assertEqual(3, len(docs))
+        for raw in docs:
+            self.assertEqual(self.data, raw.raw)
+            self.assertEqual(utc, raw["when"].tzinfo)
+
+        raw = decode_all(self.data, RawBSONDocument, dates_as_millis=True)[0]
+        self.assertEqual(1262401445000, raw["when"])
+        raw = RawBSONDocument(self.data, dates_as_millis=True)
+        self.assertEqual(1262401445000, raw["when"])
+        nested = BSON.encode({"s": {"when": self.doc["when"]}})
+        self.assertEqual(1262401445000, RawBSONDocument(
+            nested, dates_as_millis=True)["s"]["when"])
+        self.assertEqual(utc, RawBSONDocument(self.data, 2)["when"].tzinfo)
+        self.assertEqual(utc, decode_all(self.data, RawBSONDocument,
+                                         2)[0]["when"].tzinfo)
+
+    def test_encode(self):
+        raw = RawBSONDocument(self.data)
+        self.assertEqual(self.data, BSON.encode(raw))
+        # not re-ordered or checked
+        data = BSON.encode(SON([("a", 1), ("_id", 2)]))
+        self.assertEqual(data, BSON.encode(RawBSONDocument(data), True))
+        self.assertEqual({"a": 1, "_id": 2}, RawBSONDocument(data))
+
+        embedded = BSON.encode({"raw": raw})
+        self.assertEqual(self.data,
+                         BSON.encode(BSON(embedded).decode(SON)["raw"]))
+
+    def test_bad_elements(self):
+        raw = RawBSONDocument("\x0b\x00\x00\x00\x10a\x00\x01\x00\x00\x00")
+        self.assertRaises(InvalidBSON, raw.keys)
+        raw = RawBSONDocument("\x08\x00\x00\x00\x20a\x00\x00")
+        self.assertRaises(InvalidBSON, raw.keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the result_cache module."""
+import time
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from pymongo.database import Database
+from pymongo.result_cache import ResultCache
+from test_connection import get_connection
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_get_put(self):
+        cache = ResultCache()
+        generation = cache.generation("db.a")
+        cache.put("db.a", "key", "data", generation)
+        self.assertEqual(None, cache.get("db.a", "key"))
+        self.assertEqual(0, cache.misses)
+
+        cache.enable("db.a", 10)
+        self.assertEqual(None, cache.get("db.a", "key"))
+        cache.put("db.a", "key", "data", generation)
+        self.assertEqual("data", cache.get("db.a", "key"))
+        self.assertEqual(None, cache.get("db.a", "other"))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(7, cache.size)
+
+        cache.reset_counters()
+        self.assertEqual(0, cache.hits)
+        self.assertEqual(0, cache.misses)
+
+        self.assertRaises(ValueError, cache.enable, "db.a", 0)
+        self.assertRaises(TypeError, cache.enable, "db.a", "10")
+
+    def test_ttl(self):
+        cache = ResultCache()
+        cache.enable("db.a", 0.1)
+        cache.put("db.a", "key", "data", cache.generation("db.a"))
+        self.assertEqual("data", cache.get("db.a", "key"))
+        time.sleep(0.2)
+        self.assertEqual(None, cache.get("db.a", "key"))
+        self.assertEqual(0, len(cache))
+
+    def test_lru(self):
+        cache = ResultCache(max_bytes=30)
+        cache.enable("db.a", 10)
+        for key in ["k1", "k2", "k3"]:
+            cache.put("db.a", key, "x" * 8, cache.generation("db.a"))
+        self.assertEqual(3, len(cache))
+
+        cache.get("db.a", "k1")
+        cache.put("db.a", "k4", "x" * 8, cache.generation("db.a"))
+        self.assertEqual(3, len(cache))
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual(None, cache.get("db.a", "k2"))
+        self.assertEqual("x" * 8, cache.get("db.a", "k1"))
+
+        cache.put("db.a", "big", "x" * 100, cache.generation("db.a"))
+        self.assertEqual(None, cache.get("db.a", "big"))
+
+        cache.max_bytes = 10
+        self.assertEqual(1, len(cache))
+        self.assertEqual("x" * 8, cache.get("db.a", "k1"))
+
+    def test_invalidate(self):
+        cache = ResultCache()
+        cache.enable("db.a", 10)
+        cache.enable("db.b", 10)
+        cache.enable("other.a", 10)
+        for ns in ["db.a", "db.b", "other.a"]:
+            cache.put(ns, "key", "data", cache.generation(ns))
+
+        generation = cache.generation("db.a")
+        cache.invalidate("db.a")
+        self.assertEqual(None, cache.get("db.a", "key"))
+        self.assertEqual("data", cache.get("db.b", "key"))
+        cache.put("db.a", "key", "data", generation)
+        self.assertEqual(None, cache.get("db.a", "key"))
+
+        generation = cache.generation("db.b")
+        cache.invalidate_database("db")
+        self.assertEqual(None, cache.get("db.b", "key"))
+        self.assertEqual("data", cache.get("other.a", "key"))
+        cache.put("db.b", "key", "data", generation)
+        self.assertEqual(None, cache.get("db.b", "key"))
+
+        cache.disable("other.a")
+        self.assertEqual(0, len(cache))
+        self.assertFalse(cache.is_enabled("other.a"))
+
+
+class TestCollectionResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = get_connection()
+        self.db = Database(self.connection, "pymongo_test")
+
+    def tearDown(self):
+        self.db.test.disable_result_cache()
+
+    def test_result_cache(self):
+        db = self.db
+        cache = self.connection.result_cache
+        db.drop_collection("test")
+        db.test.insert({"x": 1}, safe=True)
+        db.test.enable_result_cache(ttl=60)
+        cache.reset_counters()
+
+        self.assertEqual(1, db.test.find_one()["x"])
+        self.assertEqual(1, db.test.find_one()["x"])
+        self.assertEqual([1], [doc["x"] for doc in db.test.find()])
+        self.assertEqual([1], [doc["x"] for doc in db.test.find()])
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+        doc = db.test.find_one()
+        doc["x"] = 5
+        self.assertEqual(1, db.test.find_one()["x"])
+
+        db.test.update({}, {"$set": {"x": 2}}, safe=True)
+        self.assertEqual(2, db.test.find_one()["x"])
+        db.test.insert({"x": 3}, safe=True)
+        self.assertEqual(2, db.test.find().count())
+        self.assertEqual([2, 3], [doc["x"] for doc in db.test.find()])
+        db.test.remove({"x": 2}, safe=True)
+        self.assertEqual([3], [doc["x"] for doc in db.test.find()])
+        db.test.drop()
+        self.assertEqual(None, db.test.find_one())
+
+
+if __name__ == "__main__":
+    unittest.main()
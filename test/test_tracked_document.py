@@ -0,0 +1,146 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the tracked_document module."""
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+import bson
+from pymongo.connection import Connection
+from pymongo.database import Database
+from pymongo.errors import InvalidOperation
+from pymongo.tracked_document import TrackedDocument
+from test_connection import get_connection
+
+
+class TestTrackedDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = bson.BSON.encode({"_id": 1, "a": 1, "b": "x",
+                                     "c": {"d": 1, "e": [1, 2]},
+                                     "f": {"g": 1}})
+
+    def decode(self):
+        doc = bson.BSON(self.doc).decode(as_class=TrackedDocument)
+        doc.mark_clean()
+        return doc
+
+    def test_untracked(self):
+        doc = TrackedDocument(a=1)
+        self.assertFalse(doc.is_tracked)
+        self.assertRaises(InvalidOperation, doc.changes)
+        doc.mark_clean()
+        self.assert_(doc.is_tracked)
+        self.assertEqual({}, doc.changes())
+
+    def test_changes(self):
+        doc = self.decode()
+        self.assertEqual({}, doc.changes())
+
+        doc["a"] = 2
+        doc["new"] = True
+        del doc["b"]
+        self.assertEqual({"$set": {"a": 2, "new": True},
+                          "$unset": {"b": 1}}, doc.changes())
+
+        doc = self.decode()
+        doc["a"] = 1.0
+        self.assertEqual({"$set": {"a": 1.0}}, doc.changes())
+
+        # only the order of the fields changed
+        doc = self.decode()
+        doc["a"] = doc.pop("a")
+        self.assertEqual({}, doc.changes())
+
+    def test_embedded_changes(self):
+        doc = self.decode()
+        doc["c"]["d"] = 2
+        doc["c"]["e"].append(3)
+        doc["c"]["h"] = "new"
+        del doc["f"]["g"]
+        self.assertEqual({"$set": {"c.d": 2, "c.e": [1, 2, 3],
+                                   "c.h": "new", "f": {}}},
+                         doc.changes())
+
+        doc = self.decode()
+        doc["c"] = {"d": 1}
+        self.assertEqual({"$unset": {"c.e": 1}}, doc.changes())
+
+        doc = self.decode()
+        doc["c"] = 5
+        doc["f"] = {"a.b": 1}
+        self.assertEqual({"$set": {"c": 5, "f": {"a.b": 1}}},
+                         doc.changes())
+
+    def test_fix_outgoing(self):
+        db = Connection(_connect=False).pymongo_test
+        doc = db._fix_outgoing(bson.BSON(self.doc)
+                               .decode(as_class=TrackedDocument), db.test)
+        self.assert_(doc.is_tracked)
+
+    def test_save_changes(self):
+        collection = Connection(_connect=False).pymongo_test.test
+        sent = []
+        collection.update = lambda spec, document, *args, **kwargs: \
+            sent.append((spec, document))
+
+        doc = self.decode()
+        self.assertEqual(1, collection.save_changes(doc))
+        self.assertEqual([], sent)
+
+        doc["a"] = 5
+        collection.save_changes(doc)
+        self.assertEqual([({"_id": 1}, {"$set": {"a": 5}})], sent)
+        collection.save_changes(doc)
+        self.assertEqual(1, len(sent))
+
+        untracked = TrackedDocument(_id=2, a=1)
+        collection.save_changes(untracked)
+        self.assertEqual(({"_id": 2}, {"_id": 2, "a": 1}), sent[1][:2])
+        self.assert_(untracked.is_tracked)
+
+        doc["_id"] = 3
+        self.assertRaises(InvalidOperation, collection.save_changes, doc)
+
+
+class TestCollectionSaveChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(get_connection(), "pymongo_test")
+
+    def test_save_changes(self):
+        db = self.db
+        db.drop_collection("test")
+        db.test.insert({"_id": 1, "a": 1, "b": {"c": 1, "d": 2}, "e": 3},
+                       safe=True)
+
+        doc = db.test.find_one(as_class=TrackedDocument)
+        doc["a"] = 2
+        doc["b"]["c"] = 5
+        del doc["e"]
+        db.test.update({"_id": 1}, {"$set": {"x": 1}}, safe=True)
+        db.test.save_changes(doc, safe=True)
+
+        self.assertEqual({"_id": 1, "a": 2, "b": {"c": 5, "d": 2}, "x": 1},
+                         db.test.find_one())
+
+        doc = db.test.find(as_class=TrackedDocument).next()
+        doc["a"] = 3
+        db.test.save_changes(doc, safe=True)
+        self.assertEqual(3, db.test.find_one()["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
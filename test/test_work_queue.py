@@ -0,0 +1,173 @@
+# Copyright 2009-2010 10gen, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the work_queue module."""
+import datetime
+import threading
+import unittest
+import sys
+sys.path[0:0] = [""]
+
+from pymongo.connection import Connection
+from pymongo.database import Database
+from pymongo.errors import (AutoReconnect,
+                            InvalidOperation)
+from test_connection import get_connection
+
+
+class TestWorkQueueClaims(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = [{"_id": i} for i in range(20)]
+        self.lock = threading.Lock()
+        self.updates = []
+        self.collection = Connection(_connect=False).pymongo_test.jobs
+        self.collection.find_and_modify = self.find_and_modify
+        self.collection.update = self.update
+
+    def find_and_modify(self, query, update, sort=None, new=False):
+        self.lock.acquire()
+        try:
+            now = query["lease_until"]["$not"]["$gt"]
+            for job in self.jobs:
+                if (not job.get("done") and
+                    (job.get("lease_until") is None or
+                     job["lease_until"] <= now)):
+                    job.update(update["$set"])
+                    return dict(job)
+            return None
+        finally:
+            self.lock.release()
+
+    def update(self, spec, document, multi=False, safe=False):
+        self.lock.acquire()
+        try:
+            if document["$set"].get("done"):
+                self.assert_(safe)
+            self.updates.append(len(spec["_id"]["$in"]))
+            for job in self.jobs:
+                if job["_id"] in spec["_id"]["$in"]:
+                    job.update(document["$set"])
+        finally:
+            self.lock.release()
+
+    def test_get_ack(self):
+        queue = self.collection.work_queue(prefetch=3, ack_batch=5,
+                                           ack_interval=60)
+        taken = []
+        for i in range(20):
+            job = queue.get(timeout=5)
+            taken.append(job["_id"])
+            self.assert_(isinstance(job["lease_until"], datetime.datetime))
+            queue.ack(job)
+        self.assertEqual(range(20), taken)
+        self.assertEqual(None, queue.get(timeout=0.1))
+        self.assertEqual(20, queue.claimed)
+
+        queue.close()
+        self.assertEqual(20, queue.acked)
+        self.assertEqual(20, sum(self.updates))
+        self.assert_(max(self.updates) <= 5)
+        self.assert_([job for job in self.jobs if job["done"]])
+        self.assertRaises(InvalidOperation, queue.get)
+        self.assertRaises(InvalidOperation, queue.ack, 1)
+
+    def test_threads(self):
+        queue = self.collection.work_queue(prefetch=4, ack_interval=0.01)
+        taken = []
+
+        def work():
+            while True:
+                job = queue.get(timeout=0.5)
+                if job is None:
+                    return
+                taken.append(job["_id"])
+                queue.ack(job)
+
+        threads = [threading.Thread(target=work) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        queue.close()
+        self.assertEqual(range(20), sorted(taken))
+        self.assertEqual(20, queue.acked)
+
+    def test_failed_flush(self):
+        queue = self.collection.work_queue(prefetch=3, ack_interval=60)
+        for i in range(6):
+            queue.ack(queue.get(timeout=5))
+
+        update = self.update
+
+        def fail(spec, document, multi=False, safe=False):
+            raise AutoReconnect("failed")
+        self.collection.update = fail
+        self.assertRaises(AutoReconnect, queue.flush)
+        self.assertEqual(0, queue.acked)
+
+        # the acks that weren't sent are sent by the next flush
+        self.collection.update = update
+        queue.flush()
+        self.assertEqual(6, queue.acked)
+        self.assertEqual(6, len([job for job in self.jobs if job.get("done")]))
+        queue.close()
+
+    def test_close_releases_jobs(self):
+        queue = self.collection.work_queue(prefetch=5)
+        queue.get(timeout=5)
+        queue.close()
+        self.assertEqual([None] * 19,
+                         [job.get("lease_until") for job in self.jobs[1:]])
+        self.assertNotEqual(None, self.jobs[0]["lease_until"])
+
+    def test_options(self):
+        self.assertRaises(ValueError, self.collection.work_queue, lease=0)
+        self.assertRaises(ValueError, self.collection.work_queue, prefetch=0)
+        self.assertRaises(ValueError, self.collection.work_queue,
+                          ack_batch=0)
+        self.assertRaises(TypeError, self.collection.work_queue, query=[])
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(get_connection(), "pymongo_test")
+
+    def test_queue(self):
+        db = self.db
+        db.drop_collection("jobs")
+
+        queue = db.jobs.work_queue(query={"kind": "a"}, prefetch=2)
+        for i in range(10):
+            queue.put({"n": i, "kind": i % 2 and "b" or "a"}, safe=True)
+
+        done = []
+        while True:
+            job = queue.get(timeout=2)
+            if job is None:
+                break
+            done.append(job["n"])
+            queue.ack(job)
+        queue.close()
+
+        self.assertEqual([0, 2, 4, 6, 8], done)
+        self.assertEqual(5, db.jobs.find({"done": True}).count())
+        self.assertEqual(0, db.jobs.find({"kind": "b",
+                                          "lease_until": {"$ne": None}})
+                         .count())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -67,6 +67,12 @@ def find_one(db, collection, x):
     for _ in range(per_trial):
         db[collection].find_one({"x": x})
 
+def find_one_cursor(db, collection, x):
+    # the find_one implementation that goes through a full Cursor
+    for _ in range(per_trial):
+        for _ in db[collection].find({"x": x}).limit(-1):
+            break
+
 def find(db, collection, x):
     for _ in range(per_trial):
         for _ in db[collection].find({"x": x}):
@@ -113,6 +119,9 @@ def main():
     timed("find_one (medium, indexed)", find_one, [db, 'medium_index', per_trial / 2])
     timed("find_one (large, indexed)", find_one, [db, 'large_index', per_trial / 2])
 
+    timed("find_one via cursor (small, indexed)", find_one_cursor, [db, 'small_index', per_trial / 2])
+    timed("find_one via cursor (large, indexed)", find_one_cursor, [db, 'large_index', per_trial / 2])
+
     timed("find (small, no index)", find, [db, 'small_none', per_trial / 2])
     timed("find (medium, no index)", find, [db, 'medium_none', per_trial / 2])
     timed("find (large, no index)", find, [db, 'large_none', per_trial / 2])